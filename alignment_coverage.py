@@ -0,0 +1,137 @@
+from argparse import ArgumentParser
+from io       import StringIO
+from os       import path
+from sys      import stderr, stdout
+from tempfile import TemporaryDirectory
+
+from numpy import arange, column_stack, savetxt
+
+from file_services.coverage import Coverage
+from file_services.streams  import is_pipe, open_output
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "coverage"
+
+    description =   """
+                    Depth and breadth of coverage from PAF/SAM/BAM-alignments.
+                    Writes per target its length, mean depth and the fraction of bases covered at least
+                    t times for each threshold, with -w the mean depth of windows and with -d the depth of every base.
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("in_file",
+                          help="PAF/SAM/BAM-file, - for standard input or a pipe")
+        self.add_argument("out_file",
+                          help="Tab-separated output file or - for standard output")
+        self.add_argument("-t","--thresholds",
+                          help="Depths for the breadth of coverage [default: 1,5,10]",
+                          type=lambda x: [int(t) for t in x.split(",")],
+                          default=[1, 5, 10],
+                          metavar="")
+        self.add_argument("-w","--window",
+                          help="Write the mean depth of windows of this size instead",
+                          type=int,
+                          metavar="")
+        self.add_argument("-d","--depth",
+                          help="Write the depth of every base instead (like samtools depth -a)",
+                          action="store_true")
+        self.add_argument("-q","--min-quality",
+                          help="Minimum mapping quality [default: 0]",
+                          type=int,
+                          default=0,
+                          metavar="")
+        self.add_argument("-F","--exclude-flags",
+                          help="SAM/BAM: skip alignments with any of these FLAG bits [default: 0x704]",
+                          type=lambda x: int(x, 0),
+                          default=0x704,
+                          metavar="")
+        self.add_argument("-p","--primary-only",
+                          help="PAF: skip alignments with a tp-tag other than tp:A:P",
+                          action="store_true")
+        self.add_argument("-m","--memmap",
+                          help="Keep the depth of targets with at least this many bases in temporary files",
+                          type=int,
+                          metavar="")
+
+    def parse_args(self):
+
+        self.args = super().parse_args()
+
+        if not (path.isfile(self.args.in_file) or is_pipe(self.args.in_file)):
+            raise Exception("Input file does not exist")
+
+        if path.isfile(self.args.out_file):
+            raise Exception("Output file exists")
+
+        return self.args
+
+def write_summary(coverage: Coverage, out, thresholds: list[int]):
+
+    out.write("\t".join(["target", "length", "mean_depth"] + [f"breadth_{t}" for t in thresholds]) + "\n")
+
+    for target in coverage.targets():
+        breadth = coverage.breadth(target, thresholds)
+        out.write("\t".join([target, str(coverage.lengths[target]), f"{coverage.mean(target):.4f}"] +
+                            [f"{breadth[t]:.4f}" for t in thresholds]) + "\n")
+
+def write_windows(coverage: Coverage, out, size: int):
+
+    out.write("target\tstart\tend\tmean_depth\n")
+
+    for target in coverage.targets():
+        starts, means = coverage.windows(target, size)
+        ends          = (starts + size).clip(max=coverage.lengths[target])
+        for start, end, mean in zip(starts.tolist(), ends.tolist(), means.tolist()):
+            out.write(f"{target}\t{start}\t{end}\t{mean:.4f}\n")
+
+def write_depth(coverage: Coverage, out, chunk_size: int=1 << 22):
+
+    # 1-based positions, written chunk by chunk. savetxt only formats the numbers, the target is put in front
+    # of each line afterwards (savetxt counts every % in fmt, even escaped ones, so names cannot go there).
+
+    out.write("target\tposition\tdepth\n")
+
+    for target in coverage.targets():
+        depth  = coverage.depth(target)
+        prefix = target + "\t"
+        for start in range(0, len(depth), chunk_size):
+            chunk = depth[start:start+chunk_size]
+            lines = StringIO()
+            savetxt(lines, column_stack((arange(start+1, start+len(chunk)+1), chunk)), fmt="%d\t%d")
+            out.write(prefix + lines.getvalue()[:-1].replace("\n", "\n" + prefix) + "\n")
+
+def main():
+
+    args = MyArgumentParser().parse_args()
+
+    with TemporaryDirectory() as memmap_dir:
+
+        coverage = Coverage(memmap_dir    = memmap_dir if args.memmap else None,
+                            memmap_length = args.memmap or 0)
+        coverage.add(args.in_file,
+                     min_quality   = args.min_quality,
+                     exclude_flags = args.exclude_flags,
+                     primary_only  = args.primary_only)
+
+        with open_output(args.out_file, "w") as out:
+            if args.depth:
+                write_depth(coverage, out)
+            elif args.window:
+                write_windows(coverage, out, args.window)
+            else:
+                write_summary(coverage, out, args.thresholds)
+
+        coverage.close()
+
+    log = stderr if args.out_file == "-" else stdout
+
+    print("##############################################", file=log)
+    print("#    Simon says: Thanks for using SSfSBT!    #", file=log)
+    print("##############################################", file=log)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from argparse import ArgumentParser
+from os       import path
+from time     import perf_counter
+
+import sys
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from file_services.alignment_stats import alignment_stats
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "alignment_stats"
+
+    description =   """
+                    Measures the alignments/min of computing identity, mismatch and indel statistics
+                    of a PAF/SAM/BAM-file with file_services.alignment_stats for different numbers of processes
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("alignments")
+        self.add_argument("-p","--processes",
+                          help="Numbers of processes [default: 1,2,4]",
+                          type=lambda x: [int(p) for p in x.split(",")],
+                          default=[1, 2, 4],
+                          metavar="")
+
+def main():
+
+    args = MyArgumentParser().parse_args()
+
+    print(f"{'Processes':<12}{'Alignments':>12}{'Seconds':>10}{'Alignments/min':>16}{'Mean identity':>15}")
+
+    for processes in args.processes:
+        start        = perf_counter()
+        stats, _     = alignment_stats(args.alignments, processes=processes)
+        seconds      = perf_counter()-start
+        print(f"{processes:<12}{len(stats):>12}{seconds:>10.2f}{len(stats)/seconds*60:>16.0f}{stats.identity.mean():>15.4f}")
+
+if __name__ == "__main__":
+
+    main()
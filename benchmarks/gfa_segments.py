@@ -0,0 +1,59 @@
+from argparse import ArgumentParser
+from os       import path
+from time     import perf_counter
+
+import sys
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from file_services.gfa_file_service import GfaFileService
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "gfa_segments"
+
+    description =   """
+                    Measures the segments/s of reading the S-lines of a GFA-file with GfaFileService.read():
+                    in passthrough mode (name and sequence only), as Segments with lazily parsed tags,
+                    with one tag accessed and with all tags parsed
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("gfa")
+        self.add_argument("-t","--tag",
+                          help="Tag accessed per segment [default: LN]",
+                          default="LN",
+                          metavar="")
+        self.add_argument("-b","--binary",
+                          help="Read bytes instead of strings",
+                          action="store_true")
+
+def scan(segments) -> tuple[int, float]:
+
+    start = perf_counter()
+    n     = sum(1 for _ in segments)
+
+    return n, perf_counter()-start
+
+def main():
+
+    args  = MyArgumentParser().parse_args()
+    read  = lambda **kwargs: GfaFileService.read(args.gfa, args.binary, **kwargs)
+
+    scans = {"passthrough": read(passthrough=True),
+             "lazy":        read(),
+             "one tag":     (segment.get_optional(args.tag) for segment in read()),
+             "all tags":    (segment.get_optionals_dict() for segment in read())}
+
+    print(f"{'Scan':<15}{'Segments':>10}{'Seconds':>10}{'Segments/s':>12}")
+
+    for scan_name, segments in scans.items():
+        n, seconds = scan(segments)
+        print(f"{scan_name:<15}{n:>10}{seconds:>10.2f}{n/seconds:>12.0f}")
+
+if __name__ == "__main__":
+
+    main()
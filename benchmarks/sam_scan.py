@@ -0,0 +1,87 @@
+from argparse import ArgumentParser
+from os       import path
+from time     import perf_counter
+
+import sys
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from file_services.sam_file_service import SamFileService
+from file_services.streams          import open_input
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "sam_scan"
+
+    description =   """
+                    Measures the lines/s of scanning a SAM-file with SamFileService.read(),
+                    without filters, with the filters pushed down into the parser and
+                    with the same filters applied to the records afterwards
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("sam")
+        self.add_argument("-F","--exclude-flags",
+                          help="Skip alignments with any of these FLAG bits [default: 0x904]",
+                          type=lambda x: int(x, 0),
+                          default=0x904,
+                          metavar="")
+        self.add_argument("-q","--min-quality",
+                          help="Minimum MAPQ [default: 20]",
+                          type=int,
+                          default=20,
+                          metavar="")
+        self.add_argument("-r","--reference",
+                          help="Only alignments to this reference [default: the first @SQ]",
+                          metavar="")
+        self.add_argument("-b","--binary",
+                          help="Read bytes instead of strings",
+                          action="store_true")
+
+def scan(records) -> tuple[int, float]:
+
+    start = perf_counter()
+    n     = sum(1 for _ in records)
+
+    return n, perf_counter()-start
+
+def main():
+
+    args      = MyArgumentParser().parse_args()
+    header    = SamFileService.read_header(args.sam)
+    reference = args.reference or next(iter(header["references"]), None)
+
+    if reference is None:
+        raise Exception("No @SQ-line in the SAM-file, select the reference to filter for with -r")
+
+    with open_input(args.sam, binary=True) as f:
+        lines = sum(1 for line in f if not line.startswith(b"@"))
+
+    name      = reference.encode() if args.binary else reference
+
+    def post_filter():
+        for r in SamFileService.read(args.sam, args.binary):
+            if r.RNAME == name and not r.FLAG & args.exclude_flags and r.MAPQ >= args.min_quality:
+                yield r
+
+    scans = {"unfiltered":  SamFileService.read(args.sam, args.binary),
+             "pushdown":    SamFileService.read(args.sam,
+                                                args.binary,
+                                                exclude_flags = args.exclude_flags,
+                                                min_quality   = args.min_quality,
+                                                references    = reference),
+             "post-filter": post_filter()}
+
+    print(f"{lines} alignments, filters: RNAME == {reference}, FLAG & {args.exclude_flags:#x} == 0, MAPQ >= {args.min_quality}")
+    print(f"{'Scan':<15}{'Records':>10}{'Seconds':>10}{'Lines/s':>12}")
+
+    for scan_name, records in scans.items():
+        n, seconds = scan(records)
+        print(f"{scan_name:<15}{n:>10}{seconds:>10.2f}{lines/seconds:>12.0f}")
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,125 @@
+from argparse   import ArgumentParser
+from os         import path
+from statistics import median
+from subprocess import run
+from time       import perf_counter
+
+import sys
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+
+sys.path.insert(0, root)
+
+from ssfsbt import commands
+
+# Startup budget in milliseconds: ssfsbt <subcommand> -h, i.e. interpreter start,
+# dispatching and importing the subcommand's module with everything it imports at load time
+budgets = {"aln_pos2pos":             1000,
+           "busco_find":              1000,
+           "busco_merge":             1000,
+           "coverage":                1000,
+           "fa2fq":                   150,
+           "fq2fa":                   150,
+           "gfa2fa":                  150,
+           "graph_stats":             1000,
+           "kallisto2nanosim":        1000,
+           "lengths":                 150,
+           "lr_lordec_contam_filter": 150,
+           "rnaQUASTcompare":         1000,
+           "sample":                  150,
+           "unambiguous_codes":       150}
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "startup_time"
+
+    description =   """
+                    Measures the startup time of the ssfsbt subcommands with python -X importtime
+                    and checks it against a budget per subcommand
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("subcommands",
+                          help="Subcommands to measure [default: all]",
+                          nargs="*",
+                          choices=[[]]+list(commands),
+                          metavar="subcommand")
+        self.add_argument("-r","--repeats",
+                          help="Number of runs per subcommand, the median is reported [default: 5]",
+                          type=int,
+                          default=5,
+                          metavar="")
+        self.add_argument("-n","--top",
+                          help="Number of most expensive imports listed per subcommand [default: 5]",
+                          type=int,
+                          default=5,
+                          metavar="")
+
+def parse_importtime(output: str) -> list[tuple[int, int, str]]:
+
+    # Lines look like "import time:       123 |       4567 |   package.module",
+    # self and cumulative times are in microseconds, nested imports are indented
+
+    imports = []
+
+    for line in output.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            self_time, cumulative, name = line[len("import time:"):].split("|")
+            imports.append((int(self_time), int(cumulative), name.rstrip()))
+
+    return imports
+
+def measure(subcommand: str) -> tuple[float, list[tuple[int, int, str]]]:
+
+    start  = perf_counter()
+    result = run([sys.executable, "-X", "importtime", path.join(root, "ssfsbt.py"), subcommand, "-h"],
+                 capture_output=True,
+                 text=True)
+
+    if result.returncode:
+        # E.g. a dependency of the subcommand is not installed
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    return (perf_counter()-start)*1000, parse_importtime(result.stderr)
+
+def main():
+
+    args        = MyArgumentParser().parse_args()
+    subcommands = args.subcommands or list(commands)
+    exceeded    = []
+
+    print(f"{'Subcommand':<25}{'Wall [ms]':>10}{'Imports [ms]':>14}{'Budget [ms]':>13}")
+
+    for subcommand in subcommands:
+
+        try:
+            runs = [measure(subcommand) for _ in range(args.repeats)]
+        except RuntimeError as e:
+            print(f"{subcommand:<25}failed: {e}")
+            exceeded.append(subcommand)
+            continue
+
+        wall    = median(run[0] for run in runs)
+        imports = runs[-1][1]
+        total   = sum(self_time for self_time, _, _ in imports)/1000
+
+        print(f"{subcommand:<25}{wall:>10.1f}{total:>14.1f}{budgets[subcommand]:>13}")
+
+        # Top-level imports (not indented) with the largest cumulative times
+        top = sorted((imp for imp in imports if not imp[2].startswith("   ")), key=lambda imp: -imp[1])
+        for _, cumulative, name in top[:args.top]:
+            print(f"{'':<4}{name.strip():<40}{cumulative/1000:>8.1f}")
+
+        if wall > budgets[subcommand]:
+            exceeded.append(subcommand)
+
+    if exceeded:
+        print(f"\nOver budget or failed: {', '.join(exceeded)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+
+    main()
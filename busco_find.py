@@ -1,11 +1,11 @@
 from argparse   import ArgumentParser
-from numpy      import log10
 from os         import mkdir, path
 from pandas     import DataFrame, concat
 from time       import time
 from typing     import Iterable, Generator
 
-from file_services.fasta_file_service import FastaFileService
+from file_services.fasta_file_service import FastaFileService, FastaIndexError
+from file_services.streams            import is_seekable
 
 class MyArgumentParser(ArgumentParser):
 
@@ -108,6 +108,17 @@ def filter_buscotable(busco_table: DataFrame,
     
     return concat(busco_subtables)
 
+def get_header(row, busco_table: DataFrame) -> str:
+
+    var     = str(len(busco_table.loc[busco_table["BUSCO_id"]==row["BUSCO_id"]]))
+    header  = ">" + row["BUSCO_id"] + "_" + var + "_" + row["TRANS_id"]  + " "
+    header += "Fragmented:"   + str(row["Fragmented"])
+    header += ";Score:"       + str(row["Score"])
+    header += ";Length:"      + str(row["Length"])
+    header += ";Description:" + str(row["Description"])
+
+    return header
+
 def filter_transcriptome(transcriptome: Iterable[dict[str, str]],
                          busco_table:   DataFrame,
                          verbosity:     int) -> Generator:
@@ -125,13 +136,8 @@ def filter_transcriptome(transcriptome: Iterable[dict[str, str]],
             row = busco_table.loc[busco_table["TRANS_id"]==transcript_id]
             idx = row.index[0]
             row = row.iloc[0]
-            var = str(len(busco_table.loc[busco_table["BUSCO_id"]==row["BUSCO_id"]]))
             
-            transcript["header"]  = ">" + row["BUSCO_id"] + "_" + var + "_" + row["TRANS_id"]  + " "
-            transcript["header"] += "Fragmented:"   + str(row["Fragmented"])
-            transcript["header"] += ";Score:"       + str(row["Score"])
-            transcript["header"] += ";Length:"      + str(row["Length"])
-            transcript["header"] += ";Description:" + str(row["Description"])
+            transcript["header"] = get_header(row, busco_table)
             
             found += 1        
             busco_table.drop(idx)
@@ -143,6 +149,31 @@ def filter_transcriptome(transcriptome: Iterable[dict[str, str]],
     
     print(f"Scanned: {i:>6}, found {found:>4} of {to_find} ({int(time()-start):>3} seconds)")
 
+def fetch_transcripts(transcriptome: str,
+                      busco_table:   DataFrame) -> Generator:
+    
+    # Random access through the .fai index of the transcriptome instead of scanning it
+    
+    found = 0
+    start = time()
+    
+    for transcript_id in busco_table["TRANS_id"].unique():
+        
+        row = busco_table.loc[busco_table["TRANS_id"]==transcript_id].iloc[0]
+        
+        try:
+            sequence = FastaFileService.fetch(transcriptome, transcript_id)
+        except KeyError:
+            print(f"{transcript_id} not found in {transcriptome}")
+            continue
+        
+        found += 1
+        
+        yield {"header":   get_header(row, busco_table),
+               "sequence": sequence}
+        
+    print(f"Fetched {found} of {busco_table['TRANS_id'].nunique()} transcripts ({int(time()-start):>3} seconds)")
+
 def main():
     
     args          = MyArgumentParser().parse_args() 
@@ -158,8 +189,19 @@ def main():
         for busco_id in busco_table["BUSCO_id"].unique():
             file.write(busco_id+"\n")
     
-    transcriptome = FastaFileService().read(args.transcriptome)
-    buscos        = filter_transcriptome(transcriptome, busco_table, args.verbosity)
+    buscos = None
+
+    # FASTA-files with lines of different lengths cannot be indexed, they are scanned like pipes
+    if is_seekable(args.transcriptome):
+        try:
+            FastaFileService.get_index(args.transcriptome)
+            buscos = fetch_transcripts(args.transcriptome, busco_table)
+        except (FastaIndexError, OSError) as e:
+            print(f"Scanning {args.transcriptome} instead of fetching transcripts: {e}")
+
+    if buscos is None:
+        transcriptome = FastaFileService().read(args.transcriptome)
+        buscos        = filter_transcriptome(transcriptome, busco_table, args.verbosity)
 
     FastaFileService().write(path.join(args.outdir, "buscos.fasta"), buscos)
     
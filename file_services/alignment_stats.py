@@ -0,0 +1,356 @@
+from io        import BytesIO
+from itertools import islice
+from mmap      import mmap, ACCESS_READ
+from numpy     import (add, append, arange, array, bincount, concatenate, cumsum, flatnonzero, frombuffer, full, int8,
+                       int64, minimum, ndarray, searchsorted, uint8, where, zeros)
+from os        import cpu_count, path
+from re        import compile
+from typing    import Union
+
+from . import registry
+from . import streams
+from .batches import parse_ints
+
+# Run-length arrays use the BAM codes of the CIGAR operations M I D N S H P = X,
+# cs-tags are translated into them (":" and "=" to =, "*" to X, "+" to I, "-" to D, "~" to N)
+M, I, D, N, S, H, P, EQUAL, X = range(9)
+
+op_codes = full(256, -1, dtype=int8)
+op_codes[list(b"MIDNSHP=X")] = arange(9)
+
+cs_codes = full(256, -1, dtype=int8)
+cs_codes[list(b":=*+-~")] = [EQUAL, EQUAL, X, I, D, N]
+
+number_pattern = compile(rb"\d+")
+
+def parse_cigars(cigars: list[bytes])->tuple[ndarray, ndarray, ndarray]:
+
+    # CIGAR strings (or PAF cg-tags) of many alignments at once into run-length arrays:
+    # alignment index, operation code and length of each run
+
+    joined  = b"".join(cigars)
+    buffer  = frombuffer(joined, uint8)
+    codes   = op_codes[buffer]
+    ops     = flatnonzero(codes >= 0)
+    lengths = array(number_pattern.findall(joined)).astype(int64)
+
+    if len(lengths) != len(ops) or ((codes < 0) & ((buffer < 48) | (buffer > 57))).any():
+        raise ValueError("Invalid CIGAR string")
+
+    return searchsorted(cumsum([len(cigar) for cigar in cigars]), ops, "right"), codes[ops].astype(int64), lengths
+
+def parse_cs(tags: list[bytes])->tuple[ndarray, ndarray, ndarray]:
+
+    # minimap2 cs-tags (short or long form, without the "cs:Z:" prefix) into run-length arrays.
+    # Operations start with one of :=*+-~ which never occur within their values.
+
+    joined = b"".join(tags)
+    buffer = frombuffer(joined, uint8)
+    ends   = cumsum([len(tag) for tag in tags])
+    ops    = flatnonzero(cs_codes[buffer] >= 0)
+    kinds  = buffer[ops]
+
+    records = searchsorted(ends, ops, "right")
+    stops   = minimum(append(ops[1:], len(buffer)), ends[records])
+    lengths = stops - ops - 1
+
+    # :N and ~acN..ag hold numbers, *ab is a single mismatch
+    runs    = kinds == ord(":")
+    introns = kinds == ord("~")
+
+    lengths[runs]              = parse_ints(buffer, ops[runs]+1, stops[runs])
+    lengths[introns]           = parse_ints(buffer, ops[introns]+3, stops[introns]-2)
+    lengths[kinds == ord("*")] = 1
+
+    return records, cs_codes[kinds].astype(int64), lengths
+
+def find_tag(tags: bytes, prefix: bytes)->Union[bytes, None]:
+
+    # Value of an optional field given its prefix like b"NM:i:" without parsing all fields
+
+    start = tags.find(prefix)
+
+    while start > 0 and tags[start-1] != 9:
+        start = tags.find(prefix, start+1)
+
+    if start < 0:
+        return None
+
+    end = tags.find(b"\t", start)
+
+    return tags[start+len(prefix):end if end >= 0 else len(tags)]
+
+class AlignmentStats():
+    """
+    Per-alignment statistics of a batch of alignments as numpy columns, computed from run-length arrays.
+    Runs of M are split into matches and mismatches with the NM-tag (SAM) or the number of matching bases (PAF),
+    without them all M are counted as matches. PAF-lines without cg- and cs-tags only have matches and mismatches
+    (alignment block length - matches), their gaps cannot be told apart.
+    """
+
+    count_columns = ("matches",
+                     "mismatches",
+                     "insertions",
+                     "inserted_bases",
+                     "deletions",
+                     "deleted_bases")
+
+    def __init__(self, columns: dict[str, ndarray]):
+
+        self.columns = columns
+
+    @classmethod
+    def from_runs(cls,
+                  n:        int,
+                  records:  ndarray,
+                  codes:    ndarray,
+                  lengths:  ndarray,
+                  nm:       ndarray=None,
+                  matching: ndarray=None)->"AlignmentStats":
+
+        # nm (NM-tags) or matching (matching bases of PAF-lines) tell the mismatches within M-runs apart, -1 if unknown
+
+        bases  = zeros((n, 9), int64)
+        events = zeros((n, 9), int64)
+        add.at(bases, (records, codes), lengths)
+        add.at(events, (records, codes), 1)
+
+        # NM = mismatches + inserted + deleted bases
+        mismatched = zeros(n, int64)
+        if nm is not None:
+            mismatched = where(nm >= 0, nm - bases[:, X] - bases[:, I] - bases[:, D], mismatched)
+        if matching is not None:
+            mismatched = where(matching >= 0, bases[:, M] + bases[:, EQUAL] - matching, mismatched)
+        mismatched = mismatched.clip(0, bases[:, M])
+
+        return cls({"matches":        bases[:, EQUAL] + bases[:, M] - mismatched,
+                    "mismatches":     bases[:, X] + mismatched,
+                    "insertions":     events[:, I],
+                    "inserted_bases": bases[:, I],
+                    "deletions":      events[:, D],
+                    "deleted_bases":  bases[:, D]})
+
+    @classmethod
+    def concatenate(cls, batches: list["AlignmentStats"])->"AlignmentStats":
+
+        if not batches:
+            return cls({name: zeros(0, int64) for name in cls.count_columns})
+
+        return cls({name: concatenate([batch.columns[name] for batch in batches]) for name in cls.count_columns})
+
+    def __len__(self)->int:
+
+        return len(self.columns["matches"])
+
+    def __getitem__(self, column: str)->ndarray:
+
+        if column in ("identity", "gap_compressed_identity", "error_rate"):
+            return getattr(self, column)
+
+        return self.columns[column]
+
+    @property
+    def identity(self)->ndarray:
+
+        # BLAST identity: matches / alignment columns
+
+        c       = self.columns
+        columns = c["matches"] + c["mismatches"] + c["inserted_bases"] + c["deleted_bases"]
+
+        return c["matches"] / where(columns > 0, columns, 1)
+
+    @property
+    def gap_compressed_identity(self)->ndarray:
+
+        # Indels of any length count as one difference
+
+        c       = self.columns
+        columns = c["matches"] + c["mismatches"] + c["insertions"] + c["deletions"]
+
+        return c["matches"] / where(columns > 0, columns, 1)
+
+    @property
+    def error_rate(self)->ndarray:
+
+        return 1 - self.identity
+
+    def to_polars(self):
+
+        from polars import DataFrame
+
+        return DataFrame({**self.columns,
+                          "identity":                self.identity,
+                          "gap_compressed_identity": self.gap_compressed_identity})
+
+class AlignmentHistograms():
+    """
+    Aggregated histograms over any number of batches: identity (identity_bins bins over [0, 1]),
+    lengths of insertions and deletions (the last bin collects all of at least max_indel bases)
+    and mismatches per alignment. Histograms from different processes are merged with +=.
+    """
+
+    identity_bins = 1000
+    max_indel     = 1000
+    max_count     = 1000
+
+    def __init__(self):
+
+        self.alignments = 0
+        self.identity   = zeros(self.identity_bins, int64)
+        self.insertions = zeros(self.max_indel+1, int64)
+        self.deletions  = zeros(self.max_indel+1, int64)
+        self.mismatches = zeros(self.max_count+1, int64)
+        self.totals     = dict.fromkeys(AlignmentStats.count_columns, 0)
+
+    def add(self, stats: AlignmentStats, codes: ndarray, lengths: ndarray)->None:
+
+        bins = (stats.identity * self.identity_bins).astype(int64).clip(0, self.identity_bins-1)
+
+        self.alignments += len(stats)
+        self.identity   += bincount(bins, minlength=self.identity_bins)
+        self.insertions += bincount(lengths[codes == I].clip(max=self.max_indel), minlength=self.max_indel+1)
+        self.deletions  += bincount(lengths[codes == D].clip(max=self.max_indel), minlength=self.max_indel+1)
+        self.mismatches += bincount(stats["mismatches"].clip(max=self.max_count), minlength=self.max_count+1)
+
+        for name in self.totals:
+            self.totals[name] += int(stats[name].sum())
+
+    def __iadd__(self, other: "AlignmentHistograms")->"AlignmentHistograms":
+
+        self.alignments += other.alignments
+        self.identity   += other.identity
+        self.insertions += other.insertions
+        self.deletions  += other.deletions
+        self.mismatches += other.mismatches
+
+        for name in self.totals:
+            self.totals[name] += other.totals[name]
+
+        return self
+
+def batch_stats(records: list, file_type: str)->tuple[AlignmentStats, ndarray, ndarray]:
+
+    # Statistics of a list of binary SAM- or PAF-records, plus the codes and lengths of all runs for the histograms.
+    # PAF-lines are described by their cs-tag if they have one, otherwise by their cg-tag.
+
+    n = len(records)
+
+    if file_type != "paf":
+        runs = parse_cigars([record.CIGAR for record in records])
+        nm   = array([int(find_tag(record.tags, b"NM:i:") or -1) for record in records], dtype=int64)
+        return AlignmentStats.from_runs(n, *runs, nm=nm), *runs[1:]
+
+    cs = [find_tag(record.tags, b"cs:Z:") for record in records]
+    cg = [None if tag is not None else find_tag(record.tags, b"cg:Z:") for record, tag in zip(records, cs)]
+
+    cs_runs = parse_cs([tag or b"" for tag in cs])
+    cg_runs = parse_cigars([tag or b"" for tag in cg])
+    runs    = [concatenate(arrays) for arrays in zip(cs_runs, cg_runs)]
+    matches = array([record.matches for record in records], dtype=int64)
+    has_cg  = array([tag is not None for tag in cg], dtype=bool)
+    stats   = AlignmentStats.from_runs(n, *runs, matching=where(has_cg, matches, -1))
+
+    # Without cs and cg only the matching bases and the alignment block length are known
+    bare = ~has_cg & array([tag is None for tag in cs], dtype=bool)
+    stats.columns["matches"][bare]    = matches[bare]
+    stats.columns["mismatches"][bare] = array([record.alignment_length for record in records], dtype=int64)[bare] - matches[bare]
+
+    return stats, *runs[1:]
+
+def accept(record, file_type: str, min_quality: int, exclude_flags: int, primary_only: bool)->bool:
+
+    if file_type == "paf":
+        return (record.alignment_quality >= min_quality and
+                not (primary_only and find_tag(record.tags, b"tp:A:") not in (None, b"P")))
+
+    return record.MAPQ >= min_quality and not record.FLAG & exclude_flags and record.CIGAR != b"*"
+
+def collect(records, file_type: str, batch_size: int)->tuple[list[AlignmentStats], AlignmentHistograms]:
+
+    batches    = []
+    histograms = AlignmentHistograms()
+
+    while batch := list(islice(records, batch_size)):
+        stats, codes, lengths = batch_stats(batch, file_type)
+        histograms.add(stats, codes, lengths)
+        batches.append(stats)
+
+    return batches, histograms
+
+def stats_shard(args: tuple)->tuple[AlignmentStats, AlignmentHistograms]:
+
+    # Statistics of the lines within one byte range, the range has to start and end at line boundaries
+
+    file_type, file_path, start, end, batch_size, filters = args
+
+    service = registry.get_service_by_name(file_type)
+
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        lines = BytesIO(f.read(end-start))
+
+    records = (service.parse_bytes(line) for line in lines if line.strip() and not line.startswith(b"@"))
+    records = (record for record in records if accept(record, file_type, *filters))
+
+    batches, histograms = collect(records, file_type, batch_size)
+
+    return AlignmentStats.concatenate(batches), histograms
+
+def get_line_shards(file_path: str, shard_size: int)->list[tuple[int, int]]:
+
+    # Byte ranges of about shard_size bytes, each moved to the next line start
+
+    size = path.getsize(file_path)
+
+    if size == 0:
+        return []
+
+    with open(file_path, "rb") as f, mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+        starts = [0] + [data.find(b"\n", position)+1 or size for position in range(shard_size, size, shard_size)]
+
+    starts = sorted(set(starts + [size]))
+
+    return list(zip(starts[:-1], starts[1:]))
+
+def alignment_stats(file_path: str,
+                    processes=1,
+                    min_quality=0,
+                    exclude_flags=0x904,
+                    primary_only=False,
+                    batch_size=1 << 16,
+                    shard_size=1 << 26)->tuple[AlignmentStats, AlignmentHistograms]:
+
+    # Per-alignment statistics (in file order) and histograms of a PAF-, SAM- or BAM-file.
+    # By default unmapped, secondary and supplementary SAM/BAM-records are skipped.
+    # With processes > 1 byte ranges of uncompressed PAF/SAM-files are processed in a process pool,
+    # BAM-files, compressed files and pipes in a single process.
+
+    file_format = registry.get_format(file_path, "alignments")
+    file_type   = file_format.name
+    filters     = (min_quality, exclude_flags, primary_only)
+
+    if processes > 1 and file_type != "bam" and streams.is_seekable(file_path):
+
+        from multiprocessing import Pool
+
+        shards = [(file_type, file_path, start, end, batch_size, filters)
+                  for start, end in get_line_shards(file_path, shard_size)]
+
+        with Pool(min(processes or cpu_count(), max(len(shards), 1))) as pool:
+            results = pool.map(stats_shard, shards)
+
+        histograms = AlignmentHistograms()
+        for _, shard_histograms in results:
+            histograms += shard_histograms
+
+        return AlignmentStats.concatenate([stats for stats, _ in results]), histograms
+
+    if file_type == "paf":
+        records = file_format.service.read(file_path, True, min_quality=min_quality, primary_only=primary_only)
+    else:
+        records = (record for record in file_format.service.read(file_path, True, exclude_flags=exclude_flags, min_quality=min_quality)
+                   if record.CIGAR != b"*")
+
+    batches, histograms = collect(records, file_type, batch_size)
+
+    return AlignmentStats.concatenate(batches), histograms
@@ -0,0 +1,515 @@
+from io     import BufferedWriter
+from os     import path
+from re     import compile
+from struct import pack, Struct, unpack_from
+from sys    import stdin
+from typing import Generator, Iterable, Union
+
+from . import streams
+from .records          import SamRecord
+from .sam_file_service import SamFileService
+
+class BamIndexError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+def reg2bin(start: int, end: int)->int:
+
+    # Smallest bin of the BAM binning scheme containing the 0-based, end-exclusive interval
+
+    end -= 1
+
+    for shift, offset in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if start >> shift == end >> shift:
+            return offset + (start >> shift)
+
+    return 0
+
+def reg2bins(start: int, end: int)->list[int]:
+
+    # All bins that may contain alignments overlapping the interval
+
+    end -= 1
+    bins = [0]
+
+    for shift, offset in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(offset + (start >> shift), offset + (end >> shift) + 1))
+
+    return bins
+
+def make_table(mapping: dict[int, int], default: int)->bytes:
+
+    table = bytearray([default]*256)
+
+    for key, value in mapping.items():
+        table[key] = value
+
+    return bytes(table)
+
+class BamFileService():
+    """
+    Reads and writes BAM, yielding and accepting the same SamRecords as the SamFileService.
+    BGZF-blocks are inflated with zlib (on threads threads) and the binary records unpacked with struct.
+    Region queries need a .bai index, get_index() builds it like samtools index if it is missing.
+    """
+
+    sorted_keys = SamFileService.sorted_keys
+
+    # refID, pos, l_read_name, mapq, bin, n_cigar_op, flag, l_seq, next_refID, next_pos, tlen
+    core = Struct("<iiBBHHHiiii")
+
+    cigar_ops      = b"MIDNSHP=X"
+    cigar_pattern  = compile(rb"(\d+)([MIDNSHP=X])")
+    reference_ops  = {0, 2, 3, 7, 8}    # M, D, N, = and X consume the reference
+    pseudo_bin     = 37450
+
+    # Sequences are packed and unpacked as hex strings, each 4-bit base code being one hex digit
+    hex_to_base = bytes.maketrans(b"0123456789abcdef", b"=ACMGRSVTWYHKDBN")
+    base_to_hex = make_table({base: digit for bases in (b"=ACMGRSVTWYHKDBN", b"=acmgrsvtwyhkdbn")
+                              for base, digit in zip(bases, b"0123456789abcdef")}, ord("f"))
+    phred_to_ascii = bytes((i+33) % 256 for i in range(256))
+    ascii_to_phred = bytes((i-33) % 256 for i in range(256))
+
+    # Binary tag types: struct format and size
+    tag_types = {"c": ("<b", 1), "C": ("<B", 1), "s": ("<h", 2), "S": ("<H", 2),
+                 "i": ("<i", 4), "I": ("<I", 4), "f": ("<f", 4)}
+    number_types = {ord(type): (Struct(fmt), size, b":f:%g" if type == "f" else b":i:%d")
+                    for type, (fmt, size) in tag_types.items()}
+
+    indices = {}
+
+    @classmethod
+    def open(cls, file, threads=1)->streams.BgzfReader:
+
+        # A pipe whose format was detected is kept decompressed in streams.pipes, its start is already consumed
+        if file in streams.pipes:
+            return streams.InflatedBgzfReader(streams.pipes.pop(file))
+
+        if streams.is_pipe(file):
+            return streams.BgzfReader(open(stdin.fileno() if file == "-" else file, "rb", closefd=file != "-"), threads)
+
+        return streams.BgzfReader(open(file, "rb"), threads)
+
+    @classmethod
+    def read_header_block(cls, bam: streams.BgzfReader)->tuple[dict, list[bytes]]:
+
+        # Returns the header as parsed by the SamFileService and the reference names in the order of their ids
+
+        if bam.read_exactly(4) != b"BAM\x01":
+            raise ValueError("Not a BAM-file")
+
+        text   = bam.read_exactly(unpack_from("<i", bam.read_exactly(4))[0]).rstrip(b"\x00").decode()
+        names  = []
+        header = SamFileService.parse_header(line for line in text.split("\n") if line.startswith("@"))
+
+        references = {}
+
+        for _ in range(unpack_from("<i", bam.read_exactly(4))[0]):
+            name = bam.read_exactly(unpack_from("<i", bam.read_exactly(4))[0])[:-1]
+            names.append(name)
+            references[name.decode()] = unpack_from("<i", bam.read_exactly(4))[0]
+
+        # The binary reference list is authoritative, the text header does not need to contain @SQ-lines
+        if not header["SQ"]:
+            header["SQ"] = [{"SN": name, "LN": str(length)} for name, length in references.items()]
+
+        header["references"] = references
+
+        return header, names
+
+    @classmethod
+    def read_header(cls, file)->dict:
+
+        with cls.open(file) as bam:
+            return cls.read_header_block(bam)[0]
+
+    @classmethod
+    def next_record(cls, bam: streams.BgzfReader)->Union[bytes, None]:
+
+        # The record without its block_size
+
+        head = bam.read_exactly(4, allow_eof=True)
+
+        return bam.read_exactly(unpack_from("<i", head)[0]) if head else None
+
+    @classmethod
+    def decode_tags(cls, data: bytes, i: int)->bytes:
+
+        # Binary optional fields to their SAM text representation
+
+        tags    = []
+        n_bytes = len(data)
+
+        while i < n_bytes:
+
+            tag, type = data[i:i+2], data[i+2]
+            i += 3
+
+            if type in cls.number_types:
+                number, size, text = cls.number_types[type]
+                tags.append(tag + text % number.unpack_from(data, i))
+                i += size
+            elif type == 90 or type == 72:                    # Z, H
+                end = data.index(b"\x00", i)
+                tags.append(tag + (b":Z:" if type == 90 else b":H:") + data[i:end])
+                i = end+1
+            elif type == 65:                                  # A
+                tags.append(tag + b":A:" + data[i:i+1])
+                i += 1
+            elif type == 66:                                  # B
+                subtype   = chr(data[i])
+                n         = unpack_from("<i", data, i+1)[0]
+                fmt, size = cls.tag_types[subtype]
+                values    = unpack_from(f"<{n}{fmt[1]}", data, i+5)
+                number    = b"%g" if subtype == "f" else b"%d"
+                tags.append(tag + b":B:" + b",".join([subtype.encode()] + [number % value for value in values]))
+                i += 5 + n*size
+            else:
+                raise ValueError(f"Unknown BAM tag type {chr(type)}")
+
+        return b"\t".join(tags)
+
+    @classmethod
+    def encode_tags(cls, tags: bytes)->bytes:
+
+        data = []
+
+        for field in tags.split(b"\t"):
+
+            if not field:
+                continue
+
+            tag, type, value = field.split(b":", 2)
+
+            match type:
+                case b"i":
+                    value = int(value)
+                    for subtype in ("csi" if value < 0 else "CSI"):
+                        fmt, size = cls.tag_types[subtype]
+                        if -(1 << (8*size-1)) <= value < (1 << (8*size - (subtype.islower()))):
+                            break
+                    data.append(tag + subtype.encode() + pack(fmt, value))
+                case b"f":
+                    data.append(tag + b"f" + pack("<f", float(value)))
+                case b"A":
+                    data.append(tag + b"A" + value[:1])
+                case b"Z" | b"H":
+                    data.append(tag + type + value + b"\x00")
+                case b"B":
+                    subtype, *values = value.split(b",")
+                    fmt, _           = cls.tag_types[subtype.decode()]
+                    values           = [float(v) for v in values] if subtype == b"f" else [int(v) for v in values]
+                    data.append(tag + b"B" + subtype + pack(f"<i{len(values)}{fmt[1]}", len(values), *values))
+
+        return b"".join(data)
+
+    @classmethod
+    def reference_length(cls, data: bytes, l_read_name: int, n_cigar: int)->int:
+
+        ops = unpack_from(f"<{n_cigar}I", data, 32+l_read_name)
+
+        return sum(op >> 4 for op in ops if op & 15 in cls.reference_ops)
+
+    @classmethod
+    def parse_record(cls, data: bytes, names: list[bytes], binary=False)->SamRecord:
+
+        ref_id, pos, l_read_name, mapq, _, n_cigar, flag, l_seq, next_ref_id, next_pos, tlen = cls.core.unpack_from(data)
+
+        i     = 32 + l_read_name
+        qname = data[32:i-1]
+        ops   = unpack_from(f"<{n_cigar}I", data, i)
+        cigar = b"".join([b"%d%c" % (op >> 4, cls.cigar_ops[op & 15]) for op in ops]) or b"*"
+        i    += 4*n_cigar
+        seq   = data[i:i+(l_seq+1)//2].hex().encode().translate(cls.hex_to_base)[:l_seq] or b"*"
+        i    += (l_seq+1)//2
+        qual  = data[i:i+l_seq]
+        qual  = b"*" if not l_seq or qual[0] == 0xff else qual.translate(cls.phred_to_ascii)
+        tags  = cls.decode_tags(data, i+l_seq)
+        rname = names[ref_id] if ref_id >= 0 else b"*"
+        rnext = b"*" if next_ref_id < 0 else b"=" if next_ref_id == ref_id else names[next_ref_id]
+
+        if binary:
+            return SamRecord(qname, flag, rname, pos+1, mapq, cigar, rnext, next_pos+1, tlen, seq, qual, tags)
+
+        return SamRecord(qname.decode(), flag, rname.decode(), pos+1, mapq, cigar.decode(), rnext.decode(),
+                         next_pos+1, tlen, seq.decode(), qual.decode(), tags.decode())
+
+    @classmethod
+    def read(cls,
+             file,
+             binary=False,
+             require_flags=0,
+             exclude_flags=0,
+             min_quality=0,
+             references: Union[str, Iterable[str], None]=None,
+             threads=1)->Generator:
+
+        # Same filters as SamFileService.read(), they are checked on the fixed-size part of each record
+        # before names, CIGAR, sequence and tags are decoded
+
+        with cls.open(file, threads) as bam:
+
+            header, names = cls.read_header_block(bam)
+            filtered      = require_flags or exclude_flags or min_quality or references is not None
+
+            if references is not None:
+                references = {references} if isinstance(references, str) else set(references)
+                references = {i for i, name in enumerate(header["references"]) if name in references}
+
+            while (data := cls.next_record(bam)) is not None:
+
+                if filtered:
+                    ref_id, _, _, mapq, _, _, flag = unpack_from("<iiBBHHH", data)
+                    if ((references is not None and ref_id not in references) or
+                        flag & require_flags != require_flags or flag & exclude_flags or mapq < min_quality):
+                        continue
+
+                yield cls.parse_record(data, names, binary)
+
+    @classmethod
+    def build_index(cls, file_path: str)->list[tuple[dict, list[int], list]]:
+
+        # .bai of a coordinate-sorted BAM-file, per reference: bins (bin -> chunks of virtual offsets),
+        # linear index (smallest virtual offset of alignments overlapping each 16 kb window) and
+        # the pseudo-bin with the virtual offsets of the reference's records and the numbers of mapped and unmapped reads
+
+        if streams.is_pipe(file_path):
+            raise BamIndexError(f"Cannot index pipe {file_path}")
+
+        with cls.open(file_path) as bam:
+
+            _, names = cls.read_header_block(bam)
+            index    = [({}, [], [None, None, 0, 0]) for _ in names]
+            last     = (0, -1)
+            no_coor  = 0
+
+            while True:
+
+                begin = bam.tell_virtual()
+                data  = cls.next_record(bam)
+
+                if data is None:
+                    break
+
+                end = bam.tell_virtual()
+
+                ref_id, pos, l_read_name, _, _, n_cigar, flag = unpack_from("<iiBBHHH", data)
+
+                if ref_id < 0:
+                    no_coor += 1
+                    continue
+                if (ref_id, pos) < last:
+                    raise BamIndexError(f"{file_path} is not sorted by coordinates")
+
+                last                 = (ref_id, pos)
+                bins, linear, pseudo = index[ref_id]
+                stop                 = pos + max(cls.reference_length(data, l_read_name, n_cigar), 1)
+                chunks               = bins.setdefault(reg2bin(pos, stop), [])
+
+                if chunks and chunks[-1][1] == begin:
+                    chunks[-1][1] = end
+                else:
+                    chunks.append([begin, end])
+
+                for window in range(pos >> 14, ((stop-1) >> 14) + 1):
+                    if window >= len(linear):
+                        linear.extend([None]*(window+1-len(linear)))
+                    if linear[window] is None:
+                        linear[window] = begin
+
+                pseudo[0]  = begin if pseudo[0] is None else pseudo[0]
+                pseudo[1]  = end
+                pseudo[2 + bool(flag & 4)] += 1
+
+        # Empty windows point to the preceding alignments, like in htslib
+        for _, linear, _ in index:
+            for window in range(len(linear)):
+                if linear[window] is None:
+                    linear[window] = linear[window-1] if window else next(offset for offset in linear if offset is not None)
+
+        return index, no_coor
+
+    @classmethod
+    def write_index(cls, index: list, no_coor: int, bai: str)->None:
+
+        with open(bai, "wb") as f:
+
+            f.write(b"BAI\x01" + pack("<i", len(index)))
+
+            for bins, linear, pseudo in index:
+
+                f.write(pack("<i", len(bins) + (pseudo[0] is not None)))
+
+                for bin, chunks in bins.items():
+                    f.write(pack("<Ii", bin, len(chunks)))
+                    f.write(b"".join(pack("<QQ", *chunk) for chunk in chunks))
+
+                if pseudo[0] is not None:
+                    f.write(pack("<IiQQQQ", cls.pseudo_bin, 2, *pseudo))
+
+                f.write(pack(f"<i{len(linear)}Q", len(linear), *linear))
+
+            f.write(pack("<Q", no_coor))
+
+    @classmethod
+    def load_index(cls, bai: str)->list[tuple[dict, list[int]]]:
+
+        with open(bai, "rb") as f:
+            data = f.read()
+
+        if data[:4] != b"BAI\x01":
+            raise BamIndexError(f"{bai} is not a BAM-index")
+
+        index = []
+        i     = 8
+
+        for _ in range(unpack_from("<i", data, 4)[0]):
+
+            bins = {}
+            i   += 4
+
+            for _ in range(unpack_from("<i", data, i-4)[0]):
+                bin, n = unpack_from("<Ii", data, i)
+                chunks = unpack_from(f"<{2*n}Q", data, i+8)
+                i     += 8 + 16*n
+                if bin != cls.pseudo_bin:
+                    bins[bin] = list(zip(chunks[::2], chunks[1::2]))
+
+            n      = unpack_from("<i", data, i)[0]
+            linear = list(unpack_from(f"<{n}Q", data, i+4))
+            i     += 4 + 8*n
+
+            index.append((bins, linear))
+
+        return index
+
+    @classmethod
+    def get_index(cls, file_path: str)->list[tuple[dict, list[int]]]:
+
+        # Like samtools, x.bam.bai and x.bai are accepted. The index is built if there is none.
+
+        if file_path in cls.indices:
+            return cls.indices[file_path]
+
+        for bai in (file_path + ".bai", path.splitext(file_path)[0] + ".bai"):
+            if path.isfile(bai) and path.getmtime(bai) >= path.getmtime(file_path):
+                break
+        else:
+            bai = file_path + ".bai"
+            cls.write_index(*cls.build_index(file_path), bai)
+
+        cls.indices[file_path] = cls.load_index(bai)
+
+        return cls.indices[file_path]
+
+    @classmethod
+    def query(cls, file_path: str, reference: str, start: int=None, end: int=None, binary=False)->Generator:
+
+        # Alignments to reference overlapping [start, end), 0-based and end-exclusive like FastaFileService.fetch().
+        # Only the BGZF-blocks of the index chunks for the bins of the region are read.
+
+        index = cls.get_index(file_path)
+
+        with cls.open(file_path) as bam:
+
+            header, names = cls.read_header_block(bam)
+
+            if reference not in header["references"]:
+                raise KeyError(reference)
+
+            ref_id       = list(header["references"]).index(reference)
+            start        = 0 if start is None else max(start, 0)
+            end          = header["references"][reference] if end is None else end
+            bins, linear = index[ref_id]
+
+            if start >= end:
+                return
+
+            min_offset = linear[min(start >> 14, len(linear)-1)] if linear else 0
+            chunks     = sorted(chunk for bin in reg2bins(start, end) for chunk in bins.get(bin, []) if chunk[1] > min_offset)
+            merged     = []
+
+            for chunk in chunks:
+                if merged and chunk[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], chunk[1])
+                else:
+                    merged.append(list(chunk))
+
+            for chunk_start, chunk_end in merged:
+
+                bam.seek_virtual(max(chunk_start, min_offset))
+
+                while bam.tell_virtual() < chunk_end:
+
+                    data = cls.next_record(bam)
+
+                    if data is None:
+                        return
+
+                    record_ref, pos, l_read_name, _, _, n_cigar = unpack_from("<iiBBHH", data)
+
+                    # Records are sorted, nothing after this one can overlap
+                    if record_ref != ref_id or pos >= end:
+                        return
+
+                    if pos + max(cls.reference_length(data, l_read_name, n_cigar), 1) > start:
+                        yield cls.parse_record(data, names, binary)
+
+    @classmethod
+    def encode_record(cls, mapping: dict, ref_ids: dict[bytes, int])->bytes:
+
+        qname, flag, rname, pos, mapq, cigar, rnext, pnext, tlen, seq, qual = [
+            value if isinstance(value, bytes) else str(value).encode() for value in (mapping[key] for key in cls.sorted_keys)]
+
+        tags        = mapping.get("tags") or b""
+        tags        = tags if isinstance(tags, bytes) else tags.encode()
+        ref_id      = -1 if rname == b"*" else ref_ids[rname]
+        next_ref_id = ref_id if rnext == b"=" else -1 if rnext == b"*" else ref_ids[rnext]
+        pos         = int(pos) - 1
+        ops         = [] if cigar == b"*" else [(int(length), cls.cigar_ops.index(op)) for length, op in cls.cigar_pattern.findall(cigar)]
+        stop        = pos + max(sum(length for length, op in ops if op in cls.reference_ops), 1)
+        l_seq       = 0 if seq == b"*" else len(seq)
+        digits      = seq.translate(cls.base_to_hex) if l_seq else b""
+        packed      = bytes.fromhex((digits + b"0"*(l_seq % 2)).decode())
+        qual        = b"\xff"*l_seq if qual == b"*" else qual.translate(cls.ascii_to_phred)
+
+        body = b"".join([cls.core.pack(ref_id, pos, len(qname)+1, int(mapq), reg2bin(pos, stop), len(ops), int(flag),
+                                       l_seq, next_ref_id, int(pnext)-1, int(tlen)),
+                         qname, b"\x00",
+                         pack(f"<{len(ops)}I", *(length << 4 | op for length, op in ops)),
+                         packed,
+                         qual,
+                         cls.encode_tags(tags)])
+
+        return pack("<i", len(body)) + body
+
+    @classmethod
+    def encode_header(cls, header: dict)->bytes:
+
+        text = SamFileService.format_header(header).encode()
+
+        return b"".join([b"BAM\x01", pack("<i", len(text)), text, pack("<i", len(header["references"]))] +
+                        [pack("<i", len(name)+1) + name.encode() + b"\x00" + pack("<i", length)
+                         for name, length in header["references"].items()])
+
+    @classmethod
+    def write(cls, mappings: list[dict], file: str, compress_threads=1, binary=False, header: dict=None)->None:
+
+        # header is a dictionary as returned by read_header, it is required for the reference ids.
+        # The records may hold strings or bytes (binary is accepted for the interface of the SamFileService).
+
+        if header is None:
+            raise ValueError("Writing BAM requires a header with the references")
+
+        ref_ids = {name.encode(): i for i, name in enumerate(header["references"])}
+
+        with BufferedWriter(streams.BgzfWriter(streams.open_output(file, "wb"), compress_threads),
+                            streams.BgzfWriter.block_size) as bam:
+
+            bam.write(cls.encode_header(header))
+
+            for mapping in mappings:
+
+                bam.write(cls.encode_record(mapping, ref_ids))
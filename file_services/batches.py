@@ -0,0 +1,300 @@
+from numpy  import append, arange, array_equal, bincount, concatenate, cumsum, diff, flatnonzero, frombuffer, fromiter, int64, ndarray, ones, repeat, searchsorted, uint8, unique, where, zeros
+from typing import Any, Union
+
+from .records import PafRecord, parse_tags
+
+def get_offsets(lengths: ndarray)->ndarray:
+
+    offsets = zeros(len(lengths)+1, dtype=int64)
+    cumsum(lengths, out=offsets[1:])
+
+    return offsets
+
+class RecordBatch():
+    """
+    Columnar batch of FASTA/FASTQ entries.
+    Sequences, headers and qualities are each stored as one concatenated uint8 array,
+    value i spanning buffer[offsets[i]:offsets[i+1]], so that analyses can run
+    vectorized over all bases of a batch.
+    """
+
+    def __init__(self,
+                 headers:        ndarray,
+                 header_offsets: ndarray,
+                 sequences:      ndarray,
+                 offsets:        ndarray,
+                 qualities:      Union[ndarray, None] = None):
+
+        self.headers        = headers
+        self.header_offsets = header_offsets
+        self.sequences      = sequences
+        self.offsets        = offsets
+        self.lengths        = diff(offsets)
+        self.qualities      = qualities
+
+    @classmethod
+    def from_records(cls, records: list[bytes], file_type: str)->"RecordBatch":
+
+        # Parses complete raw entries (as yielded by split_records) without a python loop over lines:
+        # every line is assigned to its entry and classified as header, sequence or quality line,
+        # the bytes of each class are then gathered with one boolean mask.
+
+        buffer = frombuffer(b"".join(records), dtype=uint8)
+        starts = get_offsets(fromiter(map(len, records), dtype=int64, count=len(records)))[:-1]
+        lines  = concatenate(([0], flatnonzero(buffer == 10)+1))
+        lines  = lines[lines < len(buffer)]
+        spans  = diff(append(lines, len(buffer)))
+        sizes  = spans - (buffer[lines+spans-1] == 10)
+        entry  = searchsorted(starts, lines, "right") - 1
+        header = lines == starts[entry]
+
+        def gather(selected: ndarray)->tuple[ndarray, ndarray]:
+            mask  = repeat(selected, spans)
+            mask &= buffer != 10
+            return buffer[mask], get_offsets(bincount(entry, weights=sizes*selected, minlength=len(records)).astype(int64))
+
+        # Headers are few and short, they are gathered by index rather than by masking the whole buffer
+        lengths        = sizes[header] - 1
+        header_offsets = get_offsets(lengths)
+        headers        = buffer[arange(header_offsets[-1]) + repeat(lines[header]+1-header_offsets[:-1], lengths)]
+
+        if file_type == "fastq":
+            plus     = flatnonzero(~header & (buffer[lines] == 43))
+            _, first = unique(entry[plus], return_index=True)
+            if len(first) != len(records):
+                raise ValueError("FASTQ-entry without separator line")
+            plus     = plus[first][entry]
+            position = arange(len(lines))
+            sequences, offsets         = gather(~header & (position < plus))
+            qualities, quality_offsets = gather(position > plus)
+            if not array_equal(offsets, quality_offsets):
+                raise ValueError("FASTQ-entry with different sequence and quality lengths")
+        else:
+            sequences, offsets = gather(~header)
+            qualities          = None
+
+        return cls(headers, header_offsets, sequences, offsets, qualities)
+
+    def __len__(self)->int:
+
+        return len(self.lengths)
+
+    def header(self, i: int)->str:
+
+        return self.headers[self.header_offsets[i]:self.header_offsets[i+1]].tobytes().decode()
+
+    def sequence(self, i: int)->str:
+
+        return self.sequences[self.offsets[i]:self.offsets[i+1]].tobytes().decode()
+
+    def quality(self, i: int)->str:
+
+        return self.qualities[self.offsets[i]:self.offsets[i+1]].tobytes().decode()
+
+    def to_arrow(self):
+
+        # The arrow arrays are built on top of the numpy buffers without copying them
+
+        from pyarrow import array, Array, large_string, py_buffer, table
+
+        def column(data: ndarray, offsets: ndarray)->Array:
+            return Array.from_buffers(large_string(), len(self), [None, py_buffer(offsets), py_buffer(data)])
+
+        columns = {"header":   column(self.headers, self.header_offsets),
+                   "sequence": column(self.sequences, self.offsets),
+                   "length":   array(self.lengths)}
+
+        if self.qualities is not None:
+            columns["quality"] = column(self.qualities, self.offsets)
+
+        return table(columns)
+
+    def to_polars(self):
+
+        from polars import from_arrow
+
+        return from_arrow(self.to_arrow())
+
+def gather_spans(buffer: ndarray, starts: ndarray, ends: ndarray)->tuple[ndarray, ndarray]:
+
+    # Concatenates buffer[starts[i]:ends[i]] for all i, returns the bytes and their offsets
+
+    lengths = ends - starts
+    offsets = get_offsets(lengths)
+
+    return buffer[arange(offsets[-1]) + repeat(starts-offsets[:-1], lengths)], offsets
+
+def gather_strings(buffer: ndarray, starts: ndarray, ends: ndarray)->ndarray:
+
+    # buffer[starts[i]:ends[i]] for all i as one fixed-width bytes array (e.g. for unique() on names)
+
+    lengths   = ends - starts
+    width     = int(lengths.max(initial=1)) or 1
+    positions = (starts[:, None] + arange(width)).clip(max=len(buffer)-1)
+    matrix    = where(arange(width) < lengths[:, None], buffer[positions], 0).astype(uint8)
+
+    return matrix.view(f"S{width}").ravel()
+
+def parse_ints(buffer: ndarray, starts: ndarray, ends: ndarray)->ndarray:
+
+    # Decimal digits of all values at once: the digits are gathered into a (values x max. digits) matrix,
+    # right-aligned and padded with zeros, and multiplied with the powers of ten
+
+    lengths = ends - starts
+    width   = int(lengths.max(initial=1))
+
+    if width > 18:
+        raise ValueError("PAF-line with too large integer")
+
+    positions = starts[:, None] + arange(width) - (width - lengths[:, None])
+    padding   = positions < starts[:, None]
+    digits    = buffer[positions.clip(0)].astype(int64) - 48
+    digits[padding] = 0
+
+    if ((digits < 0) | (digits > 9)).any() or not lengths.all():
+        raise ValueError("PAF-line with non-integer column")
+
+    return digits @ (10 ** arange(width-1, -1, -1, dtype=int64))
+
+class PafBatch():
+    """
+    Columnar batch of PAF-lines.
+    The integer columns are parsed into int64 arrays without a python loop over lines, strands into a
+    "+"/"-" array. Names and optional fields stay in the buffer of the batch as (start, end) spans,
+    the optional fields are only parsed on request with tags(i).
+    """
+
+    int_columns = ("query_length",
+                   "query_start",
+                   "query_end",
+                   "target_length",
+                   "target_start",
+                   "target_end",
+                   "matches",
+                   "alignment_length",
+                   "alignment_quality")
+
+    def __init__(self, buffer: ndarray, columns: dict[str, ndarray], spans: dict[str, tuple[ndarray, ndarray]]):
+
+        self.buffer  = buffer
+        self.columns = columns
+        self.spans   = spans
+
+    @classmethod
+    def from_buffer(cls,
+                    data:          bytes,
+                    min_matches:   int = 0,
+                    min_quality:   int = 0,
+                    primary_only:  bool = False)->"PafBatch":
+
+        # data has to consist of complete lines. Field i of a line spans from the (i-1)-th to the i-th tab
+        # of the line, the optional fields from the 12th tab to the line break.
+
+        buffer = frombuffer(data, dtype=uint8)
+        ends   = flatnonzero(buffer == 10)
+        starts = concatenate(([0], ends[:-1]+1))[:len(ends)]
+        keep   = ends > starts
+        starts = starts[keep]
+        ends   = ends[keep]
+        tabs   = flatnonzero(buffer == 9)
+        first  = searchsorted(tabs, starts)
+        count  = searchsorted(tabs, ends) - first
+
+        if (count < 11).any():
+            raise ValueError("PAF-line with less than 12 columns")
+
+        def field(i: int)->tuple[ndarray, ndarray]:
+            start = starts if i == 0 else tabs[first+i-1] + 1
+            end   = tabs[first+i] if i < 11 else where(count > 11, tabs[(first+11).clip(max=len(tabs)-1)], ends)
+            return start, end
+
+        fields = [field(i) for i in range(12)]
+        tags   = (where(count > 11, fields[11][1]+1, ends), ends)
+
+        columns = {name: parse_ints(buffer, *fields[i])
+                   for name, i in zip(cls.int_columns, (1, 2, 3, 6, 7, 8, 9, 10, 11))}
+        columns["strand"] = buffer[fields[4][0]].view("S1")
+
+        mask = ones(len(starts), dtype=bool)
+        if min_matches:
+            mask &= columns["matches"] >= min_matches
+        if min_quality:
+            mask &= columns["alignment_quality"] >= min_quality
+        if primary_only:
+            # Lines with a tp:A: tag other than tp:A:P are secondary (or supplementary/inversions)
+            candidates = tabs[tabs < len(buffer)-6] + 1
+            for i, byte in enumerate(b"tp:A:"):
+                candidates = candidates[buffer[candidates+i] == byte]
+            line       = searchsorted(starts, candidates, "right") - 1
+            in_tags    = candidates >= tags[0][line]
+            mask[line[in_tags & (buffer[candidates+5] != 80)]] = False
+
+        spans = {"query_name":  fields[0],
+                 "target_name": fields[5],
+                 "tags":        tags}
+
+        return cls(buffer,
+                   {name: column[mask] for name, column in columns.items()},
+                   {name: (start[mask], end[mask]) for name, (start, end) in spans.items()})
+
+    def __len__(self)->int:
+
+        return len(self.columns["strand"])
+
+    def __getitem__(self, column: str)->ndarray:
+
+        return self.columns[column]
+
+    def get_string(self, column: str, i: int)->str:
+
+        start, end = self.spans[column]
+
+        return self.buffer[start[i]:end[i]].tobytes().decode()
+
+    def query_name(self, i: int)->str:
+
+        return self.get_string("query_name", i)
+
+    def target_name(self, i: int)->str:
+
+        return self.get_string("target_name", i)
+
+    def tags(self, i: int)->dict[str, Any]:
+
+        return parse_tags(self.get_string("tags", i))
+
+    def record(self, i: int)->PafRecord:
+
+        c = self.columns
+
+        return PafRecord(self.query_name(i),
+                         *(int(c[name][i]) for name in self.int_columns[:3]),
+                         c["strand"][i].decode(),
+                         self.target_name(i),
+                         *(int(c[name][i]) for name in self.int_columns[3:]),
+                         self.get_string("tags", i))
+
+    def to_arrow(self):
+
+        # Names and tags are gathered into arrow string arrays, the numpy columns are shared without copying
+
+        from pyarrow import array, Array, large_string, py_buffer, table
+
+        def column(name: str)->Array:
+            data, offsets = gather_spans(self.buffer, *self.spans[name])
+            return Array.from_buffers(large_string(), len(self), [None, py_buffer(offsets), py_buffer(data)])
+
+        columns = {"query_name":  column("query_name")}
+        columns.update({name: array(self.columns[name]) for name in self.int_columns[:3]})
+        columns["strand"]      = array(self.columns["strand"].astype("U1"))
+        columns["target_name"] = column("target_name")
+        columns.update({name: array(self.columns[name]) for name in self.int_columns[3:]})
+        columns["tags"]        = column("tags")
+
+        return table(columns)
+
+    def to_polars(self):
+
+        from polars import from_arrow
+
+        return from_arrow(self.to_arrow())
@@ -1,30 +1,58 @@
-from re import compile, finditer
-
-from . import fasta_file_service
-
-class BcalmFileService(fasta_file_service.FastaFileService):
-
-    r = {
-            "id":              compile(r"^>(?P<ID>\d+)"),
-            "length":          compile(r"LN:i:(?P<LENGTH>\d+)"),
-            "total abundance": compile(r"KC:i:(?P<TOTAL_ABUNDANCE>\d+)"),
-            "avg. abundance":  compile(r"km:f:(?P<AVG_ABUNDANCE>\d+\.\d)"),
-            "edges":           compile(r"(?P<EDGE>L:[-+]:\d:[-+])"),
-            "neighbors":       compile(r"L:[-+]:(?P<NEIGHBOR>\d):[-+]")
-            }
-
-    @classmethod
-    def parse_string(cls, string: str)->dict:
-
-        lines = string.split("\n")
-
-        return {
-            "id":              cls.r["id"].search(lines[0]).group("ID"),
-            "header":          lines[0][1:],
-            "length":          cls.r["length"].search(lines[0]).group("LENGTH"),
-            "total abundance": int(cls.r["total abundance"].search(lines[0]["header"]).group("TOTAL_ABUNDANCE")),
-            "avg. abundance":  float(cls.r["avg. abundance"].search(lines[0]["header"]).group("AVG_ABUNDANCE")),
-            "sequence":        "".join(lines[1:]),
-            "edges":           [match.group("EDGE") for match in finditer(cls.r["edges"], lines[0])],
-            "neighbors":       [match.group("NEIGHBOR") for match in finditer(cls.r["neighbors"], lines[0])]}
-
+from . import fasta_file_service
+
+class BcalmFileService(fasta_file_service.FastaFileService):
+
+    @staticmethod
+    def parse_header(header: bytes)->tuple:
+
+        # Fields of a unitig header (without ">") in one pass over its space-separated fields:
+        # id, length (LN), total (KC) and mean (km) k-mer abundance and the edges as
+        # (reverse, neighbor, neighbor reverse), e.g. L:+:12:- is (False, b"12", True).
+        # Missing fields are None.
+
+        name, *fields = header.split()
+        length        = None
+        total         = None
+        mean          = None
+        edges         = []
+
+        for field in fields:
+            match field[:3]:
+                case b"L:+" | b"L:-":
+                    _, reverse, neighbor, neighbor_reverse = field.split(b":")
+                    edges.append((reverse == b"-", neighbor, neighbor_reverse == b"-"))
+                case b"LN:":
+                    length = int(field[5:])
+                case b"KC:":
+                    total  = int(field[5:])
+                case b"km:":
+                    mean   = float(field[5:])
+
+        return name, length, total, mean, edges
+
+    @classmethod
+    def parse_string(cls, string: str)->dict:
+
+        header, _, sequence = string.partition("\n")
+        header              = header[1:].rstrip("\r")
+
+        id, length, total, mean, edges = cls.parse_header(header.encode())
+
+        return {
+            "id":              id.decode(),
+            "header":          header,
+            "length":          length,
+            "total abundance": total,
+            "avg. abundance":  mean,
+            "sequence":        sequence.replace("\n", "").replace("\r", ""),
+            "edges":           [f"L:{'-' if r else '+'}:{n.decode()}:{'-' if nr else '+'}" for r, n, nr in edges],
+            "neighbors":       [n.decode() for _, n, _ in edges]}
+
+    @staticmethod
+    def read_graph(file_path: str, overlap: int=0):
+
+        # Unitigs and their edges as a DbgGraph (integer ids, CSR adjacency, lazily read sequences)
+
+        from .dbg_graph import DbgGraph
+
+        return DbgGraph(file_path, "bcalm", overlap)
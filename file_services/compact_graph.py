@@ -0,0 +1,312 @@
+from mmap   import mmap, ACCESS_READ
+from os     import path
+from numpy  import (arange, argsort, ascontiguousarray, bincount, concatenate, cumsum, diff, empty, flatnonzero, frombuffer,
+                    full, int32, int64, maximum, minimum, ndarray, searchsorted, uint8, uint64, unique, zeros)
+from typing import Generator, Union
+
+from . import streams
+
+class CompactGraphError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+# Reverse complement of IUPAC codes, other characters are kept
+complement = bytes.maketrans(b"ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", b"TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn")
+
+def reverse_complement(sequence: bytes) -> bytes:
+
+    return sequence.translate(complement)[::-1]
+
+def components(n: int, sources: ndarray, targets: ndarray, labels: ndarray=None) -> ndarray:
+
+    # Connected components of an undirected graph with nodes 0..n-1 as labels (smallest node of each component).
+    # Vectorized union-find: the root of the larger label of every edge between two trees is hooked onto
+    # the smaller one, then pointer jumping (labels = labels[labels]) compresses all trees again.
+    # Edges within one tree are dropped, so later rounds only look at the remaining ones.
+    # The labels of a previous call can be passed to add the edges chunk by chunk.
+
+    labels = arange(n, dtype=int64) if labels is None else labels
+
+    while len(sources):
+
+        low, high = labels[sources], labels[targets]
+        between   = low != high
+        sources, targets, low, high = sources[between], targets[between], low[between], high[between]
+
+        if not len(sources):
+            break
+
+        minimum.at(labels, maximum(low, high), minimum(low, high))
+
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+
+    return labels
+
+def name_keys(names: ndarray) -> ndarray:
+
+    # 64-bit FNV-1a hashes of a fixed-width bytes array (including the padding), one column of bytes at a time
+
+    codes = ascontiguousarray(names).view(uint8).reshape(len(names), names.dtype.itemsize)
+    keys  = full(len(names), 14695981039346656037, uint64)
+
+    for column in codes.T:
+        keys ^= column
+        keys *= uint64(1099511628211)
+
+    return keys
+
+def map_file(file_path: str) -> Union[mmap, bytes]:
+
+    # Uncompressed files are memory-mapped, anything else is decompressed into memory
+
+    if streams.is_seekable(file_path):
+        with open(file_path, "rb") as f:
+            return mmap(f.fileno(), 0, access=ACCESS_READ) if path.getsize(file_path) else b""
+
+    with streams.open_input(file_path, binary=True) as f:
+        return f.read()
+
+def chunks(data: Union[mmap, bytes], chunk_size: int) -> Generator:
+
+    # Offset and bytes (uint8 array) of consecutive chunks of about chunk_size bytes, lines are never split
+
+    size     = len(data)
+    position = 0
+
+    while position < size:
+
+        end = min(position+chunk_size, size)
+        if end < size:
+            end = data.rfind(b"\n", position, end)+1 or (data.find(b"\n", end)+1 or size)
+
+        yield position, frombuffer(data, uint8, end-position, position)
+        position = end
+
+def split_lines(buffer: ndarray) -> tuple[ndarray, ndarray]:
+
+    # Starts and ends (without line break) of the non-empty lines of buffer
+
+    newlines = flatnonzero(buffer == 10)
+    starts   = concatenate(([0], newlines+1))
+    ends     = concatenate((newlines, [len(buffer)]))
+    keep     = ends > starts
+    starts   = starts[keep]
+    ends     = ends[keep]
+    ends    -= buffer[ends-1] == 13                                 # CRLF
+
+    return starts, ends
+
+class CompactGraph():
+    """
+    Base class of the graphs loaded into integer arrays (GfaGraph, DbgGraph).
+
+    Segments (unitigs, edges of FASTG) get the ids 0..n-1, names maps them back to the names in the file.
+    A segment in forward or reverse orientation is the node 2*id or 2*id+1, the edges between nodes are stored
+    as CSR adjacency: the successors of node v are targets[offsets[v]:offsets[v+1]], overlaps holds
+    the overlap of each edge. Every edge u -> v has its complement v^1 -> u^1.
+
+    Memory is kept close to the size of the arrays themselves: nodes are int32 unless there are more than 2^31,
+    the adjacency is filled chunk by chunk and the Python list and dict of the names are only built when needed.
+    """
+
+    error      = CompactGraphError
+
+    # Bytes scanned at once
+    chunk_size = 1 << 24
+
+    # Edges handled at once by edge_chunks()
+    edge_chunk_size = 1 << 22
+
+    def __init__(self) -> None:
+
+        self.name_list  = None              # Segment names (bytes), see names
+        self.id_map     = None              # Segment name -> id, see ids
+        self.name_array = zeros(0, "S1")    # Segment names as fixed-width bytes array
+        self.name_order = zeros(0, int64)   # Segment ids sorted by name_keys (or by name, see set_names)
+        self.name_keys  = zeros(0, uint64)  # Sorted name_keys
+        self.lengths    = zeros(0, int64)
+        self.targets    = zeros(0, int32)
+        self.overlaps   = zeros(0, int32)
+        self.offsets    = zeros(1, int64)
+
+    @property
+    def node_type(self) -> type:
+
+        return int32 if 2*len(self) < 2**31 else int64
+
+    def build_adjacency(self, edges: list) -> None:
+
+        # CSR adjacency of the edges, given as chunks (sources, targets, overlaps or None) of nodes, in the order of
+        # their sources. Counting sort: the offsets are counted first, then each chunk is sorted on its own and
+        # moved behind the edges of the previous chunks. Chunks are removed from edges once they are stored.
+
+        n_nodes = 2*len(self)
+        counts  = zeros(n_nodes, int64)
+
+        for sources, _, _ in edges:
+            counts += bincount(sources, minlength=n_nodes)
+
+        self.offsets  = zeros(n_nodes+1, int64)
+        cumsum(counts, out=self.offsets[1:])
+        self.targets  = empty(int(self.offsets[-1]), self.node_type)
+        self.overlaps = zeros(int(self.offsets[-1]), int32)
+        cursors       = self.offsets[:-1].copy()
+
+        while edges:
+            sources, targets, overlaps = edges.pop(0)
+            order                      = argsort(sources, kind="stable")
+            sources                    = sources[order]
+            positions                  = cursors[sources] + arange(len(sources)) - searchsorted(sources, sources)
+            self.targets[positions]    = targets[order]
+            if overlaps is not None:
+                self.overlaps[positions] = overlaps[order]
+            cursors += bincount(sources, minlength=n_nodes)
+
+    @property
+    def segment_lengths(self) -> ndarray:
+
+        return self.lengths
+
+    def __len__(self) -> int:
+
+        return len(self.name_array)
+
+    def n_links(self) -> int:
+
+        return len(self.targets)//2
+
+    @property
+    def names(self) -> list:
+
+        if self.name_list is None:
+            self.name_list = self.name_array.tolist()
+
+        return self.name_list
+
+    @property
+    def ids(self) -> dict:
+
+        if self.id_map is None:
+            self.id_map = dict(zip(self.names, range(len(self))))
+
+        return self.id_map
+
+    def set_names(self, names: ndarray) -> None:
+
+        # Segment names from a fixed-width bytes array, duplicates are not allowed.
+        # Names are looked up by binary search in their sorted hashes, which is much faster than comparing bytes.
+        # If two names have the same hash (duplicates or, rarely, a collision) the sorted names are searched instead.
+
+        self.name_array = names
+        self.name_list  = None
+        self.id_map     = None
+        keys            = name_keys(names)
+        self.name_order = argsort(keys)
+        self.name_keys  = keys[self.name_order]
+
+        if (self.name_keys[1:] == self.name_keys[:-1]).any():
+            self.name_order = argsort(names, kind="stable")
+            self.name_keys  = None
+            sorted_names    = names[self.name_order]
+            duplicates      = flatnonzero(sorted_names[1:] == sorted_names[:-1])
+            if len(duplicates):
+                raise self.error(f"Duplicate segment {sorted_names[duplicates[0]].decode()}")
+
+    def get_ids(self, names: ndarray) -> ndarray:
+
+        # Ids of a fixed-width bytes array of names. The names are searched in sorted order,
+        # consecutive searches then hit the same part of the sorted keys.
+
+        if self.name_keys is not None:
+            keys, queries = self.name_keys, name_keys(names.astype(self.name_array.dtype))
+        else:
+            keys, queries = self.name_array[self.name_order], names
+
+        order            = argsort(queries)
+        positions        = empty(len(names), int64)
+        positions[order] = searchsorted(keys, queries[order])
+        ids              = self.name_order[positions.clip(max=len(keys)-1)] if len(keys) else positions
+        found            = self.name_array[ids] == names if len(keys) else zeros(len(names), bool)
+
+        if not found.all():
+            raise self.error(f"Undefined segment {names[flatnonzero(~found)[0]].decode()}")
+
+        return ids
+
+    def get_id(self, name: bytes) -> int:
+
+        if name not in self.ids:
+            raise self.error(f"Undefined segment {name.decode()}")
+
+        return self.ids[name]
+
+    def segment_id(self, segment: Union[int, bytes, str]) -> int:
+
+        if isinstance(segment, str):
+            segment = segment.encode()
+
+        return segment if isinstance(segment, int) else self.get_id(segment)
+
+    def edges(self) -> tuple[ndarray, ndarray]:
+
+        # Sources and targets of all edges (nodes)
+
+        return arange(2*len(self), dtype=self.node_type).repeat(diff(self.offsets)), self.targets
+
+    def edge_chunks(self) -> Generator:
+
+        # Sources and targets of the edges of consecutive nodes, about edge_chunk_size edges at once
+
+        n_nodes = 2*len(self)
+        start   = 0
+
+        while start < n_nodes:
+            end = int(searchsorted(self.offsets, self.offsets[start]+self.edge_chunk_size, "right"))-1
+            end = min(max(end, start+1), n_nodes)
+            yield (arange(start, end, dtype=self.node_type).repeat(diff(self.offsets[start:end+1])),
+                   self.targets[self.offsets[start]:self.offsets[end]])
+            start = end
+
+    def successors(self, node: int) -> ndarray:
+
+        return self.targets[self.offsets[node]:self.offsets[node+1]]
+
+    def predecessors(self, node: int) -> ndarray:
+
+        # u -> v exists exactly if v^1 -> u^1 does
+
+        return self.successors(node ^ 1) ^ 1
+
+    def neighbors(self, segment: Union[int, bytes, str]) -> ndarray:
+
+        # Ids of the segments linked to segment in any orientation
+
+        segment = self.segment_id(segment)
+
+        return unique(concatenate((self.successors(2*segment), self.successors(2*segment+1))) >> 1)
+
+    def components(self) -> ndarray:
+
+        # Component label of each segment (the smallest segment id in its component), edges are added chunk by chunk
+
+        labels = arange(len(self), dtype=int64)
+
+        for sources, targets in self.edge_chunks():
+            labels = components(len(self), sources >> 1, targets >> 1, labels)
+
+        return labels
+
+    def link_overlap(self, source: int, target: int) -> int:
+
+        # Overlap of the link source -> target (nodes), 0 if there is no such link
+
+        first = self.offsets[source]
+        hits  = flatnonzero(self.successors(source) == target)
+
+        return int(self.overlaps[first + hits[0]]) if len(hits) else 0
@@ -0,0 +1,242 @@
+from itertools import islice
+from numpy     import add, append, arange, argsort, array, cumsum, int32, int64, memmap, searchsorted, unique, where, zeros
+from os        import path, remove
+from typing    import Iterable
+
+from . import registry
+from . import streams
+from .alignment_stats import parse_cigars
+from .batches import gather_strings
+
+class Coverage():
+    """
+    Per-base coverage of the targets of PAF-, SAM- or BAM-alignments.
+
+    Each aligned block adds +1 at its start and -1 at its end to a difference array of its target,
+    the depth is the cumulative sum of that array. Blocks are collected in batches (CIGAR strings of SAM/BAM
+    are expanded into blocks for a whole batch at once) and added with one numpy call per target.
+    Memory is one int32 per base of each covered target. Targets with at least memmap_length bases,
+    known from the header or grown to, are backed by files in memmap_dir instead.
+    """
+
+    # CIGAR operations: M, = and X are aligned bases, D and N skip reference bases without covering them
+    # (like samtools depth), all others do not consume the reference
+    block_codes     = array([1, 0, 0, 0, 0, 0, 0, 1, 1], dtype=bool)
+    reference_codes = array([1, 0, 1, 1, 0, 0, 0, 1, 1], dtype=bool)
+
+    def __init__(self,
+                 lengths:       dict[str, int] = None,
+                 memmap_dir:    str = None,
+                 memmap_length: int = 1 << 26,
+                 batch_size:    int = 1 << 16):
+
+        self.lengths       = dict(lengths or {})
+        self.memmap_dir    = memmap_dir
+        self.memmap_length = memmap_length
+        self.batch_size    = batch_size
+        self.arrays        = {}
+        self.files         = []
+        self.finished      = False
+
+    def allocate(self, size: int):
+
+        # Zeroed int32 array, backed by a new file in memmap_dir from memmap_length bases on
+
+        if self.memmap_dir is not None and size > self.memmap_length:
+            self.files.append(path.join(self.memmap_dir, f"{len(self.files)}.cov"))
+            return memmap(self.files[-1], int32, "w+", shape=(size,))
+
+        return zeros(size, int32)
+
+    def get_array(self, target: str, end: int):
+
+        # Difference array of target, allocated on first use. Targets of unknown length
+        # (e.g. SAM without @SQ-lines) are grown to the largest end seen, by the size they
+        # have grown to they move into a memory-mapped file like targets of known length.
+
+        if target not in self.arrays:
+            length = max(self.lengths.get(target, 0), end)
+            self.arrays[target]  = self.allocate(length+1)
+            self.lengths[target] = length
+        elif end > self.lengths[target]:
+            if end >= len(self.arrays[target]):
+                old   = self.arrays[target]
+                grown = self.allocate(max(end+1, 2*len(old)))
+                grown[:len(old)]    = old
+                self.arrays[target] = grown
+                if isinstance(old, memmap):
+                    file = old.filename
+                    del old
+                    remove(file)
+            self.lengths[target] = end
+
+        return self.arrays[target]
+
+    def add_blocks(self, targets: list[str], ids, starts, ends)->None:
+
+        # Adds the blocks [starts[i], ends[i]) on targets[ids[i]]
+
+        if self.finished:
+            raise ValueError("Blocks cannot be added after the depth was computed")
+
+        keep  = ends > starts
+        ids, starts, ends = ids[keep], starts[keep].clip(0), ends[keep]
+        order = argsort(ids, kind="stable")
+        edges = searchsorted(ids[order], arange(len(targets)+1))
+
+        for i, target in enumerate(targets):
+
+            selected = order[edges[i]:edges[i+1]]
+
+            if len(selected):
+                difference = self.get_array(target, int(ends[selected].max()))
+                add.at(difference, starts[selected], 1)
+                add.at(difference, ends[selected], -1)
+
+    def expand_cigars(self, positions, cigars: list[bytes])->tuple:
+
+        # Aligned blocks of all CIGAR strings at once: record index, start and end of each block.
+        # positions are the 0-based starts of the alignments.
+
+        records, codes, lengths = parse_cigars(cigars)
+
+        consumed  = where(self.reference_codes[codes], lengths, 0)
+        offsets   = cumsum(consumed) - consumed
+        offsets  -= offsets[searchsorted(records, records)]
+        blocks    = self.block_codes[codes]
+        starts    = positions[records[blocks]] + offsets[blocks]
+
+        return records[blocks], starts, starts + lengths[blocks]
+
+    def add_paf(self, file, min_quality=0, primary_only=False)->None:
+
+        # Coverage of the target intervals of the alignments, PAF does not describe their gaps without cs/cg-tags
+
+        from .paf_file_service import PafFileService
+
+        for batch in PafFileService.read_batches(file, min_quality=min_quality, primary_only=primary_only):
+
+            names, first, ids = unique(gather_strings(batch.buffer, *batch.spans["target_name"]),
+                                       return_index=True,
+                                       return_inverse=True)
+            targets           = [name.decode() for name in names.tolist()]
+
+            for target, length in zip(targets, batch["target_length"][first].tolist()):
+                self.lengths.setdefault(target, length)
+
+            self.add_blocks(targets, ids, batch["target_start"], batch["target_end"])
+
+    def add_sam(self, file, exclude_flags=0x704, min_quality=0, service=None)->None:
+
+        # By default unmapped, secondary, QC-failed and duplicate reads are skipped like in samtools depth.
+        # service is the SamFileService or BamFileService.
+
+        if service is None:
+            from .sam_file_service import SamFileService
+            service = SamFileService
+
+        # Pipes can only be read once, their targets end with the last aligned base
+        if not streams.is_pipe(file):
+            for target, length in service.read_header(file)["references"].items():
+                self.lengths.setdefault(target, length)
+
+        records = service.read(file, binary=True, exclude_flags=exclude_flags|4, min_quality=min_quality)
+
+        while batch := list(islice(records, self.batch_size)):
+
+            batch = [record for record in batch if record.CIGAR != b"*"]
+
+            if not batch:
+                continue
+
+            ids     = {}
+            targets = array([ids.setdefault(record.RNAME, len(ids)) for record in batch], dtype=int64)
+
+            records_of_blocks, starts, ends = self.expand_cigars(array([record.POS-1 for record in batch], dtype=int64),
+                                                                 [record.CIGAR for record in batch])
+
+            self.add_blocks([target.decode() for target in ids], targets[records_of_blocks], starts, ends)
+
+    def add(self, file, min_quality=0, exclude_flags=0x704, primary_only=False)->None:
+
+        # Adds the alignments of a PAF-, SAM- or BAM-file, the format is detected by the registry
+
+        file_format = registry.get_format(file, "alignments")
+
+        if file_format.name == "paf":
+            self.add_paf(file, min_quality, primary_only)
+        else:
+            self.add_sam(file, exclude_flags, min_quality, file_format.service)
+
+    def finish(self)->None:
+
+        # Turns the difference arrays into depths in place
+
+        if not self.finished:
+            for difference in self.arrays.values():
+                cumsum(difference, out=difference)
+            self.finished = True
+
+    def depth(self, target: str):
+
+        # Per-base depth of target (0-based positions), zeros for targets without alignments
+
+        self.finish()
+
+        if target not in self.arrays:
+            return zeros(self.lengths[target], int32)
+
+        return self.arrays[target][:self.lengths[target]]
+
+    def breadth(self, target: str, thresholds: Iterable[int]=(1,), chunk_size: int=1 << 24)->dict[int, float]:
+
+        # Fraction of the bases of target covered at least threshold times, counted chunk by chunk
+        # so that memory-mapped depths are not loaded at once
+
+        depth   = self.depth(target)
+        covered = dict.fromkeys(thresholds, 0)
+
+        for start in range(0, len(depth), chunk_size):
+            chunk = depth[start:start+chunk_size]
+            for threshold in covered:
+                covered[threshold] += int((chunk >= threshold).sum())
+
+        return {threshold: n/max(len(depth), 1) for threshold, n in covered.items()}
+
+    def mean(self, target: str)->float:
+
+        depth = self.depth(target)
+
+        return int(depth.sum(dtype=int64))/max(len(depth), 1)
+
+    def windows(self, target: str, size: int)->tuple:
+
+        # Starts and mean depths of consecutive windows of size bases, the last one may be shorter
+
+        depth  = self.depth(target)
+        starts = arange(0, len(depth), size)
+
+        if not len(starts):
+            return starts, zeros(0)
+
+        sums = add.reduceat(depth, starts, dtype=int64)
+
+        return starts, sums / (append(starts[1:], len(depth)) - starts)
+
+    def targets(self)->list[str]:
+
+        return list(self.lengths)
+
+    def close(self)->None:
+
+        # Removes the memory-mapped files
+
+        for target in list(self.arrays):
+            if isinstance(self.arrays[target], memmap):
+                del self.arrays[target]
+
+        for file in self.files:
+            if path.isfile(file):
+                remove(file)
+
+        self.files = []
@@ -0,0 +1,242 @@
+from numpy  import (append, arange, argsort, bincount, concatenate, empty_like, flatnonzero, float64, full, int32, int64,
+                    minimum, ndarray, searchsorted, sort, unique, zeros)
+from typing import Union
+
+from . import registry
+from .batches       import gather_strings
+from .compact_graph import CompactGraph, CompactGraphError, chunks, map_file, reverse_complement, split_lines
+
+class DbgGraphError(CompactGraphError):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+def within(positions: ndarray, starts: ndarray, ends: ndarray) -> tuple[ndarray, ndarray]:
+
+    # The positions inside the lines [starts[i], ends[i]) and the index of their line
+
+    owners = searchsorted(starts, positions, "right") - 1
+    inside = (owners >= 0) & (positions < ends[owners.clip(0)])
+
+    return positions[inside], owners[inside]
+
+def is_orientation(values: ndarray) -> ndarray:
+
+    return (values == 43) | (values == 45)                              # "+", "-"
+
+class DbgGraph(CompactGraph):
+    """
+    Compact de Bruijn graph of BCALM unitigs or of the edges of a SPAdes FASTG-file as integer arrays.
+
+    Segments (unitigs or FASTG edges) get the ids 0..n-1 in the order they first appear, lengths holds their
+    lengths and abundances their mean k-mer abundance (km-tag of BCALM, cov of FASTG). Both formats list
+    the outgoing edges of each segment in both orientations, they are stored as given in the CSR adjacency
+    of CompactGraph (which then contains the complement of every edge).
+
+    The file is read in one pass, chunk by chunk: the header lines of a chunk are split into their fields
+    at once with numpy (like GfaGraph does for S- and L-lines), so each header is parsed once and without
+    a Python loop over the records. Sequences stay in the (memory-mapped) file and are only read by sequence().
+    overlap is the number of bases shared by linked segments (k-1 for BCALM, k for SPAdes).
+    """
+
+    error = DbgGraphError
+
+    def __init__(self, file_path: str, file_format: str=None, overlap: int=0):
+
+        super().__init__()
+
+        self.file_path   = file_path
+        self.file_format = file_format or registry.get_format(file_path, "graph").name
+        self.overlap     = overlap
+        self.data        = map_file(file_path)
+
+        if self.file_format not in ("bcalm", "fastg"):
+            raise DbgGraphError(f"Cannot load {self.file_format} as de Bruijn graph")
+
+        self.parse()
+
+    def parse(self) -> None:
+
+        parse_headers = self.parse_fastg_headers if self.file_format == "fastg" else self.parse_bcalm_headers
+        records       = []          # Per chunk: names, reverse, lengths, abundances, header starts, sequence starts
+        edges         = []          # Per chunk: record, reverse, neighbor names, neighbor reverse
+        n_records     = 0
+
+        for offset, buffer in chunks(self.data, self.chunk_size):
+
+            starts, ends = split_lines(buffer)
+            headers      = buffer[starts] == 62                         # ">"
+            starts, ends = starts[headers], ends[headers]
+
+            if not len(starts):
+                continue
+
+            chunk_records, chunk_edges = parse_headers(buffer, starts, ends, offset)
+
+            records.append(chunk_records + (starts+offset, ends+1+offset))
+            edges.append((chunk_edges[0]+n_records,) + chunk_edges[1:])
+            n_records += len(starts)
+
+        if not records:
+            self.sequence_starts = self.sequence_ends = zeros(0, int64)
+            self.abundances      = zeros(0, float64)
+            return
+
+        names, reverse, lengths, abundances, header_starts, sequence_starts = (concatenate(c) for c in zip(*records))
+
+        # FASTG has a record for each orientation of an edge, they share the segment.
+        # Segments are numbered in the order of their first record.
+        distinct, first, inverse = unique(names, return_index=True, return_inverse=True)
+        order                    = argsort(first, kind="stable")
+        rank                     = empty_like(order)
+        rank[order]              = arange(len(order))
+        segments                 = rank[inverse]
+
+        self.set_names(distinct[order])
+        self.lengths    = lengths[first[order]]
+        self.abundances = abundances[first[order]]
+
+        nodes  = 2*segments + reverse
+        counts = bincount(nodes)
+
+        if (counts > 1).any():
+            node   = int(flatnonzero(counts > 1)[0])
+            suffix = "'" if node & 1 else ""
+            raise DbgGraphError(f"Duplicate record of {self.names[node >> 1].decode()}{suffix}")
+
+        # Sequence spans per node, -1 for nodes without record (the reverse orientation in BCALM)
+        self.sequence_starts        = full(2*len(self), -1, int64)
+        self.sequence_ends          = full(2*len(self), -1, int64)
+        self.sequence_ends[nodes]   = append(header_starts[1:], len(self.data))
+        self.sequence_starts[nodes] = minimum(sequence_starts, self.sequence_ends[nodes])
+
+        # Headers without length, the bases are counted
+        for id in flatnonzero(self.lengths < 0).tolist():
+            self.lengths[id] = len(self.sequence(id))
+
+        # The neighbor names are resolved chunk by chunk and dropped
+        nodes = nodes.astype(self.node_type)
+
+        for i, (edge_records, edge_reverse, neighbors, neighbor_reverse) in enumerate(edges):
+            edges[i] = (nodes[edge_records] + edge_reverse.astype(self.node_type),
+                        2*self.get_ids(neighbors).astype(self.node_type) + neighbor_reverse.astype(self.node_type),
+                        full(len(neighbors), self.overlap, int32))
+
+        self.build_adjacency(edges)
+
+    def numbers(self, buffer: ndarray, starts: ndarray, ends: ndarray, dtype, offset: int) -> ndarray:
+
+        # Values of the header fields buffer[starts[i]:ends[i]]
+
+        values = gather_strings(buffer, starts, ends)
+
+        try:
+            return values.astype(dtype)
+        except ValueError:
+            for start, value in zip(starts.tolist(), values.tolist()):
+                try:
+                    dtype(value.decode())
+                except ValueError:
+                    raise DbgGraphError(f"Invalid number {value.decode()} at byte {offset+start}")
+
+    def parse_bcalm_headers(self, buffer: ndarray, starts: ndarray, ends: ndarray, offset: int) -> tuple:
+
+        # >id LN:i:length KC:i:count km:f:abundance L:+:id:- ...
+        # The fields start at the spaces of the header lines, the kind of a field is given by its first bytes.
+
+        n              = len(starts)
+        last           = len(buffer)-1
+        spaces, owners = within(flatnonzero(buffer == 32), starts, ends)
+        name_ends      = minimum(append(spaces, len(buffer))[searchsorted(spaces, starts)], ends)
+        field_ends     = minimum(append(spaces[1:], len(buffer)), ends[owners])
+
+        def has_prefix(prefix: bytes) -> ndarray:
+            found = field_ends-spaces > len(prefix)
+            for i, byte in enumerate(prefix):
+                found &= buffer[(spaces+1+i).clip(max=last)] == byte
+            return found
+
+        lengths    = full(n, -1, int64)
+        abundances = zeros(n, float64)
+
+        for prefix, values, dtype in ((b"LN:i:", lengths, int64), (b"km:f:", abundances, float64)):
+            selected = has_prefix(prefix)
+            values[owners[selected]] = self.numbers(buffer, spaces[selected]+6, field_ends[selected], dtype, offset)
+
+        # L:+:id:- (orientation of this unitig, neighbor, orientation of the neighbor)
+        selected  = has_prefix(b"L:")
+        links     = spaces[selected]+1
+        link_ends = field_ends[selected]
+        valid     = ((link_ends-links >= 7) &
+                     (buffer[(links+3).clip(max=last)] == 58) & (buffer[link_ends-2] == 58) &
+                     is_orientation(buffer[(links+2).clip(max=last)]) & is_orientation(buffer[link_ends-1]))
+
+        if not valid.all():
+            start, end = int(links[~valid][0]), int(link_ends[~valid][0])
+            raise DbgGraphError(f"Invalid link at byte {offset+start}: {bytes(buffer[start:end]).decode()}")
+
+        return ((gather_strings(buffer, starts+1, name_ends), zeros(n, int64), lengths, abundances),
+                (owners[selected],
+                 (buffer[links+2] == 45).astype(int64),
+                 gather_strings(buffer, links+4, link_ends-2),
+                 (buffer[link_ends-1] == 45).astype(int64)))
+
+    def parse_fastg_headers(self, buffer: ndarray, starts: ndarray, ends: ndarray, offset: int) -> tuple:
+
+        # >EDGE_1_length_5_cov_2.5':EDGE_2_length_4_cov_1.0',EDGE_3_length_4_cov_1.0;
+        # The edge of the record is followed by its neighbors after ":", separated by ",". An edge ends
+        # with ' if it is the reverse complement, its fields are found at its last four underscores.
+
+        n                  = len(starts)
+        last               = len(buffer)-1
+        ends               = ends - ((ends > starts+1) & (buffer[ends-1] == 59))           # ";"
+        delimiters, owners = within(flatnonzero((buffer == 58) | (buffer == 44)), starts, ends)
+        edge_starts        = concatenate((starts+1, delimiters+1))
+        edge_owners        = concatenate((arange(n), owners))
+        order              = argsort(edge_starts, kind="stable")
+        edge_starts        = edge_starts[order]
+        edge_owners        = edge_owners[order]
+        boundaries         = sort(concatenate((delimiters, ends)))
+        edge_ends          = boundaries[searchsorted(boundaries, edge_starts)]
+        reverse            = (edge_ends > edge_starts) & (buffer[(edge_ends-1).clip(0)] == 39)     # "'"
+        stops              = edge_ends - reverse
+        underscores        = append(flatnonzero(buffer == 95), len(buffer))
+        previous           = searchsorted(underscores, stops)
+
+        # Underscores before "length", the length, "cov" and the coverage
+        length_at, length_end, cov_at, cov_end = (underscores[(previous-i).clip(0)] for i in (4, 3, 2, 1))
+
+        valid = (previous >= 5) & (length_at > edge_starts+5) & (length_end < cov_at) & (cov_end < stops)
+        for i, byte in enumerate(b"EDGE_"):
+            valid &= buffer[(edge_starts+i).clip(max=last)] == byte
+        valid &= gather_strings(buffer, (length_at+1).clip(max=length_end), length_end) == b"length"
+        valid &= gather_strings(buffer, (cov_at+1).clip(max=cov_end), cov_end) == b"cov"
+
+        if not valid.all():
+            line = int(edge_owners[~valid][0])
+            raise DbgGraphError(f"Invalid header at byte {offset+int(starts[line])}: "
+                                f"{bytes(buffer[starts[line]:ends[line]]).decode()}")
+
+        names   = gather_strings(buffer, edge_starts+5, length_at)
+        record  = edge_starts == starts[edge_owners]+1
+        lengths = self.numbers(buffer, length_end[record]+1, cov_at[record], int64, offset)
+        cov     = self.numbers(buffer, cov_end[record]+1, stops[record], float64, offset)
+
+        return ((names[record], reverse[record].astype(int64), lengths, cov),
+                (edge_owners[~record], zeros(int((~record).sum()), int64), names[~record], reverse[~record].astype(int64)))
+
+    def sequence(self, segment: Union[int, bytes, str], reverse: bool=False) -> bytes:
+
+        # Sequence lines of the record of the node, the reverse complement of the other orientation
+        # if there is no such record (BCALM)
+
+        node = 2*self.segment_id(segment) + reverse
+
+        for record, flip in ((node, False), (node ^ 1, True)):
+            start, end = int(self.sequence_starts[record]), int(self.sequence_ends[record])
+            if start >= 0:
+                sequence = bytes(self.data[start:end]).replace(b"\n", b"").replace(b"\r", b"")
+                return reverse_complement(sequence) if flip else sequence
+
+        raise DbgGraphError(f"Segment {self.names[node >> 1].decode()} has no sequence")
@@ -1,23 +1,157 @@
-from . import fasta_like_file_service
-
-class FastaFileService(fasta_like_file_service.FastaLikeFileService):
-
-    separator = ">"
-
-    @classmethod
-    def parse_string(cls, string: str)->dict:
-
-        lines    = string.split("\n")
-        header   = lines[0][1:]
-        sequence = "".join(lines[1:])
-
-        return {"header": header,
-                "sequence": sequence,
-                "length": len(sequence),
-                "file_type": "fasta"}
-
-    @classmethod
-    def parse_dict(cls, read: dict)->str:
-        
-        return cls.separator+read["header"]+"\n"+read["sequence"]+"\n"
-
+from mmap import mmap, ACCESS_READ
+from os   import path, stat
+
+from . import fasta_like_file_service
+from . import streams
+from .records import FastaRecord
+
+class FastaIndexError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+class FastaFileService(fasta_like_file_service.FastaLikeFileService):
+
+    separator       = ">"
+    file_type       = "fasta"
+    record_type     = FastaRecord
+    sequence_fields = {"sequence"}
+    indices         = {}
+    mmaps           = {}
+    versions        = {}
+
+    @classmethod
+    def parse_string(cls, string: str)->FastaRecord:
+
+        header, _, sequence = string.partition("\n")
+
+        return FastaRecord(header[1:], sequence.replace("\n", ""))
+
+    @classmethod
+    def parse_dict(cls, read: dict)->str:
+        
+        return cls.separator+read["header"]+"\n"+read["sequence"]+"\n"
+
+    @classmethod
+    def parse_bytes(cls, record: bytes)->FastaRecord:
+
+        header, _, sequence = bytes(record).partition(b"\n")
+
+        return FastaRecord(header[1:], sequence.replace(b"\n", b""))
+
+    @classmethod
+    def parse_dict_bytes(cls, read: dict)->bytes:
+
+        return b"".join([b">", read["header"], b"\n", read["sequence"], b"\n"])
+
+    @classmethod
+    def scan_bytes(cls, record: bytes, binary=False)->tuple:
+
+        # Values of a FastaRecord without the sequence, the length is the number of bytes besides line breaks
+
+        header_end = record.find(b"\n") + 1 or len(record)
+        header     = bytes(record[1:header_end].rstrip(b"\n"))
+
+        return (header if binary else header.decode(),
+                None,
+                len(record) - header_end - record.count(b"\n", header_end),
+                cls.file_type)
+
+    @classmethod
+    def build_index(cls, file_path: str)->dict[str, tuple[int, int, int, int]]:
+
+        # samtools faidx compatible: NAME -> (LENGTH, OFFSET, LINEBASES, LINEWIDTH)
+
+        if not streams.is_seekable(file_path):
+            raise FastaIndexError(f"Cannot index compressed file or pipe {file_path}")
+
+        index  = {}
+        offset = 0
+
+        with open(file_path, "rb") as f:
+
+            for record in cls.split_records(f):
+
+                header_end = record.find(b"\n") + 1 or len(record)
+                sequence   = record[header_end:]
+                name       = (record[1:header_end].split(None, 1) or [b""])[0].decode()
+                width      = sequence.find(b"\n") + 1 or len(sequence) + 1
+                bases      = len(sequence[:width].rstrip(b"\r\n"))
+                length     = len(sequence) - sequence.count(b"\n") - sequence.count(b"\r")
+                stored     = sequence.rstrip(b"\r\n")
+
+                # Every line but the last one has to be of the same length
+                if bases:
+                    breaks = stored[width-1::width]
+                    if (len(stored) != (length // bases) * width + (length % bases or bases - width) or
+                        stored.count(b"\n") != breaks.count(b"\n") or
+                        len(breaks) != breaks.count(b"\n")):
+                        raise FastaIndexError(f"Different line lengths in sequence {name}")
+
+                if name not in index:
+                    index[name] = (length, offset+header_end, bases, width)
+
+                offset += len(record)
+
+        return index
+
+    @classmethod
+    def get_index(cls, file_path: str)->dict[str, tuple[int, int, int, int]]:
+
+        # The .fai is reused as long as it is not older than the FASTA-file.
+        # The index and memory map cached for an older version (size, modification time) are dropped.
+
+        status  = stat(file_path)
+        version = (status.st_size, status.st_mtime_ns)
+
+        if file_path in cls.indices:
+            if cls.versions[file_path] == version:
+                return cls.indices[file_path]
+            if file_path in cls.mmaps:
+                cls.mmaps.pop(file_path).close()
+
+        cls.versions[file_path] = version
+
+        fai = file_path + ".fai"
+
+        if path.isfile(fai) and path.getmtime(fai) >= path.getmtime(file_path):
+            with open(fai, "r") as f:
+                index = {line[0]: tuple(int(x) for x in line[1:5])
+                         for line in (line.rstrip("\n").split("\t") for line in f)}
+        else:
+            index = cls.build_index(file_path)
+            # Next to a FASTA-file in a read-only directory the index is only kept in memory
+            try:
+                with open(fai, "w") as f:
+                    for name, entry in index.items():
+                        f.write("\t".join([name]+[str(x) for x in entry])+"\n")
+            except OSError:
+                pass
+
+        cls.indices[file_path] = index
+
+        return index
+
+    @classmethod
+    def fetch(cls, file_path: str, name: str, start: int=None, end: int=None)->str:
+
+        # Coordinates are 0-based and end-exclusive like python slices.
+        # Only the requested bytes of the memory-mapped file are touched.
+
+        length, offset, bases, width = cls.get_index(file_path)[name]
+
+        start = 0 if start is None else max(start, 0)
+        end   = length if end is None else min(end, length)
+
+        if start >= end:
+            return ""
+
+        if file_path not in cls.mmaps:
+            with open(file_path, "rb") as f:
+                cls.mmaps[file_path] = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+        first = offset + (start // bases) * width + start % bases
+        last  = offset + (end // bases) * width + end % bases
+
+        return cls.mmaps[file_path][first:last].replace(b"\n", b"").replace(b"\r", b"").decode()
@@ -1,78 +1,284 @@
-from abc             import ABC, abstractmethod
-from collections.abc import Iterable
-from copy            import copy
-from math            import inf
-from random          import choice
-from typing          import Union, Generator
-
-class FastaLikeFileService(ABC):
-
-    @classmethod
-    @abstractmethod
-    def parse_string(cls, string: str)->dict:
-        pass
-
-    @classmethod
-    @abstractmethod
-    def parse_dict(cls, data: dict)->str:
-        pass
-
-    @classmethod
-    def read(cls, file_path:str, only=inf)->Generator:
-         
-        string = ""
-        n = 0
-        
-        with open(file_path, "r") as f:
-
-            for i, line in enumerate(f):
-
-                if (line[0] == cls.separator) and (i > 0):
-                    yield cls.parse_string(string)
-                    n += 1
-                    if n == only:
-                        return
-                    string = ""
-                string += line
-
-            yield cls.parse_string(string)
-
-    @classmethod
-    def write(cls,
-              file_path: str,
-              data: Iterable[dict],
-              mode="w",
-              only=inf)->None:
-
-        with open(file_path, mode) as file:
-            for i, d in enumerate(data):
-                if i < only:
-                    file.writelines(cls.parse_dict(d))
-                else:
-                    return
-    @classmethod            
-    def unambigous_codes(cls,
-                         data: Iterable[dict],
-                         inplace = True) -> Generator:
-
-        translate = {"R": ["A","G"],
-                     "Y": ["C","T"],
-                     "S": ["G","C"],
-                     "W": ["A","T"],
-                     "K": ["G","T"],
-                     "M": ["A","C"],
-                     "B": ["C","G","T"],
-                     "D": ["A","G","T"],
-                     "H": ["A","C","T"],
-                     "V": ["A","C","G"],
-                     "N": ["A","C","G","T"]}
-        
-        for i, d in enumerate(data):
-            if not inplace:
-                d = copy(d)
-            for j, b in enumerate(d["sequence"]):
-                if not b in "ACGT":
-                    d["sequence"] = choice(translate[b])
-            yield d
-
-
+from abc             import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from copy            import copy
+from io              import BytesIO
+from math            import inf
+from mmap            import mmap, ACCESS_READ
+from operator        import itemgetter
+from os              import cpu_count, path
+from random          import choice
+from typing          import Union, Generator
+
+from . import streams
+from .records import ProjectedRecord
+
+def read_shard(args: tuple):
+
+    # Parses the entries within one byte range and passes them to function,
+    # the range has to start and end at entry boundaries
+
+    cls, file_path, start, end, function = args
+
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = BytesIO(f.read(end-start).replace(b"\r\n", b"\n"))
+
+    return function(cls.parse_records(data))
+
+class FastaLikeFileService(ABC):
+
+    block_size = 1 << 22
+    shard_size = 1 << 26
+
+    @classmethod
+    @abstractmethod
+    def parse_string(cls, string: str)->dict:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def parse_dict(cls, data: dict)->str:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def parse_bytes(cls, record: bytes)->dict:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def parse_dict_bytes(cls, data: dict)->bytes:
+        pass
+
+    @classmethod
+    def split_records(cls, file)->Generator:
+
+        # Yields the raw bytes of one entry at a time.
+        # The file is consumed in blocks of block_size bytes and entry boundaries are located with
+        # bytearray.find, so multi-line entries are never assembled line by line.
+
+        separator = cls.separator.encode()
+        buffer    = bytearray()
+        search    = 1
+
+        while block := file.read(cls.block_size):
+
+            buffer += block
+            start   = 0
+
+            while (end := buffer.find(separator, search)) != -1:
+                search = end + 1
+                if buffer[end-1] == 10:
+                    yield buffer[start:end]
+                    start = end
+
+            del buffer[:start]
+            search = max(len(buffer), 1)
+
+        if buffer:
+            yield buffer
+
+    @classmethod
+    @abstractmethod
+    def scan_bytes(cls, record: bytes, binary=False)->tuple:
+        pass
+
+    @classmethod
+    def get_projection(cls, fields: Iterable[str])->Callable:
+
+        # Returns a function picking the requested fields from the values of a complete record
+
+        keys = tuple(key for key in cls.record_type.fields if key in fields)
+
+        if len(keys) != len(set(fields)):
+            raise KeyError(f"Unknown fields {set(fields)-set(keys)}")
+
+        pick = itemgetter(*[cls.record_type.fields.index(key) for key in keys])
+
+        if len(keys) == 1:
+            return lambda values: ProjectedRecord(keys, [pick(values)])
+
+        return lambda values: ProjectedRecord(keys, list(pick(values)))
+
+    @classmethod
+    def get_parser(cls, binary=False, fields=None)->Callable:
+
+        # Returns the function turning the raw bytes of an entry into a record.
+        # Projections that do not include the sequence are taken from scan_bytes,
+        # which only counts the bases instead of joining the sequence lines.
+
+        if fields is None:
+            return cls.parse_bytes if binary else lambda record: cls.parse_string(record.decode())
+
+        project = cls.get_projection(fields)
+
+        if cls.sequence_fields.isdisjoint(fields):
+            return lambda record: project(cls.scan_bytes(record, binary))
+
+        parse = cls.get_parser(binary)
+
+        return lambda record: project(parse(record).values())
+
+    @classmethod
+    def parse_records(cls, file, binary=False, fields=None)->Generator:
+
+        # Blank lines before the first entry come out as a record of whitespace, which is not an entry
+        # (and would be counted as a sequence of length 0 by projections like fields={"length"})
+
+        parse = cls.get_parser(binary, fields)
+
+        for record in cls.split_records(file):
+            if not record.isspace():
+                yield parse(record)
+
+    @classmethod
+    def find_record_start(cls, data: mmap, position: int)->int:
+
+        # Returns the offset of the first entry starting at or after position.
+        # In FASTA-files any separator at the start of a line marks the start of an entry.
+
+        if position == 0:
+            return 0
+
+        end = data.find(b"\n"+cls.separator.encode(), position-1)
+
+        return len(data) if end == -1 else end + 1
+
+    @classmethod
+    def get_shards(cls, file_path: str, shard_size: int)->list[tuple[int, int]]:
+
+        # Splits the file into byte ranges of about shard_size bytes, each moved to the next entry start
+
+        size = path.getsize(file_path)
+
+        if size == 0:
+            return []
+
+        with open(file_path, "rb") as f, mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+            starts = [cls.find_record_start(data, position) for position in range(0, size, shard_size)]
+
+        starts = sorted(set(starts + [size]))
+
+        return list(zip(starts[:-1], starts[1:]))
+
+    @classmethod
+    def map_shards(cls,
+                   file_path: str,
+                   function: Callable,
+                   processes=None,
+                   ordered=True,
+                   shard_size=None)->Generator:
+
+        # Parses byte ranges of the file in parallel processes and yields function(entries) for each of them.
+        # function has to be picklable (e.g. defined at module level) and is applied within the workers,
+        # so that only its result has to be sent back.
+        # With ordered=True the results are yielded in the order of the shards in the file,
+        # with ordered=False as soon as they are available.
+        # Compressed files and pipes cannot be split into byte ranges and are processed as a single shard.
+
+        from multiprocessing import Pool
+
+        if not streams.is_seekable(file_path):
+            yield function(cls.read(file_path))
+            return
+
+        shards = [(cls, file_path, start, end, function) for start, end in cls.get_shards(file_path, shard_size or cls.shard_size)]
+
+        with Pool(min(processes or cpu_count(), max(len(shards), 1))) as pool:
+            yield from (pool.imap if ordered else pool.imap_unordered)(read_shard, shards)
+
+    @classmethod
+    def read_sharded(cls,
+                     file_path: str,
+                     processes=None,
+                     ordered=True,
+                     shard_size=None)->Generator:
+
+        # Same entries as read(), parsed in parallel processes.
+        # With ordered=False the entries of each shard are yielded as soon as the shard is parsed.
+
+        for records in cls.map_shards(file_path, list, processes, ordered, shard_size):
+            yield from records
+
+    @classmethod
+    def read(cls, file_path:str, only=inf, binary=False, fields=None)->Generator:
+
+        # With binary=True the records hold bytes instead of strings,
+        # e.g. for conversions that never have to decode the sequences.
+        # With fields, e.g. {"header", "length"}, only these fields are parsed.
+
+        with streams.open_input(file_path, binary=True) as f:
+
+            for n, record in enumerate(cls.parse_records(f, binary, fields), 1):
+
+                yield record
+
+                if n == only:
+                    return
+
+    @classmethod
+    def read_batches(cls, file_path:str, batch_size=100_000)->Generator:
+
+        # numpy is only imported once batches are requested
+        from .batches import RecordBatch
+
+        records = []
+
+        with streams.open_input(file_path, binary=True) as f:
+
+            for record in cls.split_records(f):
+
+                records.append(record)
+
+                if len(records) == batch_size:
+                    yield RecordBatch.from_records(records, cls.file_type)
+                    records = []
+
+        if records:
+            yield RecordBatch.from_records(records, cls.file_type)
+
+    @classmethod
+    def write(cls,
+              file_path: str,
+              data: Iterable[dict],
+              mode="w",
+              only=inf,
+              compress_threads=1,
+              binary=False)->None:
+
+        # With binary=True the records have to hold bytes, e.g. as read with binary=True
+
+        parse = cls.parse_dict_bytes if binary else cls.parse_dict
+
+        with streams.open_output(file_path, mode.replace("b", "")+("b" if binary else ""), compress_threads) as file:
+            for i, d in enumerate(data):
+                if i < only:
+                    file.write(parse(d))
+                else:
+                    return
+    @classmethod            
+    def unambigous_codes(cls,
+                         data: Iterable[dict],
+                         inplace = True) -> Generator:
+
+        translate = {"R": ["A","G"],
+                     "Y": ["C","T"],
+                     "S": ["G","C"],
+                     "W": ["A","T"],
+                     "K": ["G","T"],
+                     "M": ["A","C"],
+                     "B": ["C","G","T"],
+                     "D": ["A","G","T"],
+                     "H": ["A","C","T"],
+                     "V": ["A","C","G"],
+                     "N": ["A","C","G","T"]}
+        
+        for i, d in enumerate(data):
+            if not inplace:
+                d = copy(d)
+            for j, b in enumerate(d["sequence"]):
+                if not b in "ACGT":
+                    d["sequence"] = choice(translate[b])
+            yield d
+
+
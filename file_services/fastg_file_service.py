@@ -1,41 +1,61 @@
-from re import compile
-
-from . import fasta_file_service
-
-class FastgFileService(fasta_file_service.FastaFileService):
-
-    r = compile(r"EDGE_(?P<ID>[a-zA-Z\d]+)_length_(?P<LENGTH>\d+)_cov_(?P<COVERAGE>[\d\.]+)")
-
-    @classmethod
-    def parse_string(cls, string: str)->dict:
-
-        lines    = string.split(";")
-        header   = lines[0][1:]
-        id       = cls.r.search(header.split(":")[0]).group("ID")
-        length   = cls.r.search(header.split(":")[0]).group("LENGTH")
-        coverage = cls.r.search(header.split(":")[0]).group("COVERAGE")
-        rc       = True if id.endswith("'") else False
-        if len(header.split(":")) == 1 :
-            neighbors = []
-        else:
-            neighbors = [cls.r.search(e).group("ID") for e in header.split(":")]
-        sequence = lines[1].replace("\n","")
-
-        for n in neighbors:
-            if not n.isdigit():
-                raise Exception(f"Neighbors {neighbors}")
-        if not id.isdigit():
-            raise Exception(f"ID {id}")
-        for c in sequence:
-            if not c in "ACGT":
-                raise Exception(f"Sequence {sequence}")
-
-        return {"header": header,
-                "id": id,
-                "length": length,
-                "sequence": sequence,
-                "coverage": coverage,
-                "rc": rc,
-                "neighbors": neighbors,
-                "file_type": "fasta"}
-
+from . import fasta_file_service
+
+class FastgFileService(fasta_file_service.FastaFileService):
+
+    @staticmethod
+    def parse_edge(edge: bytes)->tuple:
+
+        # EDGE_<id>_length_<length>_cov_<coverage>, followed by ' for the reverse complement
+
+        reverse = edge.endswith(b"'")
+        fields  = edge.rstrip(b"'").rsplit(b"_", 4)
+
+        if len(fields) != 5 or not fields[0].startswith(b"EDGE_") or fields[1] != b"length" or fields[3] != b"cov":
+            raise Exception(f"Edge {edge.decode()}")
+
+        return fields[0][5:], reverse, int(fields[2]), float(fields[4])
+
+    @classmethod
+    def parse_header(cls, header: bytes)->tuple:
+
+        # Fields of a header (without ">"): id, reverse, length, coverage and the
+        # neighbors as (id, reverse), every edge is parsed only once
+
+        edge, _, neighbors = header.rstrip(b";").partition(b":")
+
+        id, reverse, length, coverage = cls.parse_edge(edge)
+        neighbors                     = [cls.parse_edge(n)[:2] for n in neighbors.split(b",")] if neighbors else []
+
+        return id, reverse, length, coverage, neighbors
+
+    @classmethod
+    def parse_string(cls, string: str)->dict:
+
+        header, _, sequence = string.partition(";")
+        header              = header[1:]
+        sequence            = sequence.replace("\n", "").replace("\r", "")
+
+        id, reverse, length, coverage, neighbors = cls.parse_header(header.encode())
+
+        if not id.isdigit() or not all(n.isdigit() for n, _ in neighbors):
+            raise Exception(f"Header {header}")
+        if not set(sequence) <= set("ACGT"):
+            raise Exception(f"Sequence {sequence}")
+
+        return {"header":    header,
+                "id":        id.decode(),
+                "length":    length,
+                "sequence":  sequence,
+                "coverage":  coverage,
+                "rc":        reverse,
+                "neighbors": [n.decode() for n, _ in neighbors],
+                "file_type": "fasta"}
+
+    @staticmethod
+    def read_graph(file_path: str, overlap: int=0):
+
+        # Edges of the assembly graph and their links as a DbgGraph (integer ids, CSR adjacency, lazily read sequences)
+
+        from .dbg_graph import DbgGraph
+
+        return DbgGraph(file_path, "fastg", overlap)
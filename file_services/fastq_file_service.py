@@ -1,63 +1,416 @@
-from typing import Generator
-from math   import inf
-
-from . import fasta_like_file_service
-
-class FastqFileService(fasta_like_file_service.FastaLikeFileService):
-
-    separator = "@"
-
-    @classmethod
-    def parse_string(cls, string: str)->dict:
-
-        lines    = string.rstrip().split("\n")
-        header   = lines[0][1:]
-        i        = [i for i, line in enumerate(lines) if line[0]=="+"][0]
-        sequence = "".join(lines[1:i])
-        info     = lines[i]
-        quality  = "".join(lines[i+1:])
-
-        return {"header": header,
-                "sequence": sequence,
-                "info": info,
-                "quality": quality,
-                "length": len(sequence),
-                "file_type": "fastq"}
-
-    @classmethod
-    def parse_dict(cls, read: dict)->str:
-        
-        return "\n".join([cls.separator+read["header"],read["sequence"],read["info"],read["quality"]])+"\n"
-
-    @classmethod
-    def read(cls, file_path:str, only=inf)->Generator:
-
-        # Overrides method read inherited from parent class fasta_like_file_service.FastaLikeFileService
-        # -> In FASTQ-files, the character "@" at the start of a line either marks the beginning of a new
-        #    entry or refer to a phred score of 31.
-
-        string = ""
-        n = 0
-        
-        with open(file_path, "r") as f:
-
-            for i, line in enumerate(f):
-
-                if (line[0] == cls.separator) and (i > 0):
-
-                    read = cls.parse_string(string)
-
-                    if len(read["sequence"]) == len(read["quality"]):
-                        yield read
-                        n += 1
-                        if n == only:
-                            return
-                        string = ""
-                        
-                string += line
-
-            yield cls.parse_string(string)
-    
-
-
-
+from array  import array
+from mmap   import mmap, ACCESS_READ
+from os     import path, stat
+from struct import Struct
+from typing import Generator
+
+from . import fasta_like_file_service
+from . import streams
+from .records import FastqRecord
+
+class FastqIndexError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+class FastqFileService(fasta_like_file_service.FastaLikeFileService):
+
+    separator       = "@"
+    file_type       = "fastq"
+    record_type     = FastqRecord
+    sequence_fields = {"sequence", "info", "quality"}
+    indices         = {}
+    names           = {}
+    mmaps           = {}
+    versions        = {}
+
+    # .fqi layout: magic, size and mtime (ns) of the FASTQ-file, number of entries,
+    #              byte offsets of all entries plus the end of the last one (uint64),
+    #              newline separated read names
+    fqi_magic  = b"FQI\x01"
+    fqi_header = Struct("<4sQQQ")
+
+    # Block size of the four-line fast path in parse_records
+    line_block_size = 1 << 16
+
+    # Number of consecutive entries that have to be well-formed to accept a shard start
+    sync_records = 4
+
+    @classmethod
+    def parse_string(cls, string: str)->FastqRecord:
+
+        lines    = string.rstrip().split("\n")
+
+        if len(lines) == 4:
+            return FastqRecord(lines[0][1:], lines[1], lines[2], lines[3])
+
+        i        = [i for i, line in enumerate(lines) if line[0]=="+"][0]
+
+        return FastqRecord(lines[0][1:], "".join(lines[1:i]), lines[i], "".join(lines[i+1:]))
+
+    @classmethod
+    def parse_dict(cls, read: dict)->str:
+        
+        return "\n".join([cls.separator+read["header"],read["sequence"],read["info"],read["quality"]])+"\n"
+
+    @classmethod
+    def parse_bytes(cls, record: bytes)->FastqRecord:
+
+        lines = bytes(record).rstrip().split(b"\n")
+
+        if len(lines) == 4:
+            return FastqRecord(lines[0][1:], lines[1], lines[2], lines[3])
+
+        i     = [i for i, line in enumerate(lines) if line[:1]==b"+"][0]
+
+        return FastqRecord(lines[0][1:], b"".join(lines[1:i]), lines[i], b"".join(lines[i+1:]))
+
+    @classmethod
+    def parse_dict_bytes(cls, read: dict)->bytes:
+
+        return b"".join([b"@", read["header"], b"\n", read["sequence"], b"\n", read["info"], b"\n", read["quality"], b"\n"])
+
+    @classmethod
+    def scan_bytes(cls, record: bytes, binary=False)->tuple:
+
+        # Values of a FastqRecord without sequence, separator line and quality.
+        # The sequence ends at the first line starting with "+".
+
+        header_end = record.find(b"\n") + 1 or len(record)
+        header     = bytes(record[1:header_end].rstrip(b"\n"))
+        plus       = record.find(b"\n+", header_end-1) + 1 or len(record)
+
+        return (header if binary else header.decode(),
+                None,
+                None,
+                None,
+                plus - header_end - record.count(b"\n", header_end, plus),
+                cls.file_type)
+
+    @classmethod
+    def parse_records(cls, file, binary=False, fields=None)->Generator:
+
+        # Overrides method parse_records inherited from parent class fasta_like_file_service.FastaLikeFileService
+        # -> Fast path for strict four-line FASTQ: each block is decoded and split into lines at once and
+        #    every four lines make up an entry, without walking the lines or joining them.
+        #    At the first entry that is not four lines the rest of the file is handed over to split_records.
+        #    Small blocks stay in the CPU cache, entries longer than a block are completed by read_long_entry
+        #    before they are decoded and split.
+        #    Projections without sequence and quality only decode the headers.
+
+        parse = cls.get_parser(binary, fields)
+        scan  = fields is not None and cls.sequence_fields.isdisjoint(fields)
+        raw   = binary or scan
+
+        if fields is None:
+            make = FastqRecord
+        elif scan:
+            project = cls.get_projection(fields)
+            decode  = not binary and "header" in fields
+            make    = lambda header, sequence, info, quality: project((header.decode() if decode else header,
+                                                                       None,
+                                                                       None,
+                                                                       None,
+                                                                       len(sequence),
+                                                                       cls.file_type))
+        else:
+            project = cls.get_projection(fields)
+            make    = lambda *values: project(FastqRecord(*values).values())
+
+        newline, at, plus = (b"\n", b"@", b"+") if raw else ("\n", "@", "+")
+        rest              = b""
+
+        def encode(lines: list)->bytes:
+            data = newline.join(lines + [newline[:0]])
+            return data if raw else data.encode()
+
+        while block := file.read(cls.line_block_size):
+
+            rest += block
+            end   = rest.rfind(b"\n") + 1
+            lines = (rest[:end] if raw else rest[:end].decode()).split(newline)
+            lines.pop()
+            n     = len(lines) - len(lines) % 4
+
+            for i in range(0, n, 4):
+
+                header, sequence, info, quality = lines[i:i+4]
+
+                if not (header[:1] == at and info[:1] == plus and len(sequence) == len(quality)):
+                    rest = encode(lines[i:]) + rest[end:]
+                    break
+
+                yield make(header[1:], sequence, info, quality)
+
+            else:
+                rest = encode(lines[n:]) + rest[end:]
+                if len(rest) >= cls.line_block_size:
+                    rest = cls.read_long_entry(file, rest)
+                continue
+
+            break
+
+        for record in cls.split_records(file, rest):
+            if not record.isspace():
+                yield parse(record)
+
+    @classmethod
+    def read_long_entry(cls, file, head: bytes)->bytes:
+
+        # Reads the rest of a four-line entry starting at head, without anything that follows it.
+        # Line breaks are only searched for in the bytes read since, the quality is read at once
+        # as it is as long as the sequence. Entries that are not four lines are returned all the same,
+        # the fast path hands them over to split_records.
+
+        buffer   = bytearray(head)
+        position = 0
+        ends     = []
+
+        while len(ends) < 3:
+            if (end := buffer.find(b"\n", position)) != -1:
+                ends.append(end)
+                position = end + 1
+            else:
+                position = len(buffer)
+                if not (block := file.read(max(cls.line_block_size, len(buffer)))):
+                    return bytes(buffer)
+                buffer += block
+
+        size = ends[2] + 1 + ends[1] - ends[0]
+
+        while len(buffer) < size and (block := file.read(size - len(buffer))):
+            buffer += block
+
+        return bytes(buffer)
+
+    @classmethod
+    def split_records(cls, file, head=b"")->Generator:
+
+        # Overrides method split_records inherited from parent class fasta_like_file_service.FastaLikeFileService
+        # -> In FASTQ-files, the character "@" at the start of a line either marks the beginning of a new
+        #    entry or refer to a phred score of 31.
+        #    The block is therefore walked from line break to line break, an entry ends with the quality
+        #    line that makes up for the length of the sequence. Blank lines between entries are skipped.
+
+        buffer   = bytearray(head)
+        start    = 0
+        position = 0
+        section  = 0
+        sequence = 0
+        quality  = 0
+
+        while True:
+
+            while (end := buffer.find(b"\n", position)) != -1:
+
+                if section == 0:
+                    if buffer[position:end].isspace() or position == end:
+                        start = end + 1
+                    else:
+                        section = 1
+                elif section == 1:
+                    if buffer[position] == 43:
+                        section = 2
+                    else:
+                        sequence += end - position
+                else:
+                    quality += end - position
+                    if quality >= sequence:
+                        yield buffer[start:end+1]
+                        start    = end + 1
+                        section  = 0
+                        sequence = 0
+                        quality  = 0
+
+                position = end + 1
+
+            del buffer[:start]
+            position -= start
+            start     = 0
+
+            if not (block := file.read(cls.block_size)):
+                break
+
+            buffer += block
+
+        if buffer and not buffer.isspace():
+            yield buffer
+
+    @classmethod
+    def is_record_start(cls, data: mmap, position: int)->bool:
+
+        # A line starting with "@" is accepted as entry start if it is followed by sync_records entries
+        # (or as many as there are left) whose separator line is empty or repeats the header
+        # and whose quality exactly makes up for the length of their sequence.
+        # Starting from a quality line, the header of the next entry would end up among the sequence lines,
+        # which never start with "@".
+
+        def line_length(start: int, end: int)->int:
+            return end - start - (data[end-1] == 13)
+
+        for _ in range(cls.sync_records):
+
+            if position == len(data):
+                return True
+            if data[position] != 64:
+                return False
+
+            end      = data.find(b"\n", position)
+            header   = data[position+1:end].rstrip(b"\r")
+            position = end + 1
+            sequence = 0
+            quality  = 0
+
+            while position and position < len(data) and data[position] != 43:
+                if data[position] == 64:
+                    return False
+                end       = data.find(b"\n", position)
+                end       = len(data) if end == -1 else end
+                sequence += line_length(position, end)
+                position  = end + 1
+
+            if not position or position >= len(data):
+                return False
+
+            end = data.find(b"\n", position)
+
+            if end == -1 or data[position+1:end].rstrip(b"\r") not in (b"", header):
+                return False
+
+            position = end + 1
+
+            while position and position < len(data):
+                end      = data.find(b"\n", position)
+                end      = len(data) if end == -1 else end
+                quality += line_length(position, end)
+                position = min(end + 1, len(data))
+                if quality >= sequence:
+                    break
+
+            if quality != sequence:
+                return False
+
+        return True
+
+    @classmethod
+    def find_record_start(cls, data: mmap, position: int)->int:
+
+        # Overrides method find_record_start inherited from parent class fasta_like_file_service.FastaLikeFileService
+        # -> "@" at the start of a line may also be a phred score of 31, each candidate is validated.
+
+        if position == 0:
+            return 0
+
+        while (end := data.find(b"\n@", position-1)) != -1:
+            if cls.is_record_start(data, end+1):
+                return end + 1
+            position = end + 2
+
+        return len(data)
+
+    @classmethod
+    def build_index(cls, file_path: str)->tuple[array, bytes]:
+
+        if not streams.is_seekable(file_path):
+            raise FastqIndexError(f"Cannot index compressed file or pipe {file_path}")
+
+        offsets  = array("Q")
+        names    = []
+        size     = path.getsize(file_path)
+        position = 0
+
+        # split_records skips blank lines, so each entry is located by its header line after the previous one.
+        # Blank lines become the end of the entry before them, which parsing strips anyway.
+        with open(file_path, "rb") as f:
+            data = mmap(f.fileno(), 0, access=ACCESS_READ) if size else b""
+            for record in cls.split_records(f):
+                position  = data.find(bytes(record[:record.find(b"\n")+1] or record), position)
+                offsets.append(position)
+                position += len(record)
+                names.append((record[1:record.find(b"\n")].split(None, 1) or [b""])[0])
+            if size:
+                data.close()
+
+        offsets.append(size)
+
+        return offsets, b"\n".join(names)
+
+    @classmethod
+    def get_index(cls, file_path: str)->array:
+
+        # The .fqi is rebuilt whenever size or modification time of the FASTQ-file changed,
+        # the offsets, names and memory map cached for an older version are dropped
+
+        fqi    = file_path + ".fqi"
+        status = stat(file_path)
+        header = (cls.fqi_magic, status.st_size, status.st_mtime_ns)
+
+        if file_path in cls.indices:
+            if cls.versions[file_path] == header:
+                return cls.indices[file_path]
+            cls.names.pop(file_path, None)
+            if file_path in cls.mmaps:
+                cls.mmaps.pop(file_path).close()
+
+        cls.versions[file_path] = header
+
+        if path.isfile(fqi):
+            with open(fqi, "rb") as f:
+                *stored, n = cls.fqi_header.unpack(f.read(cls.fqi_header.size))
+                if tuple(stored) == header:
+                    offsets = array("Q")
+                    offsets.frombytes(f.read(8*(n+1)))
+                    cls.indices[file_path] = offsets
+                    return offsets
+
+        offsets, names = cls.build_index(file_path)
+
+        with open(fqi, "wb") as f:
+            f.write(cls.fqi_header.pack(*header, len(offsets)-1))
+            f.write(offsets.tobytes())
+            f.write(names)
+
+        cls.indices[file_path] = offsets
+
+        return offsets
+
+    @classmethod
+    def count(cls, file_path: str)->int:
+
+        return len(cls.get_index(file_path)) - 1
+
+    @classmethod
+    def get(cls, file_path: str, i: int, binary=False)->FastqRecord:
+
+        offsets = cls.get_index(file_path)
+        n       = len(offsets) - 1
+
+        if not -n <= i < n:
+            raise IndexError(f"{file_path} has {n} entries")
+
+        if file_path not in cls.mmaps:
+            with open(file_path, "rb") as f:
+                cls.mmaps[file_path] = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+        i %= n
+
+        record = cls.mmaps[file_path][offsets[i]:offsets[i+1]]
+
+        return cls.parse_bytes(record) if binary else cls.parse_string(record.decode())
+
+    @classmethod
+    def get_by_name(cls, file_path: str, name: str)->FastqRecord:
+
+        # The name lookup is only built on first use
+
+        if file_path not in cls.names:
+            n     = cls.count(file_path)
+            names = {}
+            with open(file_path + ".fqi", "rb") as f:
+                f.seek(cls.fqi_header.size + 8*(n+1))
+                for i, read_name in enumerate(f.read().decode().split("\n")):
+                    names.setdefault(read_name, i)
+            cls.names[file_path] = names
+
+        return cls.get(file_path, cls.names[file_path][name])
@@ -1,88 +1,164 @@
-from json   import loads
-from typing import Callable, Generator
-
-class IllegalOptionalTypeError(Exception):
-    
-    def __init__(self, optional_type_char: str) -> None:
-        
-        super().__init__(optional_type_char)
-        
-class IllegalOptionalError(Exception):
-    
-    def __init__(self, optional: str) -> None:
-        
-        super().__init__(optional)
-
-class GFA_element():
-    
-    allowed_optionals = []
-    required_fields   = 0
-    
-    def __init__(self, line: str):
-        
-        self.line       = line
-        
-    def __repr__(self) -> str:
-        
-        return self.line
-    
-    @staticmethod
-    def get_optional_type(optional_type_char: str) -> Callable:
-                
-        match optional_type_char:
-            case "A":
-                return chr
-            case "i":
-                return int
-            case "f":
-                return float
-            case "Z":
-                return str
-            case "J":
-                return loads
-            case "H":
-                return bytearray.fromhex
-            case "B":
-                return lambda number_array: [float(n) for n in number_array]
-            
-        raise IllegalOptionalTypeError(optional_type_char)
-
-    def get_optionals_dict(self) -> dict:
-        
-        optionals_dict = {o: None for o in self.allowed_optionals}
-        
-        for o in self.line.rstrip().split("\t")[self.required_fields:]:
-            
-            o = o.split(":")
-            
-            optionals_dict[o[0]] = self.get_optional_type(o[1])(o[2])
-        
-        return optionals_dict
-
-class Segment(GFA_element):
-    
-    allowed_optionals = ["LN", "RC", "FC", "KC", "SH", "UR"]
-    required_fields   = 3
-    
-    def __init__(self, line: str):
-        
-        super().__init__(line)
-        
-        line_split = line.rstrip().split("\t")
-        
-        self.name       = line_split[1]
-        self.sequence   = line_split[2]
-        self.optionals  = self.get_optionals_dict()
-        
-class GfaFileService():
-    
-    @staticmethod
-    def read(file_path: str) -> Generator:
-        
-        with open(file_path, "r") as gfa:
-            
-            for line in gfa:
-                
-                match line[0]:
-                    case "S":
-                        yield Segment(line)
\ No newline at end of file
+from json   import loads
+from typing import Any, Callable, Generator, Union
+
+from . import streams
+from .records import FastaRecord, parse_array
+
+class IllegalOptionalTypeError(Exception):
+
+    def __init__(self, optional_type_char: str) -> None:
+
+        super().__init__(optional_type_char)
+
+class IllegalOptionalError(Exception):
+
+    def __init__(self, optional: str) -> None:
+
+        super().__init__(optional)
+
+# Optional fields of GFA, TAG:TYPE:VALUE
+optional_types = {"A": str,
+                  "i": int,
+                  "f": float,
+                  "Z": str,
+                  "J": loads,
+                  "H": bytes.fromhex,
+                  "B": parse_array}
+
+class GFA_element():
+    """
+    Base class of GFA lines. The optional fields are kept as the raw tag span of the line (str or bytes)
+    and each tag is only parsed on its first access (get_optional or optionals).
+    """
+
+    __slots__         = ("line", "tags", "parsed")
+    allowed_optionals = []
+    required_fields   = 0
+
+    def __init__(self, line: Union[str, bytes], tags: Union[str, bytes]=""):
+
+        self.line   = line
+        self.tags   = tags
+        self.parsed = None              # Tags parsed so far
+
+    def __repr__(self) -> str:
+
+        return self.line if isinstance(self.line, str) else self.line.decode()
+
+    @staticmethod
+    def get_optional_type(optional_type_char: str) -> Callable:
+
+        if optional_type_char not in optional_types:
+            raise IllegalOptionalTypeError(optional_type_char)
+
+        return optional_types[optional_type_char]
+
+    def get_optional(self, tag: str, default=None) -> Any:
+
+        # Looks for a single tag in the raw span without parsing the others
+
+        if self.parsed is None:
+            self.parsed = {}
+        elif tag in self.parsed:
+            return self.parsed[tag]
+
+        # The span is searched as it is (str or bytes), only the field of the tag is decoded
+        tags, key, tab = (self.tags, tag+":", "\t") if isinstance(self.tags, str) else (self.tags, (tag+":").encode(), b"\t")
+
+        if tags.startswith(key):
+            start = 0
+        elif not (start := tags.find(tab+key) + 1):
+            return default
+
+        end   = tags.find(tab, start)
+        field = tags[start:len(tags) if end < 0 else end]
+        field = field if isinstance(field, str) else field.decode()
+
+        if field[len(key)+1:len(key)+2] != ":":
+            raise IllegalOptionalError(field)
+
+        self.parsed[tag] = self.get_optional_type(field[len(key)])(field[len(key)+2:])
+
+        return self.parsed[tag]
+
+    def get_optionals_dict(self) -> dict:
+
+        # Tags parsed before by get_optional are not converted again
+
+        optionals_dict = {o: None for o in self.allowed_optionals}
+        tags           = self.tags if isinstance(self.tags, str) else self.tags.decode()
+        parsed         = self.parsed if self.parsed is not None else {}
+
+        for o in tags.split("\t"):
+
+            if not o:
+                continue
+
+            o = o.split(":", 2)
+
+            if len(o) < 3:
+                raise IllegalOptionalError(":".join(o))
+
+            if o[0] not in parsed:
+                parsed[o[0]] = self.get_optional_type(o[1])(o[2])
+
+            optionals_dict[o[0]] = parsed[o[0]]
+
+        self.parsed = parsed
+
+        return optionals_dict
+
+    @property
+    def optionals(self) -> dict:
+
+        # All optional fields, allowed ones that are missing as None
+
+        return self.get_optionals_dict()
+
+class Segment(GFA_element):
+
+    __slots__         = ("name", "sequence")
+    allowed_optionals = ["LN", "RC", "FC", "KC", "SH", "UR"]
+    required_fields   = 3
+
+    def __init__(self, line: Union[str, bytes]):
+
+        # Lines read with binary=True keep name and sequence as bytes, the line is split only once
+        _, self.name, sequence, *tags = line.split(b"\t" if isinstance(line, bytes) else "\t", 3)
+
+        super().__init__(line, tags[0].rstrip() if tags else line[:0])
+
+        self.sequence = sequence.rstrip()
+
+class GfaFileService():
+
+    @staticmethod
+    def read_graph(file_path: str):
+
+        # Segments, links, paths and walks as a GfaGraph (integer ids, CSR adjacency, lazily read sequences)
+
+        from .gfa_graph import GfaGraph
+
+        return GfaGraph(file_path)
+
+    @staticmethod
+    def read(file_path: str, binary=False, passthrough=False) -> Generator:
+
+        # With passthrough=True only name and sequence of the segments are yielded as FastaRecords
+        # (header, sequence), no Segment or tags are created
+
+        with streams.open_input(file_path, binary) as gfa:
+
+            if passthrough:
+                prefix, separator = (b"S\t", b"\t") if binary else ("S\t", "\t")
+                for line in gfa:
+                    if line.startswith(prefix):
+                        _, name, sequence, *_ = line.split(separator, 3)
+                        yield FastaRecord(name, sequence.rstrip())
+                return
+
+            for line in gfa:
+
+                match line[:1]:
+                    case "S" | b"S":
+                        yield Segment(line)
@@ -0,0 +1,330 @@
+from itertools import chain
+from numpy     import (arange, asarray, concatenate, cumsum, flatnonzero, fromiter, int32, int64, minimum, ndarray,
+                       searchsorted, uint8, unique, where, zeros)
+from re        import compile
+from typing    import Generator, Union
+
+from . import streams
+from .batches       import gather_strings
+from .compact_graph import CompactGraph, CompactGraphError, chunks, map_file, reverse_complement, split_lines
+from .records       import FastaRecord
+
+class GfaGraphError(CompactGraphError):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+# Memory-mapped files of the worker processes of GfaGraph.spell_paths()
+mapped_files = {}
+
+def spell(data, starts: ndarray, ends: ndarray, reverse: ndarray) -> bytes:
+
+    # Joins the byte ranges data[starts[i]:ends[i]], reverse complemented where reverse[i]
+
+    return b"".join(reverse_complement(data[start:end]) if flip else data[start:end]
+                    for start, end, flip in zip(starts.tolist(), ends.tolist(), reverse.tolist()))
+
+def spell_batch(args: tuple) -> list[FastaRecord]:
+
+    # Spelled paths of a batch of (name, byte ranges), the segments are read from the worker's memory map of the file
+
+    file_path, batch = args
+
+    if file_path not in mapped_files:
+        mapped_files[file_path] = map_file(file_path)
+
+    return [FastaRecord(name, spell(mapped_files[file_path], *spans)) for name, spans in batch]
+
+class GfaGraph(CompactGraph):
+    """
+    Segments, links, paths and walks of a GFA-file as integer arrays.
+
+    Segments get the ids 0..n-1 in the order of their S-lines, their sequences stay in the (memory-mapped) file
+    and are only read by sequence(). Each L-line adds an edge and its complement (reverse of both ends,
+    in opposite direction) to the CSR adjacency of CompactGraph.
+    Paths (P) and walks (W) are lists of nodes, stored the same way (steps[path_offsets[i]:path_offsets[i+1]]),
+    with paths=False they are skipped (e.g. for statistics of large pangenome graphs). spell_paths() spells them
+    from byte ranges of the segments in the file, in parallel processes if asked to.
+    """
+
+    error           = GfaGraphError
+    overlap_pattern = compile(rb"(\d+)([MIDNSHP=X])")
+    walk_pattern    = compile(rb"[<>][^<>]+")
+
+    # Bases of the paths spelled by one task of spell_paths()
+    batch_size      = 1 << 24
+
+    def __init__(self, file_path: str, paths: bool=True):
+
+        super().__init__()
+
+        self.file_path     = file_path
+        self.with_paths    = paths
+        self.path_names    = []
+        self.path_overlaps = []             # Raw overlap field of P-lines (b"*" for walks)
+        self.data          = map_file(file_path)
+
+        self.parse()
+
+    def parse(self) -> None:
+
+        # The file is scanned chunk by chunk with numpy: line starts and tabs are found for the whole chunk,
+        # the fields of S- and L-lines are cut out at the tab positions. Sequences are never copied,
+        # only their offsets and lengths are recorded. Links and paths are resolved to ids once all segments are known.
+
+        segments = []
+        links    = []
+        paths    = [] if self.with_paths else None
+
+        for offset, buffer in chunks(self.data, self.chunk_size):
+            self.parse_chunk(buffer, offset, segments, links, paths)
+
+        if segments:
+            names, self.starts, self.lengths = (concatenate(columns) for columns in zip(*segments))
+            self.set_names(names)
+        else:
+            self.starts = zeros(0, int64)
+
+        # starts: offsets of the sequences in data (-1 for "*"), lengths: their lengths (or LN-tags for "*")
+
+        self.build_links(links)
+        self.build_paths(paths or [])
+
+    def parse_chunk(self, buffer: ndarray, offset: int, segments: list, links: list, paths: list) -> None:
+
+        starts, ends = split_lines(buffer)
+        kinds        = buffer[starts]
+        tabs         = flatnonzero(buffer == 9)
+
+        def field_ends(starts, ends, n):
+            # Positions of the first n tabs of each line (the line end if there are fewer)
+            first = searchsorted(tabs, starts)
+            found = [tabs[(first+i).clip(max=len(tabs)-1)] if len(tabs) else ends for i in range(n)]
+            return [where((first+i < len(tabs)) & (tab < ends), tab, ends) for i, tab in enumerate(found)]
+
+        # S  name  sequence  tags
+        selected = kinds == 83
+        if selected.any():
+            line_starts, line_ends = starts[selected], ends[selected]
+            _, name_end, sequence_end = field_ends(line_starts, line_ends, 3)
+            if (name_end >= line_ends).any():
+                raise GfaGraphError(f"S-line without sequence at byte {offset+int(line_starts[name_end >= line_ends][0])}")
+            sequence_starts = name_end+1
+            lengths         = sequence_end-sequence_starts
+            # "*": the length is taken from the LN-tag
+            for i in flatnonzero((lengths == 1) & (buffer[sequence_starts] == 42)).tolist():
+                sequence_starts[i] = -1-offset
+                lengths[i]         = self.tag_length(bytes(buffer[sequence_end[i]:line_ends[i]]))
+            segments.append((gather_strings(buffer, line_starts+2, name_end), sequence_starts+offset, lengths))
+
+        # L  from  orientation  to  orientation  overlap
+        selected = kinds == 76
+        if selected.any():
+            line_starts, line_ends = starts[selected], ends[selected]
+            _, from_end, from_orientation_end, to_end, to_orientation_end, overlap_end = field_ends(line_starts, line_ends, 6)
+            if (to_end >= line_ends).any():
+                raise GfaGraphError(f"Incomplete L-line at byte {offset+int(line_starts[to_end >= line_ends][0])}")
+            links.append((gather_strings(buffer, line_starts+2, from_end),
+                          buffer[from_end+1] == 45,                                               # "-"
+                          gather_strings(buffer, from_orientation_end+1, to_end),
+                          buffer[to_end+1] == 45,
+                          gather_strings(buffer, (to_orientation_end+1).clip(max=overlap_end), overlap_end)))
+
+        # P  name  steps  overlaps  /  W  sample  haplotype  sequence  start  end  walk
+        if paths is None:
+            return
+
+        for line_start, line_end in zip(starts[(kinds == 80) | (kinds == 87)].tolist(),
+                                        ends[(kinds == 80) | (kinds == 87)].tolist()):
+            line = bytes(buffer[line_start:line_end])
+            if line[:1] == b"P":
+                _, name, steps, *overlaps = line.split(b"\t", 4)
+                paths.append((name, steps.split(b","), overlaps[0] if overlaps else b"*"))
+            else:
+                _, sample, haplotype, sequence, start, end, walk = line.split(b"\t", 7)[:7]
+                name  = b"%s#%s#%s:%s-%s" % (sample, haplotype, sequence, start, end)
+                steps = [step[1:] + (b"+" if step[:1] == b">" else b"-") for step in self.walk_pattern.findall(walk)]
+                paths.append((name, steps, b"*"))
+
+    @staticmethod
+    def tag_length(tags: bytes) -> int:
+
+        # LN-tag of a segment without sequence, 0 if there is none
+
+        for tag in tags.split(b"\t"):
+            if tag.startswith(b"LN:i:"):
+                return int(tag[5:])
+
+        return 0
+
+    def overlap_length(self, cigar: bytes, ops: bytes=b"MI=X") -> int:
+
+        # Bases of the second segment covered by an overlap CIGAR (M, I, = and X), 0 for "*".
+        # With ops=b"MD=X" the bases of the first segment.
+
+        return sum(int(length) for length, op in self.overlap_pattern.findall(cigar) if op in ops)
+
+    def build_links(self, links: list) -> None:
+
+        # Columns of the L-lines per chunk (names and CIGARs as fixed-width bytes arrays), they are replaced
+        # by the edges of the chunk one by one. The complement edge v^1 -> u^1 overlaps the first segment of the link.
+        # Overlaps are computed once per distinct CIGAR.
+
+        overlaps = {}
+
+        for i, (from_names, from_reverse, to_names, to_reverse, cigars) in enumerate(links):
+
+            u = 2*self.get_ids(from_names).astype(self.node_type) + from_reverse
+            v = 2*self.get_ids(to_names).astype(self.node_type) + to_reverse
+
+            distinct, inverse = unique(cigars, return_inverse=True)
+            for cigar in distinct.tolist():
+                if cigar not in overlaps:
+                    overlaps[cigar] = (self.overlap_length(cigar), self.overlap_length(cigar, b"MD=X"))
+            to_overlaps, first_overlaps = fromiter((overlaps[cigar] for cigar in distinct.tolist()),
+                                                   dtype=(int32, 2), count=len(distinct)).T
+
+            links[i] = (concatenate((u, v ^ 1)),
+                        concatenate((v, u ^ 1)),
+                        concatenate((to_overlaps[inverse], first_overlaps[inverse])))
+
+        self.build_adjacency(links)
+
+    def build_paths(self, paths: list) -> None:
+
+        # The steps of all paths are resolved at once: in a fixed-width bytes array the orientation is the last
+        # non-padding byte of each step, it is replaced by padding to get the segment name.
+
+        steps   = asarray(list(chain.from_iterable(path_steps for _, path_steps, _ in paths)), "S")
+        codes   = steps.view(uint8).reshape(len(steps), steps.dtype.itemsize)
+        rows    = arange(len(steps))
+        last    = (codes != 0).sum(axis=1) - 1
+        reverse = codes[rows, last] == 45                                   # "-"
+
+        codes[rows, last] = 0
+
+        self.steps         = 2*self.get_ids(steps) + reverse if len(steps) else zeros(0, int64)
+        self.path_offsets  = concatenate(([0], cumsum([len(path_steps) for _, path_steps, _ in paths], dtype=int64)))
+        self.path_names    = [name for name, _, _ in paths]
+        self.path_overlaps = [overlaps for _, _, overlaps in paths]
+        self.path_ids      = {name: i for i, name in enumerate(self.path_names)}
+
+    def sequence(self, segment: Union[int, bytes, str], reverse: bool=False) -> bytes:
+
+        segment = self.segment_id(segment)
+        start   = int(self.starts[segment])
+
+        if start < 0:
+            raise GfaGraphError(f"Segment {self.names[segment].decode()} has no sequence")
+
+        sequence = bytes(self.data[start:start+int(self.lengths[segment])])
+
+        return reverse_complement(sequence) if reverse else sequence
+
+    def path_steps(self, path: Union[int, bytes, str]) -> ndarray:
+
+        path = self.path_id(path)
+
+        return self.steps[self.path_offsets[path]:self.path_offsets[path+1]]
+
+    def path_id(self, path: Union[int, bytes, str]) -> int:
+
+        if isinstance(path, str):
+            path = path.encode()
+
+        if isinstance(path, int):
+            return path
+        if path not in self.path_ids:
+            raise GfaGraphError(f"Undefined path {path.decode()}")
+
+        return self.path_ids[path]
+
+    def step_overlaps(self, path: int) -> ndarray:
+
+        # Overlaps between consecutive steps of a path: from the P-line if given, otherwise from the links
+        # (0 where there is none). The links are searched for all steps at once in the CSR adjacency.
+
+        steps    = self.path_steps(path)
+        overlaps = self.path_overlaps[path]
+
+        if overlaps != b"*":
+            cigars = overlaps.split(b",")
+            if len(cigars) != max(len(steps)-1, 0):
+                raise GfaGraphError(f"Path {self.path_names[path].decode()} has {len(steps)} steps but {len(cigars)} overlaps")
+            return fromiter((self.overlap_length(cigar) for cigar in cigars), int64, len(cigars))
+
+        sources, targets = steps[:-1], steps[1:]
+        counts           = self.offsets[sources+1] - self.offsets[sources]
+        pairs            = arange(len(sources)).repeat(counts)
+        edges            = arange(int(counts.sum())) - (cumsum(counts)-counts).repeat(counts) + self.offsets[sources].repeat(counts)
+        hits             = flatnonzero(self.targets[edges] == targets[pairs])
+        found, first     = unique(pairs[hits], return_index=True)
+        overlaps         = zeros(len(sources), int64)
+        overlaps[found]  = self.overlaps[edges[hits[first]]]
+
+        return overlaps
+
+    def path_spans(self, path: Union[int, bytes, str]) -> tuple[ndarray, ndarray, ndarray]:
+
+        # Byte ranges in data of the segments of a path or walk and whether they are reverse complemented.
+        # The bases overlapping the previous step are cut from the start of the segment in its orientation,
+        # i.e. from the end of its range if it is reversed.
+
+        path     = self.path_id(path)
+        steps    = self.path_steps(path)
+        segments = steps >> 1
+        reverse  = (steps & 1).astype(bool)
+        starts   = self.starts[segments]
+        ends     = starts + self.lengths[segments]
+
+        if (starts < 0).any():
+            raise GfaGraphError(f"Segment {self.names[segments[flatnonzero(starts < 0)[0]]].decode()} has no sequence")
+
+        trims     = zeros(len(steps), int64)
+        trims[1:] = minimum(self.step_overlaps(path), (ends-starts)[1:])
+
+        return where(reverse, starts, starts+trims), where(reverse, ends-trims, ends), reverse
+
+    def spell_path(self, path: Union[int, bytes, str]) -> bytes:
+
+        # Sequence of a path or walk: the segments in their orientation, each without the bases
+        # overlapping the previous one. The overlaps are taken from the P-line if given, otherwise from the links.
+
+        return spell(self.data, *self.path_spans(path))
+
+    def spell_paths(self, processes: int=1) -> Generator:
+
+        # All paths and walks as FastaRecords (name, sequence) in the order of the file.
+        # With processes > 1 batches of paths are spelled in a process pool and yielded in order (imap):
+        # only the byte ranges of the segments are sent, each worker reads them from its own memory map of the file.
+        # Compressed files and pipes are spelled in this process.
+
+        if processes > 1 and streams.is_seekable(self.file_path):
+
+            from multiprocessing import Pool
+
+            with Pool(processes) as pool:
+                for records in pool.imap(spell_batch, ((self.file_path, batch) for batch in self.path_batches())):
+                    yield from records
+            return
+
+        for path, name in enumerate(self.path_names):
+            yield FastaRecord(name, self.spell_path(path))
+
+    def path_batches(self) -> Generator:
+
+        # Consecutive paths as lists of (name, byte ranges), about batch_size bases each
+
+        batch, size = [], 0
+
+        for path, name in enumerate(self.path_names):
+            spans  = self.path_spans(path)
+            batch.append((name, spans))
+            size  += int((spans[1]-spans[0]).sum())
+            if size >= self.batch_size:
+                yield batch
+                batch, size = [], 0
+
+        if batch:
+            yield batch
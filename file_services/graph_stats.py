@@ -0,0 +1,98 @@
+from numpy  import arange, bincount, cumsum, diff, flatnonzero, int64, minimum, ndarray, searchsorted, sort, unique
+
+from . import registry
+from .compact_graph import CompactGraph
+
+def load_graph(file_path: str, overlap: int=0) -> CompactGraph:
+
+    # GfaGraph (without paths) or DbgGraph, whatever the content of the file is
+
+    file_format = registry.get_format(file_path, "graph").name
+
+    if file_format == "gfa":
+        from .gfa_graph import GfaGraph
+        return GfaGraph(file_path, paths=False)
+
+    from .dbg_graph import DbgGraph
+
+    return DbgGraph(file_path, file_format, overlap)
+
+def nx(lengths: ndarray, fraction: float=0.5, total: int=None) -> int:
+
+    # Largest length L such that the segments of length >= L make up fraction of total (default: of all lengths),
+    # e.g. N50 with the sum of the lengths and NG50 with the genome size. 0 if all segments together are too short.
+
+    lengths = sort(lengths)[::-1]
+    covered = cumsum(lengths)
+    total   = int(covered[-1]) if total is None and len(covered) else total or 0
+    i       = int(searchsorted(covered, fraction*total))
+
+    return int(lengths[i]) if i < len(lengths) else 0
+
+def degrees(graph: CompactGraph) -> tuple[ndarray, ndarray]:
+
+    # Links at each end of each segment: end_degrees[2*id] at the end of the segment (successors of the forward node),
+    # end_degrees[2*id+1] at its start. segment_degrees: links at both ends.
+
+    end_degrees = diff(graph.offsets)
+
+    return end_degrees, end_degrees[0::2] + end_degrees[1::2]
+
+def bubbles(graph: CompactGraph, end_degrees: ndarray) -> tuple[int, int]:
+
+    # Simple bubbles: two or more segments with only one link at each end, all between the same two nodes
+    # (p -> branch -> q in any orientation). Returns the number of bubbles and of branches.
+    # A branch read in reverse is q^1 -> branch^1 -> p^1, so both ways are mapped to the smaller key.
+
+    nodes      = 2*flatnonzero((end_degrees[0::2] == 1) & (end_degrees[1::2] == 1))
+    successors = graph.targets[graph.offsets[nodes]].astype(int64)
+    previous   = graph.targets[graph.offsets[nodes+1]].astype(int64) ^ 1
+    branches   = ((successors >> 1) != nodes >> 1) & ((previous >> 1) != nodes >> 1)
+    n_nodes    = 2*len(graph)
+    successors = successors[branches]
+    previous   = previous[branches]
+    keys       = minimum(previous*n_nodes + successors, (successors ^ 1)*n_nodes + (previous ^ 1))
+    _, counts  = unique(keys, return_counts=True)
+
+    return int((counts > 1).sum()), int(counts[counts > 1].sum())
+
+def graph_stats(graph: CompactGraph, genome_size: int=None, tip_length: int=None) -> tuple[dict, dict]:
+
+    # Summary statistics and histograms (degree -> count) of a graph, all computed on its arrays.
+    # Tips are segments with links at only one end (with tip_length only those up to this length),
+    # isolated segments have no links at all.
+
+    lengths                  = graph.segment_lengths
+    end_degrees, seg_degrees = degrees(graph)
+    tips                     = (end_degrees[0::2] == 0) != (end_degrees[1::2] == 0)
+    labels                   = graph.components()
+    component_segments       = bincount(labels, minlength=1)
+    component_lengths        = bincount(labels, weights=lengths, minlength=1)
+    n_bubbles, n_branches    = bubbles(graph, end_degrees)
+
+    if tip_length is not None:
+        tips &= lengths <= tip_length
+
+    stats = {"segments":                   len(graph),
+             "links":                      graph.n_links(),
+             "total_length":               int(lengths.sum()),
+             "longest":                    int(lengths.max()) if len(lengths) else 0,
+             "N50":                        nx(lengths)}
+
+    if genome_size:
+        stats["NG50"] = nx(lengths, total=genome_size)
+
+    stats.update({"components":                 int((labels == arange(len(labels))).sum()),
+                  "largest_component_segments": int(component_segments.max()),
+                  "largest_component_length":   int(component_lengths.max()),
+                  "isolated_segments":          int((seg_degrees == 0).sum()),
+                  "dead_ends":                  int((end_degrees == 0).sum()),
+                  "tips":                       int(tips.sum()),
+                  "bubbles":                    n_bubbles,
+                  "bubble_branches":            n_branches,
+                  "max_degree":                 int(seg_degrees.max()) if len(seg_degrees) else 0})
+
+    histograms = {"end_degree":     bincount(end_degrees),
+                  "segment_degree": bincount(seg_degrees)}
+
+    return stats, histograms
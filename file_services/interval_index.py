@@ -0,0 +1,189 @@
+from array  import array
+from mmap   import mmap, ACCESS_READ
+from numpy  import concatenate, frombuffer, int64, lexsort, searchsorted, uint64
+from os     import path, stat
+from struct import Struct
+from typing import Generator
+
+from . import streams
+
+class IntervalIndexError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+class IntervalIndex():
+    """
+    Sidecar index (.aix) of the alignments in a PAF- or SAM-file for region queries.
+
+    The alignments of each target are binned by length class (class k holds lengths below 2**k)
+    and sorted by start within each bin. An alignment of class k overlapping [start, end) has to start
+    in [start-2**k+1, end), so a query is two binary searches per non-empty bin and a vectorized
+    comparison of the ends, no matter how large the file is. Only the touched pages of the index and
+    the alignment file are read, the records are parsed from their lines.
+    """
+
+    # .aix layout: magic, size and mtime (ns) of the alignment file, number of alignments, number of targets,
+    #              bin boundaries (int64, n_targets*n_classes+1), starts, ends (int64) and line offsets (uint64)
+    #              of the sorted alignments, newline separated target names
+    magic     = b"AIX\x01"
+    header    = Struct("<4sQQQQ")
+    n_classes = 64
+
+    def __init__(self, file_path: str, service) -> None:
+
+        self.file_path = file_path
+        self.service   = service
+
+        aix    = file_path + ".aix"
+        status = stat(file_path)
+        header = (self.magic, status.st_size, status.st_mtime_ns)
+
+        self.status = header[1:]
+
+        if not self.is_current(aix, header):
+            self.write(aix, header, *self.build())
+
+        with open(aix, "rb") as f:
+            self.index = mmap(f.fileno(), 0, access=ACCESS_READ)
+        with open(file_path, "rb") as f:
+            self.data  = mmap(f.fileno(), 0, access=ACCESS_READ) if status.st_size else b""
+
+        *_, n, n_targets = self.header.unpack_from(self.index)
+
+        position    = self.header.size
+        self.bins   = frombuffer(self.index, int64, n_targets*self.n_classes+1, position)
+        position   += 8*len(self.bins)
+        self.starts = frombuffer(self.index, int64, n, position)
+        self.ends   = frombuffer(self.index, int64, n, position+8*n)
+        self.lines  = frombuffer(self.index, uint64, n, position+16*n)
+        names       = self.index[position+24*n:].decode()
+
+        self.targets = {name: i for i, name in enumerate(names.split("\n"))} if n_targets else {}
+
+    @classmethod
+    def is_current(cls, aix: str, header: tuple) -> bool:
+
+        # The .aix is rebuilt whenever size or modification time of the alignment file changed
+
+        if not path.isfile(aix):
+            return False
+
+        with open(aix, "rb") as f:
+            stored = f.read(cls.header.size)
+
+        return len(stored) == cls.header.size and cls.header.unpack(stored)[:3] == header
+
+    def scan(self) -> Generator:
+
+        # Yields target name, start, end (0-based, end-exclusive) and line offset of each aligned record,
+        # the service extracts the interval from the line (None for header lines and unmapped reads)
+
+        with open(self.file_path, "rb") as f:
+
+            offset = 0
+
+            for line in f:
+
+                interval = self.service.interval(line)
+
+                if interval is not None:
+                    yield *interval, offset
+
+                offset += len(line)
+
+    def build(self) -> tuple:
+
+        if not streams.is_seekable(self.file_path):
+            raise IntervalIndexError(f"Cannot index compressed file or pipe {self.file_path}")
+
+        targets = {}
+        columns = [array("q"), array("q"), array("q"), array("Q")]   # target id, start, end, line offset
+
+        for target, start, end, offset in self.scan():
+            for column, value in zip(columns, (targets.setdefault(target, len(targets)), start, end, offset)):
+                column.append(value)
+
+        ids, starts, ends, lines = (frombuffer(column, dtype) for column, dtype in zip(columns, (int64, int64, int64, uint64)))
+
+        # Bin = target id * number of classes + length class (bit length of the alignment length)
+        classes = searchsorted([1 << k for k in range(self.n_classes-1)], (ends - starts).clip(0), side="right")
+        bins    = ids*self.n_classes + classes
+        order   = lexsort((starts, bins))
+        edges   = searchsorted(bins[order], range(len(targets)*self.n_classes+1))
+
+        return edges, starts[order], ends[order], lines[order], b"\n".join(targets)
+
+    def write(self, aix: str, header: tuple, edges, starts, ends, lines, names: bytes) -> None:
+
+        with open(aix, "wb") as f:
+            f.write(self.header.pack(*header, len(starts), len(edges)//self.n_classes))
+            for column in (edges.astype(int64), starts, ends, lines):
+                f.write(column.tobytes())
+            f.write(names)
+
+    def __len__(self) -> int:
+
+        return len(self.starts)
+
+    def query_lines(self, target: str, start: int, end: int):
+
+        # Line offsets of the alignments overlapping [start, end), sorted by start
+
+        if target not in self.targets or start >= end:
+            return self.lines[:0]
+
+        first   = self.targets[target]*self.n_classes
+        bounds  = self.bins[first:first+self.n_classes+1].tolist()
+        hits    = []
+        offsets = []
+
+        for k in range(self.n_classes):
+
+            low, high = bounds[k], bounds[k+1]
+
+            if low == high:
+                continue
+
+            starts = self.starts[low:high]
+            i      = low + searchsorted(starts, start - (1 << k) + 1)
+            j      = low + searchsorted(starts, end)
+
+            if i < j:
+                overlapping = (self.ends[i:j] > start).nonzero()[0] + i
+                hits.append(self.starts[overlapping])
+                offsets.append(self.lines[overlapping])
+
+        if not hits:
+            return self.lines[:0]
+
+        hits, offsets = concatenate(hits), concatenate(offsets)
+
+        return offsets[lexsort((offsets, hits))]
+
+    def query(self, target: str, start: int=None, end: int=None, binary=False) -> Generator:
+
+        # Records of the alignments to target overlapping [start, end), 0-based and end-exclusive
+
+        start = 0 if start is None else start
+        end   = (1 << 62) if end is None else end
+        parse = self.service.parse_bytes if binary else self.service.parse_string
+
+        for offset in self.query_lines(target, start, end).tolist():
+            line = self.data[offset:self.data.find(b"\n", offset)+1 or len(self.data)]
+            yield parse(line if binary else line.decode())
+
+# Open indices by file path, each .aix is only loaded once per version of the alignment file
+indices = {}
+
+def get_interval_index(file_path: str, service) -> IntervalIndex:
+
+    # Like the .aix, an open index is rebuilt (and the file mapped again) when size or modification time changed
+
+    status = stat(file_path)
+
+    if file_path not in indices or indices[file_path].status != (status.st_size, status.st_mtime_ns):
+        indices[file_path] = IntervalIndex(file_path, service)
+
+    return indices[file_path]
@@ -1,48 +1,150 @@
-from typing import Generator
-
-class PafFileService():
-
-    sorted_keys = [ "query_name",
-                    "query_length",
-                    "query_start",
-                    "query_end",
-                    "strand",
-                    "target_name",
-                    "target_length",
-                    "target_start",
-                    "target_end",
-                    "matches",
-                    "alignment_length",
-                    "alignment_quality"]
-
-    @classmethod
-    def parse_string(cls, line)->dict:
-
-        d = {key: line.split("\t")[i] for i, key in enumerate(cls.sorted_keys)}
-
-        d["format"] = "paf"
-
-        return d
-    
-    @classmethod
-    def parse_dict(cls, mapping: dict)->str:
-
-        return "\t".join([mapping[key] for key in cls.sorted_keys])+"\n"
-
-    @classmethod
-    def read(cls, file)->Generator:
-
-        with open(file, "r") as paf:
-
-            for line in paf:
-
-                yield cls.parse_string(line)
-
-    @classmethod
-    def write(cls, mappings: list[dict], file: str)->None:
-
-        with open(file, "w") as paf:
-
-            for mapping in mappings:
-
-                paf.write(cls.parse_dict(mapping))
\ No newline at end of file
+from typing import Generator
+
+from . import streams
+from .records import PafRecord, get_tag
+
+class PafFileService():
+
+    sorted_keys = [ "query_name",
+                    "query_length",
+                    "query_start",
+                    "query_end",
+                    "strand",
+                    "target_name",
+                    "target_length",
+                    "target_start",
+                    "target_end",
+                    "matches",
+                    "alignment_length",
+                    "alignment_quality"]
+
+    block_size = 1 << 24
+
+    @classmethod
+    def parse_values(cls, values: list)->PafRecord:
+
+        return PafRecord(values[0],
+                         int(values[1]),
+                         int(values[2]),
+                         int(values[3]),
+                         values[4],
+                         values[5],
+                         int(values[6]),
+                         int(values[7]),
+                         int(values[8]),
+                         int(values[9]),
+                         int(values[10]),
+                         int(values[11]),
+                         values[12] if len(values) > 12 else values[0][:0])
+
+    @classmethod
+    def parse_string(cls, line)->PafRecord:
+
+        # One split per line, the optional fields remain a single string
+
+        return cls.parse_values(line.rstrip("\n").split("\t", 12))
+    
+    @classmethod
+    def parse_dict(cls, mapping: dict)->str:
+
+        values = [str(mapping[key]) for key in cls.sorted_keys]
+
+        if mapping.get("tags"):
+            values.append(mapping["tags"])
+
+        return "\t".join(values)+"\n"
+
+    @classmethod
+    def parse_bytes(cls, line: bytes)->PafRecord:
+
+        return cls.parse_values(line.rstrip(b"\n").split(b"\t", 12))
+
+    @classmethod
+    def parse_dict_bytes(cls, mapping: dict)->bytes:
+
+        values = [value if isinstance(value, bytes) else str(value).encode()
+                  for value in (mapping[key] for key in cls.sorted_keys)]
+
+        if mapping.get("tags"):
+            values.append(mapping["tags"])
+
+        return b"\t".join(values)+b"\n"
+
+    @classmethod
+    def interval(cls, line: bytes)->tuple[bytes, int, int]:
+
+        # Target name, start and end of the alignment for the IntervalIndex
+
+        _, _, _, _, _, target, _, start, end, _ = line.split(b"\t", 9)
+
+        return target, int(start), int(end)
+
+    @classmethod
+    def query(cls, file_path: str, target: str, start: int=None, end: int=None, binary=False)->Generator:
+
+        # Alignments to target overlapping [start, end), 0-based and end-exclusive.
+        # The .aix sidecar index is built on first use and rebuilt when the PAF-file changes.
+
+        from .interval_index import get_interval_index
+
+        return get_interval_index(file_path, cls).query(target, start, end, binary)
+
+    @classmethod
+    def read(cls, file, binary=False, min_matches=0, min_quality=0, primary_only=False)->Generator:
+
+        # With binary=True the records hold bytes instead of strings.
+        # Lines failing the filters are skipped before their record is built,
+        # with primary_only lines with a tp-tag other than tp:A:P (minimap2) are skipped.
+
+        newline, tab = (b"\n", b"\t") if binary else ("\n", "\t")
+        filtered     = min_matches or min_quality or primary_only
+
+        with streams.open_input(file, binary) as paf:
+
+            for line in paf:
+
+                values = line.rstrip(newline).split(tab, 12)
+
+                if filtered and (int(values[9]) < min_matches or
+                                 int(values[11]) < min_quality or
+                                 (primary_only and len(values) > 12 and get_tag(values[12], "tp", "P") != "P")):
+                    continue
+
+                yield cls.parse_values(values)
+
+    @classmethod
+    def read_batches(cls, file, min_matches=0, min_quality=0, primary_only=False, block_size=None)->Generator:
+
+        # Yields PafBatch-objects of typed numpy columns (convertible with to_polars()),
+        # each parsed from about block_size bytes of complete lines
+
+        # numpy is only imported once batches are requested
+        from .batches import PafBatch
+
+        block_size = block_size or cls.block_size
+        rest       = b""
+
+        with streams.open_input(file, binary=True) as paf:
+
+            while block := paf.read(block_size):
+
+                block = rest + block
+                end   = block.rfind(b"\n") + 1
+                rest  = block[end:]
+
+                if end:
+                    yield PafBatch.from_buffer(block[:end], min_matches, min_quality, primary_only)
+
+        if rest:
+            yield PafBatch.from_buffer(rest + b"\n", min_matches, min_quality, primary_only)
+
+    @classmethod
+    def write(cls, mappings: list[dict], file: str, compress_threads=1, binary=False)->None:
+
+        parse = cls.parse_dict_bytes if binary else cls.parse_dict
+
+        with streams.open_output(file, "wb" if binary else "w", compress_threads) as paf:
+
+            for mapping in mappings:
+
+                paf.write(parse(mapping))
@@ -0,0 +1,295 @@
+from copy   import copy
+from typing import Any, Iterator, Union
+
+def parse_array(value: str) -> list:
+
+    # B-type values start with the element type, e.g. "c,1,2" or "f,0.5,1.5"
+    subtype, *values = value.split(",")
+
+    return [float(v) for v in values] if subtype == "f" else [int(v) for v in values]
+
+# Optional fields (tags) of SAM and PAF, TAG:TYPE:VALUE
+tag_types = {"A": str,
+             "i": int,
+             "f": float,
+             "Z": str,
+             "H": bytes.fromhex,
+             "B": parse_array}
+
+def parse_tags(tags: Union[str, bytes]) -> dict[str, Any]:
+
+    if isinstance(tags, bytes):
+        tags = tags.decode()
+
+    return {tag: tag_types[type](value) for tag, type, value in (t.split(":", 2) for t in tags.split("\t") if t)}
+
+def get_tag(tags: Union[str, bytes], tag: str, default=None) -> Any:
+
+    # Looks for a single tag without parsing the others
+
+    if isinstance(tags, bytes):
+        tags = tags.decode()
+
+    start = ("\t"+tags).find(f"\t{tag}:")
+
+    if start < 0:
+        return default
+
+    end = tags.find("\t", start)
+    _, type, value = tags[start:len(tags) if end < 0 else end].split(":", 2)
+
+    return tag_types[type](value)
+
+class Record():
+    """
+    Base class of the records yielded by the file services.
+    Records store their fields in __slots__ instead of a per-record dictionary but
+    still support the dictionary access of the dictionaries they replace.
+    """
+
+    __slots__ = ()
+    fields    = ()
+
+    def __getitem__(self, key: str) -> Any:
+
+        if key not in self.fields:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+
+        if key not in self.fields:
+            raise KeyError(key)
+
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+
+        return key in self.fields
+
+    def __iter__(self) -> Iterator[str]:
+
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+
+        return len(self.fields)
+
+    def __eq__(self, other) -> bool:
+
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+    def get(self, key: str, default=None) -> Any:
+
+        return self[key] if key in self.fields else default
+
+    def keys(self) -> tuple[str]:
+
+        return self.fields
+
+    def values(self) -> list:
+
+        return [self[key] for key in self.fields]
+
+    def items(self) -> list[tuple[str, Any]]:
+
+        return [(key, self[key]) for key in self.fields]
+
+    def __reduce__(self) -> tuple:
+
+        # Records are pickled as constructor arguments, e.g. when parsed in worker processes
+        slots = [key for cls in reversed(type(self).__mro__) for key in cls.__dict__.get("__slots__", ())]
+
+        return type(self), tuple(getattr(self, key) for key in slots)
+
+    def copy(self) -> "Record":
+
+        return copy(self)
+
+class FastaRecord(Record):
+
+    __slots__ = ("header", "sequence")
+    fields    = ("header", "sequence", "length", "file_type")
+    file_type = "fasta"
+
+    def __init__(self, header: str, sequence: str):
+
+        self.header   = header
+        self.sequence = sequence
+
+    @property
+    def length(self) -> int:
+
+        return len(self.sequence)
+
+class FastqRecord(FastaRecord):
+
+    __slots__ = ("info", "quality")
+    fields    = ("header", "sequence", "info", "quality", "length", "file_type")
+    file_type = "fastq"
+
+    def __init__(self, header: str, sequence: str, info: str, quality: str):
+
+        self.header   = header
+        self.sequence = sequence
+        self.info     = info
+        self.quality  = quality
+
+class ProjectedRecord(Record):
+    """
+    Record holding only the fields requested from a reader with fields=...,
+    e.g. header and length without the sequence.
+    """
+
+    __slots__ = ("fields", "data")
+
+    def __init__(self, fields: tuple[str], data: list):
+
+        self.fields = fields
+        self.data   = data
+
+    def __getitem__(self, key: str) -> Any:
+
+        if key not in self.fields:
+            raise KeyError(key)
+
+        return self.data[self.fields.index(key)]
+
+    def __getattr__(self, key: str) -> Any:
+
+        if key in self.fields:
+            return self.data[self.fields.index(key)]
+
+        raise AttributeError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+
+        if key not in self.fields:
+            raise KeyError(key)
+
+        self.data[self.fields.index(key)] = value
+
+    def __copy__(self) -> "ProjectedRecord":
+
+        return ProjectedRecord(self.fields, list(self.data))
+
+class TaggedRecord(Record):
+    """
+    Base class of alignment records, the optional fields are kept unparsed in tags,
+    get_tag() and get_tags() parse them on request.
+    """
+
+    __slots__ = ()
+
+    def get_tag(self, tag: str, default=None) -> Any:
+
+        return get_tag(self.tags, tag, default)
+
+    def get_tags(self) -> dict[str, Any]:
+
+        return parse_tags(self.tags)
+
+class PafRecord(TaggedRecord):
+    """
+    Coordinates, lengths, matches and mapping quality are ints.
+    """
+
+    __slots__ = ("query_name",
+                 "query_length",
+                 "query_start",
+                 "query_end",
+                 "strand",
+                 "target_name",
+                 "target_length",
+                 "target_start",
+                 "target_end",
+                 "matches",
+                 "alignment_length",
+                 "alignment_quality",
+                 "tags")
+    fields    = __slots__ + ("format",)
+    format    = "paf"
+
+    def __init__(self,
+                 query_name:        str,
+                 query_length:      int,
+                 query_start:       int,
+                 query_end:         int,
+                 strand:            str,
+                 target_name:       str,
+                 target_length:     int,
+                 target_start:      int,
+                 target_end:        int,
+                 matches:           int,
+                 alignment_length:  int,
+                 alignment_quality: int,
+                 tags:              str = ""):
+
+        self.query_name        = query_name
+        self.query_length      = query_length
+        self.query_start       = query_start
+        self.query_end         = query_end
+        self.strand            = strand
+        self.target_name       = target_name
+        self.target_length     = target_length
+        self.target_start      = target_start
+        self.target_end        = target_end
+        self.matches           = matches
+        self.alignment_length  = alignment_length
+        self.alignment_quality = alignment_quality
+        self.tags              = tags
+
+class SamRecord(TaggedRecord):
+    """
+    FLAG, POS, MAPQ, PNEXT and TLEN are ints.
+    """
+
+    __slots__ = ("QNAME",
+                 "FLAG",
+                 "RNAME",
+                 "POS",
+                 "MAPQ",
+                 "CIGAR",
+                 "RNEXT",
+                 "PNEXT",
+                 "TLEN",
+                 "SEQ",
+                 "QUAL",
+                 "tags")
+    fields    = __slots__ + ("format",)
+    format    = "sam"
+
+    def __init__(self,
+                 QNAME: str,
+                 FLAG:  int,
+                 RNAME: str,
+                 POS:   int,
+                 MAPQ:  int,
+                 CIGAR: str,
+                 RNEXT: str,
+                 PNEXT: int,
+                 TLEN:  int,
+                 SEQ:   str,
+                 QUAL:  str,
+                 tags:  str = ""):
+
+        self.QNAME = QNAME
+        self.FLAG  = FLAG
+        self.RNAME = RNAME
+        self.POS   = POS
+        self.MAPQ  = MAPQ
+        self.CIGAR = CIGAR
+        self.RNEXT = RNEXT
+        self.PNEXT = PNEXT
+        self.TLEN  = TLEN
+        self.SEQ   = SEQ
+        self.QUAL  = QUAL
+        self.tags  = tags
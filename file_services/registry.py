@@ -0,0 +1,176 @@
+from importlib import import_module
+from re        import compile
+
+from . import streams
+
+class UnknownFileFormatError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+class FileFormat():
+    """
+    Registry entry of a file service: file extensions, magic bytes (patterns matched against
+    the first bytes of the decompressed content) and capabilities.
+    The module of the service is only imported when the service is first used,
+    so that e.g. reading FASTQ never compiles the regular expressions of the graph formats.
+    """
+
+    def __init__(self,
+                 name:         str,
+                 kind:         str,
+                 module:       str,
+                 service:      str,
+                 extensions:   tuple[str],
+                 magic:        tuple[bytes],
+                 capabilities: set[str]):
+
+        self.name         = name
+        self.kind         = kind
+        self.module       = module
+        self.service_name = service
+        self.extensions   = extensions
+        self.magic        = magic
+        self.capabilities = capabilities
+        self.patterns     = None
+        self.instance     = None
+
+    def __repr__(self) -> str:
+
+        return f"FileFormat({self.name})"
+
+    @property
+    def service(self):
+
+        if self.instance is None:
+            self.instance = getattr(import_module(f".{self.module}", __package__), self.service_name)()
+
+        return self.instance
+
+    def matches_content(self, head: bytes) -> bool:
+
+        if self.patterns is None:
+            self.patterns = [compile(magic) for magic in self.magic]
+
+        return any(pattern.match(head) for pattern in self.patterns)
+
+    def matches_extension(self, file_path: str) -> bool:
+
+        return strip_compression_suffix(file_path).lower().endswith(self.extensions)
+
+    def can(self, capability: str) -> bool:
+
+        return capability in self.capabilities
+
+# Formats are tried in this order, more specific ones (e.g. BCALM, a FASTA with particular headers) first
+formats = {}
+
+# Result of the dispatch for (file path, kind), each file is only sniffed once
+dispatched = {}
+
+head_size = 1 << 10
+
+compression_suffixes = (".gz", ".bgz", ".bz2", ".xz", ".zst")
+
+def register(file_format: FileFormat) -> None:
+
+    formats[file_format.name] = file_format
+
+def strip_compression_suffix(file_path: str) -> str:
+
+    for suffix in compression_suffixes:
+        if file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+
+    return file_path
+
+def get_format(file_path: str, kind: str=None) -> FileFormat:
+
+    # Detects the format from the first bytes, the extension is only used if the content
+    # is not recognized (e.g. an empty file). kind restricts the candidates, e.g. to "reads".
+
+    if (file_path, kind) in dispatched:
+        return dispatched[(file_path, kind)]
+
+    head = streams.peek(file_path, head_size)
+
+    for file_format in formats.values():
+        if (kind is None or file_format.kind == kind) and head and file_format.matches_content(head):
+            break
+    else:
+        file_format = get_format_by_extension(file_path, kind)
+
+    dispatched[(file_path, kind)] = file_format
+
+    return file_format
+
+def get_format_by_extension(file_path: str, kind: str=None) -> FileFormat:
+
+    # For outputs, which do not exist yet. Longer extensions like .unitigs.fa take precedence over .fa.
+
+    candidates = [f for f in formats.values() if kind is None or f.kind == kind]
+
+    for file_format in sorted(candidates, key=lambda f: -max(map(len, f.extensions))):
+        if file_format.matches_extension(file_path):
+            return file_format
+
+    raise UnknownFileFormatError(f"Cannot determine the {kind or 'file'} format of {file_path}")
+
+def get_service(file_format: FileFormat, capability: str):
+
+    if not file_format.can(capability):
+        raise UnknownFileFormatError(f"The {file_format.name} file service cannot {capability}")
+
+    return file_format.service
+
+def get_reader(file_path: str, kind: str=None):
+
+    return get_service(get_format(file_path, kind), "read")
+
+def get_writer(file_path: str, kind: str=None):
+
+    return get_service(get_format_by_extension(file_path, kind), "write")
+
+def get_service_by_name(name: str, capability: str="read"):
+
+    if name not in formats:
+        raise UnknownFileFormatError(f"Unknown file format {name}")
+
+    return get_service(formats[name], capability)
+
+sequence_capabilities = {"read", "write", "binary", "fields", "batches", "shard", "index"}
+
+register(FileFormat("sam", "alignments", "sam_file_service", "SamFileService",
+                    extensions   = (".sam",),
+                    magic        = (rb"@(HD|SQ|RG|PG|CO)\t",
+                                    rb"[!-?A-~][!-~]*\t\d+\t[^\t\n]+\t\d+\t\d+\t(\*|(\d+[MIDNSHPX=])+)\t"),
+                    capabilities = {"read", "write", "binary", "index"}))
+register(FileFormat("bam", "alignments", "bam_file_service", "BamFileService",
+                    extensions   = (".bam",),
+                    magic        = (rb"BAM\x01",),
+                    capabilities = {"read", "write", "binary", "index"}))
+register(FileFormat("paf", "alignments", "paf_file_service", "PafFileService",
+                    extensions   = (".paf",),
+                    magic        = (rb"[^\t\n]+\t\d+\t\d+\t\d+\t[+-]\t[^\t\n]+\t\d+\t\d+\t\d+\t\d+\t\d+\t\d+",),
+                    capabilities = {"read", "write", "binary", "index"}))
+register(FileFormat("fastq", "reads", "fastq_file_service", "FastqFileService",
+                    extensions   = (".fq", ".fastq"),
+                    magic        = (rb"@",),
+                    capabilities = sequence_capabilities))
+register(FileFormat("bcalm", "graph", "bcalm_file_service", "BcalmFileService",
+                    extensions   = (".unitigs.fa",),
+                    magic        = (rb">\d+ LN:i:\d+",),
+                    capabilities = {"read", "graph"}))
+register(FileFormat("fastg", "graph", "fastg_file_service", "FastgFileService",
+                    extensions   = (".fastg",),
+                    magic        = (rb">EDGE_\w+_length_\d+_cov_",),
+                    capabilities = {"read", "graph"}))
+register(FileFormat("fasta", "reads", "fasta_file_service", "FastaFileService",
+                    extensions   = (".fa", ".fasta", ".fna", ".ffn", ".faa", ".frn", ".fas"),
+                    magic        = (rb">",),
+                    capabilities = sequence_capabilities))
+register(FileFormat("gfa", "graph", "gfa_file_service", "GfaFileService",
+                    extensions   = (".gfa", ".gfa1", ".gfa2"),
+                    magic        = (rb"#|[HSLCPWJEGFOU]\t",),
+                    capabilities = {"read", "binary", "graph"}))
@@ -1,48 +1,224 @@
-from typing import Generator
-
-class SamFileService():
-
-    sorted_keys = [ "QNAME",
-                    "FLAG",
-                    "RNAME",
-                    "POS",
-                    "MAPQ",
-                    "CIGAR",
-                    "RNEXT",
-                    "PNEXT",
-                    "TLEN",
-                    "SEQ",
-                    "QUAL"]
-
-    @classmethod
-    def parse_string(cls, line)->dict:
-
-        d = {cls.sorted_keys[i]: line for i, line in enumerate(line.split("\t"))}
-
-        d["format"] = "sam"
-
-        return d
-    
-    @classmethod
-    def parse_dict(cls, mapping: dict)->str:
-
-        return "\t".join([mapping[key] for key in cls.sorted_keys])+"\n"
-
-    @classmethod
-    def read(cls, file)->Generator:
-
-        with open(file, "r") as sam:
-
-            for line in sam:
-
-                yield cls.parse_string(line)
-
-    @classmethod
-    def write(cls, mappings: list[dict], file: str)->None:
-
-        with open(file, "w") as sam:
-
-            for mapping in mappings:
-
-                sam.write(cls.parse_dict(mapping))
-
+from re     import compile
+from typing import Generator, Iterable, Union
+
+from . import streams
+from .records import SamRecord
+
+class SamFileService():
+
+    sorted_keys = [ "QNAME",
+                    "FLAG",
+                    "RNAME",
+                    "POS",
+                    "MAPQ",
+                    "CIGAR",
+                    "RNEXT",
+                    "PNEXT",
+                    "TLEN",
+                    "SEQ",
+                    "QUAL"]
+
+    header_types = ["HD", "SQ", "RG", "PG", "CO"]
+
+    # CIGAR operations consuming the reference
+    reference_pattern = compile(rb"(\d+)[MDN=X]")
+
+    @classmethod
+    def parse_values(cls, values: list)->SamRecord:
+
+        return SamRecord(values[0],
+                         int(values[1]),
+                         values[2],
+                         int(values[3]),
+                         int(values[4]),
+                         values[5],
+                         values[6],
+                         int(values[7]),
+                         int(values[8]),
+                         values[9],
+                         values[10],
+                         values[11] if len(values) > 11 else values[0][:0])
+
+    @classmethod
+    def parse_string(cls, line)->SamRecord:
+
+        # One split per line, the optional fields remain a single string
+
+        return cls.parse_values(line.rstrip("\n").split("\t", 11))
+
+    @classmethod
+    def parse_dict(cls, mapping: dict)->str:
+
+        values = [str(mapping[key]) for key in cls.sorted_keys]
+
+        if mapping.get("tags"):
+            values.append(mapping["tags"])
+
+        return "\t".join(values)+"\n"
+
+    @classmethod
+    def parse_bytes(cls, line: bytes)->SamRecord:
+
+        return cls.parse_values(line.rstrip(b"\n").split(b"\t", 11))
+
+    @classmethod
+    def parse_dict_bytes(cls, mapping: dict)->bytes:
+
+        values = [value if isinstance(value, bytes) else str(value).encode()
+                  for value in (mapping[key] for key in cls.sorted_keys)]
+
+        if mapping.get("tags"):
+            values.append(mapping["tags"])
+
+        return b"\t".join(values)+b"\n"
+
+    @classmethod
+    def parse_header(cls, lines: Iterable[str])->dict:
+
+        # @HD becomes a dictionary, @SQ, @RG and @PG lists of dictionaries and @CO a list of comments.
+        # "references" maps the reference names (SN) to their lengths (LN) in the order of the @SQ-lines.
+
+        header = {"HD": {}, "SQ": [], "RG": [], "PG": [], "CO": [], "references": {}}
+
+        for line in lines:
+
+            record_type, _, fields = line.rstrip("\n")[1:].partition("\t")
+
+            if record_type == "CO":
+                header["CO"].append(fields)
+                continue
+
+            fields = dict(field.split(":", 1) for field in fields.split("\t"))
+
+            match record_type:
+                case "HD":
+                    header["HD"] = fields
+                case "SQ":
+                    header["SQ"].append(fields)
+                    header["references"][fields["SN"]] = int(fields["LN"])
+                case _:
+                    header.setdefault(record_type, []).append(fields)
+
+        return header
+
+    @classmethod
+    def format_header(cls, header: dict)->str:
+
+        lines = []
+
+        for record_type in cls.header_types:
+            if record_type == "HD":
+                entries = [header["HD"]] if header.get("HD") else []
+            else:
+                entries = header.get(record_type, [])
+            for entry in entries:
+                if record_type == "CO":
+                    lines.append(f"@CO\t{entry}\n")
+                else:
+                    lines.append("\t".join([f"@{record_type}"]+[f"{key}:{value}" for key, value in entry.items()])+"\n")
+
+        return "".join(lines)
+
+    @classmethod
+    def read_header(cls, file)->dict:
+
+        # Only the header lines at the beginning of the file are read
+
+        lines = []
+
+        with streams.open_input(file) as sam:
+
+            for line in sam:
+
+                if not line.startswith("@"):
+                    break
+
+                lines.append(line)
+
+        return cls.parse_header(lines)
+
+    @classmethod
+    def interval(cls, line: bytes)->Union[tuple[bytes, int, int], None]:
+
+        # Reference name, start (0-based) and end of the alignment for the IntervalIndex,
+        # None for header lines and unmapped reads
+
+        if line.startswith(b"@"):
+            return None
+
+        _, flag, rname, pos, _, cigar, _ = line.split(b"\t", 6)
+
+        if int(flag) & 4 or rname == b"*":
+            return None
+
+        start = int(pos)-1
+
+        return rname, start, start + max(sum(map(int, cls.reference_pattern.findall(cigar))), 1)
+
+    @classmethod
+    def query(cls, file_path: str, reference: str, start: int=None, end: int=None, binary=False)->Generator:
+
+        # Alignments to reference overlapping [start, end), 0-based and end-exclusive.
+        # The .aix sidecar index is built on first use and rebuilt when the SAM-file changes,
+        # the file does not need to be sorted.
+
+        from .interval_index import get_interval_index
+
+        return get_interval_index(file_path, cls).query(reference, start, end, binary)
+
+    @classmethod
+    def read(cls,
+             file,
+             binary=False,
+             require_flags=0,
+             exclude_flags=0,
+             min_quality=0,
+             references: Union[str, Iterable[str], None]=None)->Generator:
+
+        # With binary=True the records hold bytes instead of strings. Header lines are skipped (see read_header).
+        # Alignments are only yielded if all bits of require_flags and none of exclude_flags are set in FLAG
+        # (like samtools view -f/-F), MAPQ is at least min_quality and RNAME is one of references.
+        # Lines failing the filters are rejected before they are split completely and their record is built.
+
+        newline, tab, at = (b"\n", b"\t", b"@") if binary else ("\n", "\t", "@")
+        filtered         = require_flags or exclude_flags or min_quality or references is not None
+
+        if references is not None:
+            references = {references} if isinstance(references, str) else set(references)
+            if binary:
+                references = {reference.encode() for reference in references}
+
+        with streams.open_input(file, binary) as sam:
+
+            for line in sam:
+
+                if line.startswith(at):
+                    continue
+
+                if filtered:
+                    # Only the columns up to MAPQ are split off for the filters
+                    qname, flag, rname, pos, mapq, _ = line.split(tab, 5)
+                    if references is not None and rname not in references:
+                        continue
+                    flag = int(flag)
+                    if flag & require_flags != require_flags or flag & exclude_flags or int(mapq) < min_quality:
+                        continue
+
+                yield cls.parse_values(line.rstrip(newline).split(tab, 11))
+
+    @classmethod
+    def write(cls, mappings: list[dict], file: str, compress_threads=1, binary=False, header: dict=None)->None:
+
+        # header is a dictionary as returned by read_header
+
+        parse = cls.parse_dict_bytes if binary else cls.parse_dict
+
+        with streams.open_output(file, "wb" if binary else "w", compress_threads) as sam:
+
+            if header is not None:
+                text = cls.format_header(header)
+                sam.write(text.encode() if binary else text)
+
+            for mapping in mappings:
+
+                sam.write(parse(mapping))
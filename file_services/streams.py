@@ -0,0 +1,587 @@
+from bz2                import BZ2File
+from collections        import deque
+from gzip               import GzipFile
+from io                 import BufferedReader, BufferedWriter, RawIOBase, TextIOWrapper
+from lzma               import LZMAFile
+from os                 import path, stat
+from queue              import Full, Queue
+from stat               import S_ISCHR, S_ISFIFO
+from struct             import pack, unpack_from
+from sys                import stdin, stdout
+from threading          import Event, Thread
+from typing             import BinaryIO, Union
+from zlib               import compressobj, crc32, decompress, DEFLATED
+
+magic_bytes = {b"\x1f\x8b":         "gzip",
+               b"BZh":              "bz2",
+               b"\xfd7zXZ\x00":     "xz",
+               b"\x28\xb5\x2f\xfd": "zstd"}
+
+compressed_suffixes = (".gz", ".bgz")
+
+def get_compression(head: bytes)->Union[str, None]:
+
+    for magic, compression in magic_bytes.items():
+        if head.startswith(magic):
+            # BGZF is gzip with an extra field whose subfield identifiers are "BC"
+            if compression == "gzip" and len(head) >= 14 and head[3] & 4 and head[12:14] == b"BC":
+                return "bgzip"
+            return compression
+
+    return None
+
+def is_compressed(file_path: str)->bool:
+
+    with open(file_path, "rb") as file:
+        return get_compression(file.read(16)) is not None
+
+def get_decompressor(file: BinaryIO, compression: str)->BinaryIO:
+
+    match compression:
+        case "gzip" | "bgzip":
+            return GzipFile(fileobj=file)
+        case "bz2":
+            return BZ2File(file)
+        case "xz":
+            return LZMAFile(file)
+        case "zstd":
+            try:
+                from zstandard import ZstdDecompressor
+            except ImportError:
+                raise ImportError("Reading zstd-compressed files requires the zstandard package")
+            return ZstdDecompressor().stream_reader(file, read_across_frames=True)
+
+class BackgroundReader(RawIOBase):
+    """
+    Decompresses a file in a separate thread that fills a bounded queue of chunks,
+    so that inflating the next chunks overlaps with parsing the current one.
+    zlib, bz2 and lzma release the GIL while decompressing.
+    """
+
+    chunk_size = 1 << 20
+    queue_size = 16
+
+    def __init__(self, file: BinaryIO, compression: str):
+
+        super().__init__()
+
+        self.file   = file
+        self.stream = get_decompressor(file, compression)
+        self.queue  = Queue(self.queue_size)
+        self.stop   = Event()
+        self.chunk  = b""
+        self.offset = 0
+        self.eof    = False
+        self.thread = Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def fill(self)->None:
+
+        try:
+            while not self.stop.is_set():
+                chunk = self.stream.read(self.chunk_size)
+                self.put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item)->None:
+
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def readable(self)->bool:
+
+        return True
+
+    def readinto(self, b)->int:
+
+        if self.offset == len(self.chunk):
+
+            if self.eof:
+                return 0
+
+            item = self.queue.get()
+
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                self.eof = True
+                return 0
+
+            self.chunk  = item
+            self.offset = 0
+
+        n = min(len(b), len(self.chunk)-self.offset)
+        b[:n] = self.chunk[self.offset:self.offset+n]
+        self.offset += n
+
+        return n
+
+    def close(self)->None:
+
+        if not self.closed:
+            self.stop.set()
+            self.thread.join()
+            self.stream.close()
+            self.file.close()
+
+        super().close()
+
+class NewlineReader(RawIOBase):
+    """
+    Translates Windows line breaks (CRLF) to LF for readers working on bytes,
+    just like text mode does for readers working on strings.
+    """
+
+    def __init__(self, file: BinaryIO):
+
+        super().__init__()
+
+        self.file = file
+
+    def readable(self)->bool:
+
+        return True
+
+    def readinto(self, b)->int:
+
+        # A trailing CR is completed by the next byte, so that no line break is split between two reads
+
+        data = self.file.read(max(len(b)-1, 1))
+
+        if data.endswith(b"\r"):
+            data += self.file.read(1)
+
+        data  = data.replace(b"\r\n", b"\n")
+        n     = len(data)
+        b[:n] = data
+
+        return n
+
+    def close(self)->None:
+
+        if not self.closed:
+            self.file.close()
+
+        super().close()
+
+class PeekableReader(RawIOBase):
+    """
+    Reads from a pipe, bytes looked at with peek() are handed out again by the following reads.
+    Pipes cannot seek, so sniffing the format of standard input or a FIFO must not consume it.
+    """
+
+    def __init__(self, file: BinaryIO):
+
+        super().__init__()
+
+        self.file = file
+        self.head = b""
+
+    def peek(self, n: int)->bytes:
+
+        while len(self.head) < n and (chunk := self.file.read(n-len(self.head))):
+            self.head += chunk
+
+        return self.head[:n]
+
+    def readable(self)->bool:
+
+        return True
+
+    def readinto(self, b)->int:
+
+        if not self.head:
+            return self.file.readinto(b)
+
+        n         = min(len(b), len(self.head))
+        b[:n]     = self.head[:n]
+        self.head = self.head[n:]
+
+        return n
+
+    def close(self)->None:
+
+        if not self.closed:
+            self.file.close()
+
+        super().close()
+
+# Pipes that were sniffed stay open (and decompressed) until they are read, each can be read only once
+pipes = {}
+
+# Bytes of the content that peek() and the line break check of open_input() look at
+head_size = 1 << 16
+
+def is_pipe(file_path: str)->bool:
+
+    # "-" stands for standard input/output, FIFOs and process substitutions (/dev/fd/N) are no regular files.
+    # Directories and other paths that cannot be streamed are no pipes either.
+
+    return file_path == "-" or (path.exists(file_path) and (S_ISFIFO(mode := stat(file_path).st_mode) or S_ISCHR(mode)))
+
+def is_seekable(file_path: str)->bool:
+
+    # Indices and byte ranges need plain regular files
+
+    return not is_pipe(file_path) and not is_compressed(file_path)
+
+def open_decompressed(file_path: str)->BinaryIO:
+
+    if is_pipe(file_path):
+        pipe = PeekableReader(open(stdin.fileno() if file_path == "-" else file_path,
+                                   "rb",
+                                   buffering = 0,
+                                   closefd   = file_path != "-"))
+        # The head is read up to head_size bytes (or the end), the first read of the BufferedReader
+        # hands it out at once, so its peek() sees as much of an uncompressed pipe as of a file
+        head = pipe.peek(head_size)[:16]
+        file = BufferedReader(pipe, BackgroundReader.chunk_size)
+    else:
+        file = open(file_path, "rb", buffering=head_size)
+        head = file.peek(16)[:16]
+
+    compression = get_compression(head)
+
+    if compression is not None:
+        file = BufferedReader(BackgroundReader(file, compression), BackgroundReader.chunk_size)
+
+    return file
+
+def peek(file_path: str, n: int)->bytes:
+
+    # Returns (up to) the first n bytes of the decompressed content without consuming them.
+    # Pipes are kept open for the following open_input, at most head_size bytes can be peeked at.
+
+    if not is_pipe(file_path):
+        with open_decompressed(file_path) as file:
+            return file.read(n)
+
+    if file_path not in pipes:
+        pipes[file_path] = open_decompressed(file_path)
+
+    return pipes[file_path].peek(n)[:n]
+
+def open_input(file_path: str, binary=False)->Union[BinaryIO, TextIOWrapper]:
+
+    # Opens plain and compressed files alike, the compression is detected from the magic bytes.
+    # "-" reads from standard input, which can be compressed as well, FIFOs are read the same way.
+    # In binary mode, files with Windows line breaks (judged from their first bytes) are translated.
+
+    file = pipes.pop(file_path) if file_path in pipes else open_decompressed(file_path)
+
+    if not binary:
+        return TextIOWrapper(file)
+
+    if b"\r" in file.peek(head_size)[:head_size]:
+        file = BufferedReader(NewlineReader(file), BackgroundReader.chunk_size)
+
+    return file
+
+class BgzfError(Exception):
+
+    def __init__(self, message: str) -> None:
+
+        super().__init__(message)
+
+def inflate_block(data: bytes, size: int)->bytes:
+
+    block = decompress(data, -15)
+
+    if len(block) != size:
+        raise BgzfError("BGZF-block with wrong size")
+
+    return block
+
+class BgzfReader(RawIOBase):
+    """
+    Reads BGZF (e.g. BAM) block by block and keeps track of virtual offsets
+    (offset of the compressed block << 16 | offset within the uncompressed block),
+    which indices like .bai point to. With threads > 1 the following blocks are
+    inflated on a thread pool while the current one is consumed, zlib releases the GIL.
+    """
+
+    def __init__(self, file: BinaryIO, threads=1):
+
+        super().__init__()
+
+        self.file    = file
+        self.threads = threads
+        self.pool    = None
+        self.pending = deque()
+        self.reset(file.tell() if file.seekable() else 0)
+
+        if threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            self.pool = ThreadPoolExecutor(threads)
+
+    def reset(self, coffset: int)->None:
+
+        for _, _, future in self.pending:
+            future.cancel()
+
+        self.pending.clear()
+
+        self.coffset = coffset   # Compressed offset of the current block
+        self.next    = coffset   # Compressed offset of the next block to be read from the file
+        self.block   = b""
+        self.offset  = 0
+        self.eof     = False
+
+    def read_raw_block(self)->Union[tuple[int, bytes, int], None]:
+
+        # Returns the compressed offset, the deflated data and the uncompressed size of the next block
+
+        header = self.file.read(12)
+
+        if not header:
+            return None
+        if len(header) < 12 or header[:4] != b"\x1f\x8b\x08\x04":
+            raise BgzfError("Not a BGZF-file")
+
+        extra = self.file.read(unpack_from("<H", header, 10)[0])
+        bsize = None
+        i     = 0
+
+        while i+4 <= len(extra):
+            length = unpack_from("<H", extra, i+2)[0]
+            if extra[i:i+2] == b"BC":
+                bsize = unpack_from("<H", extra, i+4)[0]
+            i += 4+length
+
+        if bsize is None:
+            raise BgzfError("gzip-block without BGZF block size")
+
+        rest    = self.file.read(bsize+1-12-len(extra))
+        coffset = self.next
+
+        self.next += bsize+1
+
+        return coffset, rest[:-8], unpack_from("<I", rest, len(rest)-4)[0]
+
+    def next_block(self)->bool:
+
+        if self.pool is None:
+            raw = self.read_raw_block()
+            if raw is None:
+                return False
+            coffset, data, size = raw
+            block               = inflate_block(data, size)
+        else:
+            # Up to a few blocks per thread are inflated ahead
+            while not self.eof and len(self.pending) < 4*self.threads:
+                raw = self.read_raw_block()
+                if raw is None:
+                    self.eof = True
+                    break
+                coffset, data, size = raw
+                self.pending.append((coffset, size, self.pool.submit(inflate_block, data, size)))
+            if not self.pending:
+                return False
+            coffset, size, future = self.pending.popleft()
+            block                 = future.result()
+
+        self.coffset = coffset
+        self.block   = block
+        self.offset  = 0
+
+        return True
+
+    def readable(self)->bool:
+
+        return True
+
+    def readinto(self, b)->int:
+
+        # Empty blocks (like the EOF-marker) are skipped
+
+        while self.offset == len(self.block):
+            if not self.next_block():
+                return 0
+
+        n     = min(len(b), len(self.block)-self.offset)
+        b[:n] = self.block[self.offset:self.offset+n]
+
+        self.offset += n
+
+        return n
+
+    def read_exactly(self, n: int, allow_eof=False)->bytes:
+
+        # With allow_eof=True an empty result marks the end of the file, a partial one is an error anyway
+
+        if self.offset+n <= len(self.block):
+            self.offset += n
+            return self.block[self.offset-n:self.offset]
+
+        data = self.read(n)
+
+        if allow_eof and not data:
+            return data
+
+        while len(data) < n:
+            chunk = self.read(n-len(data))
+            if not chunk:
+                raise BgzfError("Truncated BGZF-file")
+            data += chunk
+
+        return data
+
+    def tell_virtual(self)->int:
+
+        # A completely consumed block points to the start of the next block, like htslib does
+
+        if self.offset == len(self.block):
+            return (self.pending[0][0] if self.pending else self.next) << 16
+
+        return self.coffset << 16 | self.offset
+
+    def seek_virtual(self, offset: int)->None:
+
+        self.file.seek(offset >> 16)
+        self.reset(offset >> 16)
+
+        if not self.next_block() and offset & 0xffff:
+            raise BgzfError("Virtual offset beyond the end of the file")
+
+        self.offset = offset & 0xffff
+
+    def close(self)->None:
+
+        if not self.closed:
+            self.reset(self.coffset)
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.file.close()
+
+        super().close()
+
+class InflatedBgzfReader(BgzfReader):
+    """
+    Reads BGZF that has already been decompressed, like a pipe whose format was sniffed by peek(),
+    which is kept open in pipes as decompressed content. Its chunks take the place of the blocks,
+    there are no virtual offsets to point to.
+    """
+
+    def __init__(self, file: BinaryIO):
+
+        super().__init__(file)
+
+    def next_block(self)->bool:
+
+        block = self.file.read(BackgroundReader.chunk_size)
+
+        if not block:
+            return False
+
+        self.block  = block
+        self.offset = 0
+
+        return True
+
+    def seek_virtual(self, offset: int)->None:
+
+        raise BgzfError("Cannot seek in a decompressed BGZF-stream")
+
+def split_compression_suffix(file_path: str)->tuple[str, str]:
+
+    for suffix in compressed_suffixes:
+        if file_path.endswith(suffix):
+            return file_path[:-len(suffix)], suffix
+
+    return file_path, ""
+
+def compress_block(data: bytes, level: int)->bytes:
+
+    # One BGZF block: a complete gzip member with the "BC" extra field holding the block size - 1
+
+    deflate = compressobj(level, DEFLATED, -15)
+    payload = deflate.compress(data) + deflate.flush()
+    header  = pack("<BBBBIBBHBBHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(payload)+25)
+
+    return header + payload + pack("<II", crc32(data), len(data))
+
+class BgzfWriter(RawIOBase):
+    """
+    Cuts the output into independent BGZF blocks and compresses them on a thread pool, like bgzip -@.
+    The result is valid gzip and can be read, indexed or concatenated by standard tools.
+    """
+
+    block_size = 0xff00
+    eof_block  = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+    def __init__(self, file: BinaryIO, threads=1, level=6):
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        super().__init__()
+
+        self.file    = file
+        self.level   = level
+        self.threads = threads
+        self.buffer  = bytearray()
+        self.pending = deque()
+        self.pool    = ThreadPoolExecutor(threads) if threads > 1 else None
+
+    def writable(self)->bool:
+
+        return True
+
+    def write(self, b)->int:
+
+        self.buffer += b
+
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+
+        return len(b)
+
+    def submit(self, data: bytes)->None:
+
+        if self.pool is None:
+            self.file.write(compress_block(data, self.level))
+            return
+
+        self.pending.append(self.pool.submit(compress_block, data, self.level))
+
+        # Blocks are written in submission order, at most a few blocks per thread are in flight
+        while len(self.pending) > 4*self.threads:
+            self.file.write(self.pending.popleft().result())
+
+    def close(self)->None:
+
+        if not self.closed:
+            if self.buffer:
+                self.submit(bytes(self.buffer))
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.file.write(self.eof_block)
+            self.file.close()
+
+        super().close()
+
+def open_output(file_path: str, mode="w", compress_threads=1)->Union[BinaryIO, TextIOWrapper]:
+
+    # Output to paths ending with .gz or .bgz is BGZF-compressed with compress_threads threads.
+    # "-" writes to standard output, which is flushed but not closed afterwards.
+
+    if file_path == "-":
+        stdout.flush()
+        return open(stdout.fileno(), mode.replace("a", "w"), closefd=False)
+
+    if not split_compression_suffix(file_path)[1]:
+        return open(file_path, mode)
+
+    file = open(file_path, mode.replace("b", "")+"b")
+    file = BufferedWriter(BgzfWriter(file, compress_threads), BgzfWriter.block_size)
+
+    return file if "b" in mode else TextIOWrapper(file)
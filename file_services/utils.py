@@ -1,31 +1,25 @@
-from . import bcalm_file_service
-from . import fasta_like_file_service
-from . import fasta_file_service
-from . import fastg_file_service
-from . import fastq_file_service
-
-def get_read_reader(read_file: str)->fasta_like_file_service.FastaLikeFileService:
-
-    with open(read_file) as f:
-
-        match f.readline()[0]:
-            case ">":
-                return fasta_file_service.FastaFileService()
-            case "@":
-                return fastq_file_service.FastqFileService()
-            
-def get_read_writer(read)->fasta_like_file_service.FastaLikeFileService:
-
-    match read["file_type"]:
-        case "fasta":
-            return fasta_file_service.FastaFileService()
-        case "fastq":
-            return fastq_file_service.FastqFileService()
-        
-def get_graph_reader(format: str):
-
-    match format:
-        case "fastg":
-            return fastg_file_service.FastgFileService()
-        case "bcalm":
-            return bcalm_file_service.BcalmFileService()
\ No newline at end of file
+from . import fasta_like_file_service
+from . import registry
+
+def get_read_reader(read_file: str)->fasta_like_file_service.FastaLikeFileService:
+
+    # FASTA or FASTQ, detected once per file from its first bytes, None for anything else.
+    # Peeking does not consume the input, so that pipes can be read by the returned service afterwards.
+
+    try:
+        return registry.get_reader(read_file, "reads")
+    except registry.UnknownFileFormatError:
+        return None
+            
+def get_read_writer(read)->fasta_like_file_service.FastaLikeFileService:
+
+    return registry.get_service_by_name(read["file_type"], "write")
+        
+def get_graph_reader(file: str):
+
+    # Accepts a format name ("fastg", "bcalm", "gfa") or a file whose format is detected
+
+    if file in registry.formats:
+        return registry.get_service_by_name(file)
+
+    return registry.get_reader(file, "graph")
@@ -1,28 +1,40 @@
-from argparse import ArgumentParser
-
-from file_services.fasta_file_service import FastaFileService
-from file_services.fastq_file_service import FastqFileService
-
-class MyArgumentParser(ArgumentParser):
-
-    prog        =   "f12fa"
-
-    description =   """
-                    FASTQ to FASTA conversion
-                    """
-    
-    def __init__(self) -> None:
-
-        super().__init__(prog=self.prog, description=self.description)
-
-        self.add_argument("FASTQ")
-
-def main():
-
-    args = MyArgumentParser().parse_args()
-
-    FastaFileService().write(args.FASTQ[:-1]+"a", FastqFileService.read(args.FASTQ))
-
-if __name__ == "__main__":
-
-    main()
+from argparse import ArgumentParser
+
+from file_services.fasta_file_service import FastaFileService
+from file_services.fastq_file_service import FastqFileService
+from file_services.streams            import is_pipe, split_compression_suffix
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "f12fa"
+
+    description =   """
+                    FASTQ to FASTA conversion
+                    """
+    
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("FASTQ",
+                          help="FASTQ-file, - for standard input or a pipe (the FASTA is then written to standard output)")
+        self.add_argument("-ct","--compress-threads",
+                          help="Number of threads for BGZF-compressing outputs ending with .gz or .bgz [default: 1]",
+                          type=int,
+                          default=1,
+                          metavar="")
+
+def main():
+
+    args = MyArgumentParser().parse_args()
+
+    stem, suffix = split_compression_suffix(args.FASTQ)
+
+    FastaFileService().write("-" if is_pipe(args.FASTQ) else stem[:-1]+"a"+suffix,
+                             FastqFileService.read(args.FASTQ, binary=True),
+                             compress_threads=args.compress_threads,
+                             binary=True)
+
+if __name__ == "__main__":
+
+    main()
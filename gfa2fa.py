@@ -1,42 +1,66 @@
 from argparse   import ArgumentParser
+from sys        import stderr, stdout
 from typing     import Generator
 
 from file_services.fasta_file_service   import FastaFileService
-from file_services.gfa_file_service     import GfaFileService, Segment
+from file_services.gfa_file_service     import GfaFileService
 
 class MyArgumentParser(ArgumentParser):
 
     prog        =   "gfa2fa"
 
     description =   """
-                    GFA to FASTA conversion
+                    GFA to FASTA conversion, either the segments (S-lines) or with -p the sequences spelled
+                    by paths (P-lines) and walks (W-lines)
                     """
     
     def __init__(self) -> None:
 
         super().__init__(prog=self.prog, description=self.description)
 
-        self.add_argument("GFA")
-        self.add_argument("FASTA")
+        self.add_argument("GFA",
+                          help="GFA-file, - for standard input or a pipe")
+        self.add_argument("FASTA",
+                          help="FASTA-file or - for standard output")
+        self.add_argument("-ct","--compress-threads",
+                          help="Number of threads for BGZF-compressing outputs ending with .gz or .bgz [default: 1]",
+                          type=int,
+                          default=1,
+                          metavar="")
+        self.add_argument("-p","--paths",
+                          help="Write the sequences of paths and walks: the segments in their orientation, "
+                               "without the bases overlapping the previous segment",
+                          action="store_true")
+        self.add_argument("-t","--threads",
+                          help="-p: number of processes spelling paths, the output keeps their order [default: 1]",
+                          type=int,
+                          default=1,
+                          metavar="")
         
-def gfa2fa(gfa: str) -> Generator:
+def gfa2fa(gfa: str, paths: bool=False, processes: int=1) -> Generator:
     
-    for gfa_element in GfaFileService.read(gfa):
-        
-        if isinstance(gfa_element, Segment):
-            
-            yield {"header":    gfa_element.name,
-                   "sequence":  gfa_element.sequence}
+    # Passthrough: name and sequence are taken straight from the S-lines, tags are never parsed.
+    # Paths: the graph is loaded with the segments left in the file, they are read when a path is spelled.
+    
+    if paths:
+        yield from GfaFileService.read_graph(gfa).spell_paths(processes)
+    else:
+        yield from GfaFileService.read(gfa, binary=True, passthrough=True)
         
 def main():
     
     args = MyArgumentParser().parse_args()
     
-    FastaFileService.write(args.FASTA, gfa2fa(args.GFA))
+    FastaFileService.write(args.FASTA,
+                           gfa2fa(args.GFA, args.paths, args.threads),
+                           compress_threads = args.compress_threads,
+                           binary           = True)
+
+    log = stderr if args.FASTA == "-" else stdout
     
-    print("##############################################")
-    print("#    Simon says: Thanks for using SSfSBT!    #")
-    print("##############################################")
+    print("##############################################", file=log)
+    print("#    Simon says: Thanks for using SSfSBT!    #", file=log)
+    print("##############################################", file=log)
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+from argparse import ArgumentParser
+from os       import path
+from sys      import stderr, stdout
+
+from file_services.graph_stats import graph_stats, load_graph
+from file_services.streams     import is_pipe, open_output
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "graph_stats"
+
+    description =   """
+                    Statistics of an assembly graph (GFA, FASTG or BCALM unitigs): segment lengths (N50, NG50),
+                    connected components, tips, simple bubbles and the distribution of the number of links per segment.
+                    Writes the statistics as tab-separated name and value, followed by the degree histograms.
+                    """
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("in_file",
+                          help="GFA/FASTG/BCALM-file, - for standard input or a pipe")
+        self.add_argument("out_file",
+                          help="Tab-separated output file or - for standard output")
+        self.add_argument("-g","--genome-size",
+                          help="Genome size for NG50",
+                          type=int,
+                          metavar="")
+        self.add_argument("-t","--tip-length",
+                          help="Count only tips up to this length [default: all]",
+                          type=int,
+                          metavar="")
+
+    def parse_args(self):
+
+        self.args = super().parse_args()
+
+        if not (path.isfile(self.args.in_file) or is_pipe(self.args.in_file)):
+            raise Exception("Input file does not exist")
+
+        if path.isfile(self.args.out_file):
+            raise Exception("Output file exists")
+
+        return self.args
+
+def write_stats(stats: dict, histograms: dict, out):
+
+    for name, value in stats.items():
+        out.write(f"{name}\t{value}\n")
+
+    # One row per degree, the number of segment ends and of segments with this many links
+    out.write("\ndegree\t" + "\t".join(histograms) + "\n")
+
+    for degree in range(max(len(counts) for counts in histograms.values())):
+        out.write("\t".join([str(degree)] + [str(int(counts[degree])) if degree < len(counts) else "0"
+                                             for counts in histograms.values()]) + "\n")
+
+def main():
+
+    args              = MyArgumentParser().parse_args()
+    graph             = load_graph(args.in_file)
+    stats, histograms = graph_stats(graph, args.genome_size, args.tip_length)
+
+    with open_output(args.out_file, "w") as out:
+        write_stats(stats, histograms, out)
+
+    log = stderr if args.out_file == "-" else stdout
+
+    print("##############################################", file=log)
+    print("#    Simon says: Thanks for using SSfSBT!    #", file=log)
+    print("##############################################", file=log)
+
+if __name__ == "__main__":
+    main()
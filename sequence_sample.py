@@ -1,63 +1,79 @@
-from argparse   import ArgumentParser
-from os         import path
-from random     import sample
-
-from file_services.utils import get_read_reader
-
-class MyArgumentParser(ArgumentParser):
-
-    prog        =   "sample"
-
-    description =   """
-                    ----------
-                    Sampling sequences from FASTA/FASTQ.
-                    
-                    """
-    
-    def __init__(self) -> None:
-
-        super().__init__(prog=self.prog, description=self.description)
-
-        self.add_argument("number",
-                          help="Number of sequences to sample",
-                          type=int)
-        self.add_argument("in_file")
-        self.add_argument("out_file")
-        self.add_argument("-r","--random",
-                          action="store_true",
-                          help="Sample randomly instead of first n sequence (slower)")
-
-    def parse_args(self):
-
-        self.args = super().parse_args()
-
-        if not path.isfile(self.args.in_file):
-            raise Exception("Input file does not exist")
-        
-        if path.isfile(self.args.out_file):
-            raise Exception("Output file exists")
-        
-        return self.args
-
-def main():
-
-    args = MyArgumentParser().parse_args()
-
-    file_service = get_read_reader(args.in_file)
-
-    if args.random:
-        all_sequences     = list(file_service.read(args.in_file))
-        sampled_indices   = sample(range(len(all_sequences)), args.number)
-        sampled_sequences = [read for i, read in enumerate(all_sequences)
-                             if i in sampled_indices]
-    else:
-        sampled_sequences = file_service.read(args.in_file, only=args.number)
-
-    file_service.write(args.out_file, sampled_sequences)
-    
-    print("##############################################")
-    print("#    Simon says: Thanks for using SSfSBT!    #")
-    print("##############################################")
-
-if __name__ == "__main__":
-    main()
+from argparse   import ArgumentParser
+from os         import path
+from random     import sample
+from sys        import stderr, stdout
+
+from file_services.fastq_file_service import FastqFileService
+from file_services.streams            import is_pipe, is_seekable
+from file_services.utils              import get_read_reader
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "sample"
+
+    description =   """
+                    ----------
+                    Sampling sequences from FASTA/FASTQ.
+                    
+                    """
+    
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description)
+
+        self.add_argument("number",
+                          help="Number of sequences to sample",
+                          type=int)
+        self.add_argument("in_file",
+                          help="FASTA/FASTQ-file, - for standard input or a pipe")
+        self.add_argument("out_file",
+                          help="FASTA/FASTQ-file or - for standard output")
+        self.add_argument("-r","--random",
+                          action="store_true",
+                          help="Sample randomly instead of first n sequence (slower)")
+        self.add_argument("-ct","--compress-threads",
+                          help="Number of threads for BGZF-compressing outputs ending with .gz or .bgz [default: 1]",
+                          type=int,
+                          default=1,
+                          metavar="")
+
+    def parse_args(self):
+
+        self.args = super().parse_args()
+
+        if not (path.isfile(self.args.in_file) or is_pipe(self.args.in_file)):
+            raise Exception("Input file does not exist")
+        
+        if path.isfile(self.args.out_file):
+            raise Exception("Output file exists")
+        
+        return self.args
+
+def main():
+
+    args = MyArgumentParser().parse_args()
+
+    file_service = get_read_reader(args.in_file)
+
+    if args.random and isinstance(file_service, FastqFileService) and is_seekable(args.in_file):
+        # Seeking through the .fqi index instead of loading all reads
+        sampled_indices   = sorted(sample(range(file_service.count(args.in_file)), args.number))
+        sampled_sequences = (file_service.get(args.in_file, i, binary=True) for i in sampled_indices)
+    elif args.random:
+        all_sequences     = list(file_service.read(args.in_file, binary=True))
+        sampled_indices   = sample(range(len(all_sequences)), args.number)
+        sampled_sequences = [read for i, read in enumerate(all_sequences)
+                             if i in sampled_indices]
+    else:
+        sampled_sequences = file_service.read(args.in_file, only=args.number, binary=True)
+
+    file_service.write(args.out_file, sampled_sequences, compress_threads=args.compress_threads, binary=True)
+
+    log = stderr if args.out_file == "-" else stdout
+    
+    print("##############################################", file=log)
+    print("#    Simon says: Thanks for using SSfSBT!    #", file=log)
+    print("##############################################", file=log)
+
+if __name__ == "__main__":
+    main()
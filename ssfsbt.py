@@ -0,0 +1,54 @@
+from argparse  import ArgumentParser, RawDescriptionHelpFormatter, REMAINDER
+from importlib import import_module
+
+import sys
+
+# Subcommand: (module, description)
+# Modules are only imported when their subcommand is run, so that short jobs like fq2fa or sample
+# do not pay for loading pandas or matplotlib.
+commands = {"aln_pos2pos":             ("aln_pos2pos",             "Finding corresponding positions in multiple sequence alignments"),
+            "busco_find":              ("busco_find",              "Extracting BUSCO transcript sequences"),
+            "busco_merge":             ("busco_merge",             "Merging multiple reports from BUSCO and compiling a plot"),
+            "coverage":                ("alignment_coverage",      "Depth and breadth of coverage from PAF/SAM/BAM-alignments"),
+            "fa2fq":                   ("fa2fq",                   "FASTA to FASTQ conversion"),
+            "fq2fa":                   ("fq2fa",                   "FASTQ to FASTA conversion"),
+            "gfa2fa":                  ("gfa2fa",                  "GFA to FASTA conversion"),
+            "graph_stats":             ("graph_stats",             "N50, components, tips, bubbles and degrees of assembly graphs"),
+            "kallisto2nanosim":        ("kallisto2nanosim",        "Converting expression profiles from Kallisto for NanoSim"),
+            "lengths":                 ("sequence_lengths",        "Basic sequence length distribution analysis"),
+            "lr_lordec_contam_filter": ("lr_lordec_contam_filter", "Filtering contamination from corrected long reads"),
+            "rnaQUASTcompare":         ("rnaQUASTcompare",         "Merging multiple reports from rnaQUAST and compiling a plot"),
+            "sample":                  ("sequence_sample",         "Subsampling a fixed number of sequences from FASTA/FASTQ-files"),
+            "unambiguous_codes":       ("unambiguous_codes",       "Replacing ambiguity codes in FASTA/FASTQ-files")}
+
+class MyArgumentParser(ArgumentParser):
+
+    prog        =   "ssfsbt"
+
+    description =   "Simple Scripts for Simple Bioinformatics Tasks\n\nsubcommands:\n" + \
+                    "\n".join(f"  {command:<25}{description}" for command, (_, description) in commands.items())
+
+    def __init__(self) -> None:
+
+        super().__init__(prog=self.prog, description=self.description, formatter_class=RawDescriptionHelpFormatter)
+
+        self.add_argument("subcommand",
+                          help="One of the subcommands listed above",
+                          choices=commands,
+                          metavar="subcommand")
+        self.add_argument("arguments",
+                          help="Arguments of the subcommand, see ssfsbt <subcommand> -h",
+                          nargs=REMAINDER)
+
+def main():
+
+    args = MyArgumentParser().parse_args()
+
+    # The subcommand parses its arguments from sys.argv like its standalone script
+    sys.argv = [f"ssfsbt {args.subcommand}"] + args.arguments
+
+    import_module(commands[args.subcommand][0]).main()
+
+if __name__ == "__main__":
+
+    main()
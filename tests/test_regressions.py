@@ -0,0 +1,203 @@
+from numpy      import memmap
+from os         import path
+from subprocess import run
+
+import sys
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+
+sys.path.insert(0, root)
+
+from file_services.bam_file_service   import BamFileService
+from file_services.coverage           import Coverage
+from file_services                    import fasta_file_service
+from file_services.fasta_file_service import FastaFileService
+from file_services.fastq_file_service import FastqFileService
+from file_services.sam_file_service   import SamFileService
+from file_services.streams            import is_pipe
+from file_services.utils              import get_read_reader
+
+# Two entries followed by a blank line, read as two entries before block-wise reading
+blank_line_fastq = b"@r1\nACGT\n+\nIIII\n@r2\nAC\n+\nII\n\n"
+
+def test_fastq_blank_lines(tmp_path):
+
+    for n, data in enumerate((blank_line_fastq, b"\n@r1\nACGT\n+\nIIII\n\n \n@r2\nAC\n+\nII\n\n")):
+
+        fastq = tmp_path / f"blank{n}.fq"
+        fastq.write_bytes(data)
+
+        assert [(r.header, r.sequence, r.quality) for r in FastqFileService.read(str(fastq))] == [("r1", "ACGT", "IIII"),
+                                                                                                  ("r2", "AC", "II")]
+        assert [r.sequence for r in FastqFileService.read(str(fastq), binary=True)] == [b"ACGT", b"AC"]
+        assert [FastqFileService.get(str(fastq), i).sequence for i in range(2)] == ["ACGT", "AC"]
+
+def test_lengths_without_empty_entries(tmp_path):
+
+    fastq = tmp_path / "blank.fq"
+    fasta = tmp_path / "blank.fa"
+    fastq.write_bytes(blank_line_fastq)
+    fasta.write_bytes(b"\n>a\nACGT\n\n>b\nAC\n\n")
+
+    assert [r["length"] for r in FastqFileService.read(str(fastq), fields={"length"})] == [4, 2]
+    assert [r["length"] for r in FastqFileService.read_sharded(str(fastq), processes=2, shard_size=8)] == [4, 2]
+    assert [r["length"] for r in FastaFileService.read(str(fasta), fields={"length"})] == [4, 2]
+
+def format_of_stdin(data: bytes) -> str:
+
+    # Format detected from standard input, in a new process as pipes can only be sniffed once
+
+    code = "from file_services import registry; print(registry.get_format('-').name)"
+
+    return run([sys.executable, "-c", code],
+               input          = data,
+               cwd            = root,
+               capture_output = True,
+               check          = True).stdout.decode().strip()
+
+def test_formats_of_pipes():
+
+    assert format_of_stdin(b"read1\t100\t0\t100\t+\tchr1\t1000\t10\t110\t95\t100\t60\ttp:A:P\n") == "paf"
+    assert format_of_stdin(b"read1\t0\tchr1\t11\t60\t10M\t*\t0\t0\tACGTACGTAC\tIIIIIIIIII\n") == "sam"
+    assert format_of_stdin(b">EDGE_1_length_5_cov_2.5:EDGE_2_length_4_cov_1.0;\nACGTA\n"
+                           b">EDGE_2_length_4_cov_1.0;\nACGT\n") == "fastg"
+
+def test_read_reader_of_unknown_file(tmp_path):
+
+    text = tmp_path / "notes.txt"
+    text.write_bytes(b"neither FASTA nor FASTQ\n")
+
+    assert get_read_reader(str(text)) is None
+
+def test_depth_of_target_with_percent_sign(tmp_path):
+
+    sam = tmp_path / "percent.sam"
+    tsv = tmp_path / "depth.tsv"
+    sam.write_bytes(b"@SQ\tSN:c%3\tLN:6\nr1\t0\tc%3\t3\t60\t2M\t*\t0\t0\tAC\tII\n")
+
+    run([sys.executable, "alignment_coverage.py", str(sam), str(tsv), "-d"],
+        cwd            = root,
+        capture_output = True,
+        check          = True)
+
+    assert tsv.read_text().splitlines()[1:] == [f"c%3\t{i}\t{int(i in (3, 4))}" for i in range(1, 7)]
+
+def test_depth_of_bam_from_stdin(tmp_path):
+
+    sam = tmp_path / "pipe.sam"
+    bam = tmp_path / "pipe.bam"
+    tsv = tmp_path / "depth.tsv"
+    sam.write_bytes(b"@SQ\tSN:c1\tLN:6\nr1\t0\tc1\t2\t60\t3M\t*\t0\t0\tACG\tIII\n")
+
+    BamFileService.write(SamFileService.read(str(sam)), str(bam), header=SamFileService.read_header(str(sam)))
+
+    # The format is detected from the start of the pipe before the BAM-file is read,
+    # without the header of the pipe the target ends with the last aligned base
+    run([sys.executable, "alignment_coverage.py", "-", str(tsv), "-d"],
+        input          = bam.read_bytes(),
+        cwd            = root,
+        capture_output = True,
+        check          = True)
+
+    assert tsv.read_text().splitlines()[1:] == [f"c1\t{i}\t{int(i >= 2)}" for i in range(1, 5)]
+
+def test_fasta_index_without_fai(tmp_path, monkeypatch):
+
+    fasta = tmp_path / "readonly.fa"
+    fasta.write_bytes(b">t1 one\nACGT\nAC\n>t2\nAAA\n")
+
+    # Stands in for a read-only directory, which cannot be set up as root
+    def open_readonly(file, mode="r", *args, **kwargs):
+        if "w" in mode:
+            raise PermissionError(f"Permission denied: {file}")
+        return open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(fasta_file_service, "open", open_readonly, raising=False)
+
+    assert FastaFileService.fetch(str(fasta), "t1") == "ACGTAC"
+    assert FastaFileService.fetch(str(fasta), "t2", 1) == "AA"
+    assert not (tmp_path / "readonly.fa.fai").exists()
+
+def test_query_of_rewritten_sam(tmp_path):
+
+    sam = tmp_path / "rewritten.sam"
+    sam.write_bytes(b"@SQ\tSN:c1\tLN:100\nr1\t0\tc1\t11\t60\t5M\t*\t0\t0\tACGTA\tIIIII\n")
+
+    assert [r.QNAME for r in SamFileService.query(str(sam), "c1", 0, 100)] == ["r1"]
+
+    sam.write_bytes(b"@SQ\tSN:c1\tLN:100\n@CO\tlonger header\n"
+                    b"r2\t0\tc1\t21\t60\t5M\t*\t0\t0\tACGTA\tIIIII\n"
+                    b"r3\t0\tc1\t51\t60\t5M\t*\t0\t0\tACGTA\tIIIII\n")
+
+    assert [r.QNAME for r in SamFileService.query(str(sam), "c1", 0, 100)] == ["r2", "r3"]
+
+def test_get_of_rewritten_files(tmp_path):
+
+    fastq = tmp_path / "rewritten.fq"
+    fasta = tmp_path / "rewritten.fa"
+    fastq.write_bytes(b"@r1\nACGT\n+\nIIII\n")
+    fasta.write_bytes(b">t1\nACGT\n")
+
+    assert FastqFileService.get(str(fastq), 0).sequence == "ACGT"
+    assert FastaFileService.fetch(str(fasta), "t1") == "ACGT"
+
+    fastq.write_bytes(b"@\nAC\n+\nII\n@r2 second\nACGTACGT\n+\nIIIIIIII\n")
+    fasta.write_bytes(b">t0\nAA\n>t1\nCCCCCC\n")
+
+    assert [FastqFileService.get(str(fastq), i).sequence for i in range(2)] == ["AC", "ACGTACGT"]
+    assert FastqFileService.get_by_name(str(fastq), "r2").sequence == "ACGTACGT"
+    assert FastaFileService.fetch(str(fasta), "t1") == "CCCCCC"
+
+def test_pipes_and_directories(tmp_path):
+
+    assert is_pipe("-")
+    assert not is_pipe(str(tmp_path))
+    assert not is_pipe(str(tmp_path / "missing.fa"))
+
+    reads = b">r1\nACGTACGTACGTACGTACGTACGTACGT\n>r2\nacgtacgtacgtACGT\n"
+
+    # Outputs cannot be named after standard input
+    assert run([sys.executable, "lr_lordec_contam_filter.py", "-"], input=reads, cwd=root, capture_output=True).returncode
+
+    run([sys.executable, "lr_lordec_contam_filter.py", "-", "-a", str(tmp_path / "a.fa"), "-r", str(tmp_path / "r.fa")],
+        input          = reads,
+        cwd            = root,
+        capture_output = True,
+        check          = True)
+
+    assert (tmp_path / "a.fa").read_bytes().startswith(b">r1\n")
+    assert (tmp_path / "r.fa").read_bytes().startswith(b">r2\n")
+    assert not path.exists(path.join(root, "-.accepted"))
+
+def test_fastq_entries_longer_than_a_block(tmp_path):
+
+    long   = FastqFileService.line_block_size * 3 + 5
+    fastq  = tmp_path / "long.fq"
+    wanted = [("s1", "AC"), ("l1", "A"*long), ("s2", "G"), ("l2", "C"*(long+7)), ("s3", "T")]
+
+    fastq.write_bytes(b"".join(f"@{name}\n{sequence}\n+\n{'I'*len(sequence)}\n".encode() for name, sequence in wanted) +
+                      b"@w1\n" + b"ACGT"*long + b"\nAC\n+\n" + b"I"*(4*long+2) + b"\n")
+    wanted.append(("w1", "ACGT"*long + "AC"))
+
+    assert [(r.header, r.sequence) for r in FastqFileService.read(str(fastq))] == wanted
+    assert [r.sequence.decode() for r in FastqFileService.read(str(fastq), binary=True)] == [w[1] for w in wanted]
+    assert [r["length"] for r in FastqFileService.read(str(fastq), fields={"length"})] == [len(w[1]) for w in wanted]
+
+def test_memmap_of_growing_targets(tmp_path):
+
+    # Without @SQ-lines the target grows with the alignments, beyond memmap_length it is kept in a file
+    sam = tmp_path / "headerless.sam"
+    sam.write_bytes(b"".join(f"r{i}\t0\tc1\t{1+100*i}\t60\t50M\t*\t0\t0\t*\t*\n".encode() for i in range(100)))
+
+    coverage = Coverage(memmap_dir=str(tmp_path), memmap_length=1000, batch_size=10)
+    coverage.add(str(sam))
+
+    depth = coverage.depth("c1")
+
+    assert coverage.files and isinstance(coverage.arrays["c1"], memmap)
+    assert [file.name for file in tmp_path.glob("*.cov")] == [path.basename(coverage.files[-1])]
+    assert len(depth) == 9950 and int(depth.sum()) == 5000 and depth[:100].tolist() == [1]*50 + [0]*50
+
+    coverage.close()
+
+    assert not list(tmp_path.glob("*.cov"))